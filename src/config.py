@@ -1,5 +1,7 @@
 # --- 配置参数 ---
 # --- 配置参数 ---
+import os
+
 # 16:9 Widescreen for "Immersive OS" feel
 SCREEN_WIDTH = 1280
 SCREEN_HEIGHT = 720
@@ -18,9 +20,54 @@ COLOR_ACCENT = (74, 144, 226)     # Friendly blue accent
 
 # 存档文件
 SAVE_FILE = "savegame.json"
+BINARY_SAVE_FILE = "savegame.farm" # Compact binary format (src/core/save_format.py)
+SAVE_FORMAT = "binary" # "binary" | "json"; loading picks whichever existing save is newest
+SAVE_COMPRESSION = 1   # zlib level of binary save sections (0 = raw, mmap-friendly)
+# Background autosave (src/core/autosave.py): ring of AUTOSAVE_KEEP files, written off the main thread
+AUTOSAVE_INTERVAL = 120.0 # Seconds of play between autosaves (0 = off)
+AUTOSAVE_DIR = "autosaves"
+AUTOSAVE_KEEP = 5
+# Write-ahead journal (src/core/journal.py): every mutation is logged, replayed over the last base after a crash
+JOURNAL_ENABLED = True
+JOURNAL_DIR = "journal"
+JOURNAL_FLUSH_INTERVAL = 1.0 # Seconds between log writes (= progress lost at most on a crash)
+JOURNAL_COMPACT_RECORDS = 50000 # Start a new base snapshot once the log holds this many records
+JOURNAL_FSYNC = False # fsync every flush (survives power loss, not just a crash of the game)
+REPLAY_DIR = "replays" # F9 session recordings (src/core/replay.py)
 
 # 其他平衡常数
 DRONE_MOVE_DELAY = 0.2
+DRONE_WAYPOINT_MAX = 32 # Corners of the drone's on-screen path still to animate (oldest dropped beyond this)
 # Standard Grid
 GRID_WIDTH = 10 
 GRID_HEIGHT = 10
+# Grid storage backend: "object" (one Crop per tile) or "columnar" (typed arrays, for huge maps)
+GRID_STORAGE = "object"
+
+# Drone -> UI event ring (see src/core/events.py)
+EVENT_RING_CAPACITY = 4096
+EVENT_RING_POLICY = "coalesce_moves" # "drop_oldest" | "coalesce_moves" | "block"
+
+# Cache of scaled / tinted sprites (VisualManager.get_sprite), LRU-evicted above this size
+SPRITE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Camera (src/ui/camera.py): tile size on screen in pixels, GRID_SIZE = 100%
+CAMERA_MIN_TILE_PX = 1
+CAMERA_MAX_TILE_PX = GRID_SIZE * 2
+CAMERA_ZOOM_STEP = 1.25 # Per mouse-wheel notch
+CAMERA_LOD_TILE_PX = 8  # Below this the farm is drawn as a minimap (one colour block per tile)
+MINIMAP_REFRESH = 0.25  # Seconds between minimap rebuilds
+
+# Particle pool capacity (src/ui/particles.py); spawns beyond this are dropped
+PARTICLE_MAX = 3000
+
+# Rendered text surfaces kept by VisualManager.text (LRU)
+TEXT_CACHE_SIZE = 512
+
+# Editor undo steps kept in GameIDE.undo_stack (all editor windows together)
+UNDO_LIMIT = 500
+
+# Compiled user scripts (src/core/script_cache.py): code objects kept in memory, bytecode on disk
+SCRIPT_CACHE_SIZE = 64
+# Anchored to the repo, not the working directory (the CLIs and tournament workers run from anywhere)
+SCRIPT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "user_scripts", "__pycache__") # None = memory only
@@ -1,57 +1,108 @@
 import time
 import sys
-from src.config import DRONE_MOVE_DELAY, GRID_WIDTH, GRID_HEIGHT
+from collections import deque
+from src.config import DRONE_MOVE_DELAY, DRONE_WAYPOINT_MAX, EVENT_RING_CAPACITY, EVENT_RING_POLICY
 from src.entities.crops import CROP_FACTORY
+from src.core.events import EventRing, EV_MOVE, EV_PLANT, EV_HARVEST, EV_BATCH
+
+# 方向 -> (dx, dy)
+DIRECTIONS = {
+    "North": (0, -1),
+    "South": (0, 1),
+    "West": (-1, 0),
+    "East": (1, 0),
+}
 
 class DroneAPI:
-    def __init__(self, farm, output_func):
+    def __init__(self, farm, output_func, sleep_func=None):
         self.farm = farm
         self.x = 0
         self.y = 0
         self.inventory = {} # 背包
         self.output = output_func
         self._stop_flag = False
-        
+
+        # --- Timing ---
+        # Real game: wall-clock sleep. Headless sim passes a function that advances farm time instead.
+        self.sleep = sleep_func or time.sleep
+        self.move_delay = DRONE_MOVE_DELAY
+        self.action_count = 0
+        self.mega_harvests = 0 # Harvests of fused (size > 1) crops
+        self.mega_yield = 0
+        self._profiler = None # ScriptProfiler whose hooks are installed (see profiler.py)
+
         # --- Visual & Animation ---
         self.visual_x = float(self.x)
         self.visual_y = float(self.y)
-        self.events = [] # UI will poll these events
+        self.waypoints = deque(maxlen=DRONE_WAYPOINT_MAX) # Path corners the UI still has to fly through (UI thread only)
+        # UI drains these (drone thread = producer, UI thread = consumer)
+        self.events = EventRing(EVENT_RING_CAPACITY, EVENT_RING_POLICY)
 
-    def _check(self):
-        if self._stop_flag: 
+    def _check(self, actions=1):
+        if self._stop_flag:
             sys.exit()
-        time.sleep(DRONE_MOVE_DELAY) # 模拟机械动作延迟
+        self.sleep(self.move_delay * actions) # 模拟机械动作延迟
+        # Counted once the delay is served: a sleep cut short (SystemExit at the end of a
+        # headless run) means the actions never happen
+        self.action_count += actions
+
+    # --- Internal actions (no delay, no events, no output) ---
+
+    def _step(self, dx, dy):
+        # Wrap around logic (Infinite Map)
+        self.x = (self.x + dx) % self.farm.width
+        self.y = (self.y + dy) % self.farm.height
+
+    def _plant_here(self, crop_class):
+        # Auto-Destroy existing to overwrite
+        self.farm.destroy_crop(self.x, self.y)
+
+        new_crop = crop_class() # 实例化对象
+        if self.farm.plant_crop(self.x, self.y, new_crop):
+            return new_crop
+        return None
+
+    def _harvest_here(self):
+        """Returns (name, amount) or None."""
+        crop_obj = self.farm.harvest_crop(self.x, self.y)
+        if not crop_obj:
+            return None
+
+        name = crop_obj.name
+        amount = 1
+        if hasattr(crop_obj, 'size'):
+            amount = crop_obj.size * crop_obj.size
+
+        journal = self.farm.journal
+        if journal is not None:
+            journal.add_item(self.inventory, name, amount) # Applied and logged in one step (checkpoint-safe)
+        else:
+            self.inventory[name] = self.inventory.get(name, 0) + amount
+        if amount > 1:
+            self.mega_harvests += 1
+            self.mega_yield += amount
+        return name, amount
+
+    # --- Single commands ---
 
     def move(self, direction):
         self._check()
-        dx, dy = 0, 0
-        if direction == "North": dy = -1
-        elif direction == "South": dy = 1
-        elif direction == "West": dx = -1
-        elif direction == "East": dx = 1
-        
-        nx, ny = self.x + dx, self.y + dy
-        
-        # Wrap around logic (Infinite Map)
-        nx = nx % GRID_WIDTH
-        ny = ny % GRID_HEIGHT
-        
-        self.x, self.y = nx, ny
-        self.events.append({"type": "move", "x": nx, "y": ny})
+        dx, dy = DIRECTIONS.get(direction, (0, 0))
+        self._step(dx, dy)
+        self.events.push(EV_MOVE, self.x, self.y, frame=self.farm.frame)
         return True
 
     def plant(self, crop_name):
         self._check()
         crop_class = CROP_FACTORY.get(crop_name.lower())
-        
+
         if crop_class:
-            # Auto-Destroy existing to overwrite
-            self.farm.destroy_crop(self.x, self.y)
-            
-            new_crop = crop_class() # 实例化对象
-            if self.farm.plant_crop(self.x, self.y, new_crop):
+            with self.farm.lock:
+                new_crop = self._plant_here(crop_class)
+                frame = self.farm.frame
+            if new_crop:
                 self.output(f"Planted {new_crop.name}")
-                self.events.append({"type": "plant", "x": self.x, "y": self.y, "name": new_crop.name})
+                self.events.push(EV_PLANT, self.x, self.y, new_crop.name, frame=frame)
                 return True
             else:
                 self.output(f"Fail: Tile blocked (Bedrock?)")
@@ -61,32 +112,145 @@ class DroneAPI:
 
     def harvest(self):
         self._check()
-        crop_obj = self.farm.harvest_crop(self.x, self.y)
-        
-        if crop_obj:
-            name = crop_obj.name
-            amount = 1
-            if hasattr(crop_obj, 'size'):
-                amount = crop_obj.size * crop_obj.size
-                
-            self.inventory[name] = self.inventory.get(name, 0) + amount
+        with self.farm.lock:
+            result = self._harvest_here()
+            frame = self.farm.frame
+
+        if result:
+            name, amount = result
             self.output(f"Harvested {amount}x {name}! Bag: {self.inventory}")
-            # Visuals might need to know amount? API just sends name.
-            # Maybe update event to include amount?
-            self.events.append({"type": "harvest", "x": self.x, "y": self.y, "name": name, "amount": amount})
+            self.events.push(EV_HARVEST, self.x, self.y, name, amount, frame)
             return True
         return False
-    
+
+    # --- Batch commands ---
+    # One call = one stop check, one sleep (n actions x delay), one output line and one EV_BATCH event.
+    # The whole sequence is validated before anything happens; the actions are applied after the delay,
+    # in one go under farm.lock (no frame update in between).
+
+    def _emit_batch(self, path=None, plants=None, harvests=None, frame=None):
+        # Payload: (path [(x, y), ...], plants [(x, y, name), ...], harvests [(x, y, name, amount), ...])
+        self.events.push(EV_BATCH, self.x, self.y, (path or [], plants or [], harvests or []),
+                         frame=self.farm.frame if frame is None else frame)
+
+    def _snake_steps(self, w, h):
+        """Yield (dx, dy) before each tile of a w*h snake traversal (first tile: (0, 0))."""
+        for row in range(h):
+            dx = 1 if row % 2 == 0 else -1
+            for col in range(w):
+                if col == 0:
+                    yield (0, 1) if row > 0 else (0, 0)
+                else:
+                    yield (dx, 0)
+
+    def _run_tiles(self, steps, tile_action):
+        """Walk `steps` (see _snake_steps), calling tile_action() on every tile. Returns the visited path."""
+        path = []
+        for dx, dy in steps:
+            if dx or dy:
+                self._step(dx, dy)
+                path.append((self.x, self.y))
+            tile_action()
+        return path
+
+    def run_path(self, directions):
+        """Move along a list of directions, e.g. drone.run_path(["East"] * 5 + ["South"])."""
+        steps = [DIRECTIONS.get(d) for d in directions]
+        if None in steps:
+            bad = directions[steps.index(None)]
+            self.output(f"Fail: Unknown direction '{bad}'")
+            return False
+        if not steps: return True
+
+        self._check(len(steps))
+        path = []
+        for dx, dy in steps:
+            self._step(dx, dy)
+            path.append((self.x, self.y))
+        self._emit_batch(path=path)
+        return True
+
+    def plant_rect(self, w, h, crop_name):
+        """Plant a w*h area in a snake pattern starting here (rows go East/West, then South)."""
+        crop_class = CROP_FACTORY.get(crop_name.lower())
+        if not crop_class:
+            self.output(f"Fail: Unknown crop '{crop_name}'")
+            return 0
+        if w <= 0 or h <= 0: return 0
+
+        self._check(w * h + (w * h - 1)) # plants + moves
+        plants = []
+        def plant_tile():
+            new_crop = self._plant_here(crop_class)
+            if new_crop:
+                plants.append((self.x, self.y, new_crop.name))
+        with self.farm.lock:
+            path = self._run_tiles(self._snake_steps(w, h), plant_tile)
+            frame = self.farm.frame
+
+        self.output(f"Planted {len(plants)}x {crop_class().name} ({w}x{h})")
+        self._emit_batch(path=path, plants=plants, frame=frame)
+        return len(plants)
+
+    def plant_row(self, n, crop_name, direction="East"):
+        """Plant n tiles in a line: here, then moving `direction` between plants."""
+        if direction not in DIRECTIONS:
+            self.output(f"Fail: Unknown direction '{direction}'")
+            return 0
+        crop_class = CROP_FACTORY.get(crop_name.lower())
+        if not crop_class:
+            self.output(f"Fail: Unknown crop '{crop_name}'")
+            return 0
+        if n <= 0: return 0
+
+        self._check(n + (n - 1))
+        step = DIRECTIONS[direction]
+        plants = []
+        def plant_tile():
+            new_crop = self._plant_here(crop_class)
+            if new_crop:
+                plants.append((self.x, self.y, new_crop.name))
+        with self.farm.lock:
+            path = self._run_tiles([(0, 0)] + [step] * (n - 1), plant_tile)
+            frame = self.farm.frame
+
+        self.output(f"Planted {len(plants)}x {crop_class().name} (row of {n})")
+        self._emit_batch(path=path, plants=plants, frame=frame)
+        return len(plants)
+
+    def harvest_rect(self, w, h):
+        """Harvest a w*h area in a snake pattern starting here. Returns the number of items gained."""
+        if w <= 0 or h <= 0: return 0
+
+        self._check(w * h + (w * h - 1)) # harvests + moves
+        harvests = []
+        def harvest_tile():
+            result = self._harvest_here()
+            if result:
+                harvests.append((self.x, self.y) + result)
+        with self.farm.lock:
+            path = self._run_tiles(self._snake_steps(w, h), harvest_tile)
+            frame = self.farm.frame
+
+        total = sum(h_[3] for h_ in harvests)
+        if harvests:
+            self.output(f"Harvested {total} items ({w}x{h})! Bag: {self.inventory}")
+        self._emit_batch(path=path, harvests=harvests, frame=frame)
+        return total
+
     def get_pos(self):
         return self.x, self.y
-    
+
     def destroy(self):
         self._check()
-        if self.farm.destroy_crop(self.x, self.y):
-            self.events.append({"type": "plant", "x": self.x, "y": self.y, "name": "poof"}) # Reuse plant poof?
+        with self.farm.lock:
+            destroyed = self.farm.destroy_crop(self.x, self.y)
+            frame = self.farm.frame
+        if destroyed:
+            self.events.push(EV_PLANT, self.x, self.y, "poof", frame=frame) # Reuse plant poof?
             return True
         return False
-    
+
     def log(self, msg):
         self.output(str(msg))
 
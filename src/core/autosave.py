@@ -0,0 +1,117 @@
+"""
+Background saving (后台自动存档).
+
+The main thread only takes a snapshot (Farm.snapshot(): row / column copies,
+well under a millisecond for a 256x256 farm) plus a copy of the drone state.
+Serializing, compressing and the atomic temp-file + rename write happen on a
+worker thread, so saving never stalls a frame and a crash mid-write never
+leaves a torn save behind.
+
+Autosaves rotate through a ring of AUTOSAVE_KEEP files in AUTOSAVE_DIR
+(overwriting the oldest), every AUTOSAVE_INTERVAL seconds of play.
+"""
+import glob
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from src.config import AUTOSAVE_INTERVAL, AUTOSAVE_DIR, AUTOSAVE_KEEP
+from src.core.save_format import write_save
+
+
+class AutosaveService:
+    def __init__(self, farm, drone, interval=AUTOSAVE_INTERVAL, directory=AUTOSAVE_DIR, keep=AUTOSAVE_KEEP):
+        self.farm = farm
+        self.drone = drone
+        self.interval = interval # <= 0 disables periodic saves (save() still works)
+        self.directory = directory
+        self.keep = max(1, keep)
+        self.results = deque() # (path, ok, message, manual) for the main loop to report
+        self._jobs = queue.Queue()
+        self._pending = 0 # Jobs queued or being written (main thread reads, worker decrements)
+        self._lock = threading.Lock()
+        self._elapsed = 0.0
+        self._slot = None
+        self._thread = threading.Thread(target=self._worker, name="autosave", daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self):
+        return self._pending > 0
+
+    def update(self, dt):
+        """Main loop tick: start a periodic autosave when due (skipped while one is still being written)."""
+        if self.interval <= 0:
+            return
+        self._elapsed += dt
+        if self._elapsed >= self.interval and not self.busy:
+            self._elapsed = 0.0
+            self.save(self.next_autosave_path())
+
+    def save(self, path, manual=False, on_done=None):
+        """Snapshot now (main thread), write `path` in the background; on_done(ok) runs on the worker afterwards."""
+        with self.farm.lock: # Drone batches apply under it: no half-applied batch, bag and grid agree
+            drone_data = self.drone.to_dict()
+            drone_data["inventory"] = dict(drone_data["inventory"]) # The script thread keeps adding to it
+            snapshot = self.farm.snapshot()
+        with self._lock:
+            self._pending += 1
+        self._jobs.put((path, snapshot, drone_data, manual, on_done))
+
+    def next_autosave_path(self):
+        """Next file of the ring; the first call of a session continues after the newest existing one."""
+        if self._slot is None:
+            existing = [(os.path.getmtime(self._ring_path(i)), i) for i in range(self.keep)
+                        if os.path.exists(self._ring_path(i))]
+            self._slot = (max(existing)[1] + 1) % self.keep if existing else 0
+        path = self._ring_path(self._slot)
+        self._slot = (self._slot + 1) % self.keep
+        return path
+
+    def _ring_path(self, i):
+        return os.path.join(self.directory, f"autosave_{i}.farm")
+
+    def saves(self):
+        """Existing ring files, newest first."""
+        files = glob.glob(os.path.join(self.directory, "autosave_*.farm"))
+        return sorted(files, key=os.path.getmtime, reverse=True)
+
+    def flush(self):
+        """Block until every queued save is on disk."""
+        self._jobs.join()
+
+    def close(self):
+        self.flush()
+        self._jobs.put(None)
+        self._thread.join(timeout=5.0)
+
+    # --- Worker thread ---
+
+    def _worker(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                self._jobs.task_done()
+                return
+            path, snapshot, drone_data, manual, on_done = job
+            ok = False
+            started = time.perf_counter()
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                size = write_save(path, snapshot, drone_data)
+                ms = (time.perf_counter() - started) * 1000
+                ok = True
+                self.results.append((path, True, f"Saved {path} ({size // 1024} KB, {ms:.0f} ms)", manual))
+            except Exception as e:
+                self.results.append((path, False, f"Save Failed: {e}", manual))
+            finally:
+                snapshot.close()
+                if on_done is not None:
+                    on_done(ok)
+                with self._lock:
+                    self._pending -= 1
+                self._jobs.task_done()
@@ -0,0 +1,311 @@
+"""
+Simulation core benchmarks (核心性能基准).
+
+Standalone, no pygame: times Farm.update, fusion, save round trips and
+DroneAPI throughput on synthetic farms, and writes machine-readable results
+that can be diffed between commits.
+
+Every case builds its input in an untimed setup step and is run `rounds`
+times on a fresh copy; the JSON keeps min / median / mean per case, keyed
+by "name[param=value,...]".
+
+Usage:
+    python -m src.core.benchmark --json bench.json
+    python -m src.core.benchmark --quick --compare bench.json   # ratios against an earlier run
+    python -m src.core.benchmark --only fusion --storage columnar
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from src.core.farm import Farm
+from src.core.api import DroneAPI
+from src.entities.crops import CROP_FACTORY, Pumpkin
+
+SIZES = (10, 32, 64, 128, 256, 512)
+QUICK_SIZES = (10, 32, 64, 128)
+MIXES = {
+    "carrot": ("carrot",),
+    "mixed": ("carrot", "pumpkin", "blueberry", "sunflower"),
+    "pumpkin": ("pumpkin",),
+}
+FRAME_DT = 1.0 / 60
+
+
+def measure(run, setup=None, rounds=3):
+    """Wall times of `rounds` calls run(setup()) (setup untimed). Returns (times, last return value of run)."""
+    times = []
+    out = None
+    for _ in range(rounds):
+        state = setup() if setup else None
+        started = time.perf_counter()
+        out = run(state)
+        times.append(time.perf_counter() - started)
+    return times, out
+
+
+def result(name, params, times, ops=None, **extra):
+    median = statistics.median(times)
+    row = {
+        "id": name + "[" + ",".join(f"{k}={v}" for k, v in params.items()) + "]",
+        "name": name,
+        "params": params,
+        "rounds": len(times),
+        "min": min(times),
+        "median": median,
+        "mean": statistics.fmean(times),
+    }
+    if ops:
+        row["ops"] = ops
+        row["ops_per_sec"] = ops / median if median > 0 else None
+    row.update(extra)
+    return row
+
+
+# --- Farm construction ---
+
+def ripe_pumpkin(level=1, rotten=False):
+    """A mature pumpkin whose rot roll is already done (layouts stay exactly as built)."""
+    p = Pumpkin(level)
+    p.current_growth = p.max_growth
+    p.fate_checked = True
+    if rotten:
+        p.make_rotten()
+    return p
+
+
+def crop_field(size, mix, storage, seed=0):
+    """size x size farm, every tile planted from `mix` with random progress (maturity spread over the run)."""
+    rng = random.Random(seed)
+    farm = Farm(size, size, storage, seed)
+    names = MIXES[mix]
+    for y in range(size):
+        for x in range(size):
+            crop = CROP_FACTORY[names[(x + y) % len(names)]]()
+            crop.current_growth = rng.uniform(0.0, crop.max_growth)
+            farm.plant_crop(x, y, crop)
+    return farm
+
+
+def fusion_layout(layout, size, storage):
+    """Adversarial pumpkin layouts for the fusion engine. Fusion is left pending (dirty), not run."""
+    farm = Farm(size, size, storage, 0)
+    plant = farm.plant_crop
+    if layout == "checkerboard":
+        # Ripe pumpkins on every other tile: maximal DP work, no square anywhere
+        for y in range(size):
+            for x in range(size):
+                plant(x, y, ripe_pumpkin() if (x + y) % 2 == 0 else CROP_FACTORY["carrot"]())
+    elif layout == "near_squares":
+        # 8x8 blocks of ripe pumpkins, each missing its bottom-right tile: squares of 7 everywhere
+        for y in range(size):
+            for x in range(size):
+                plant(x, y, CROP_FACTORY["carrot"]() if x % 8 == 7 and y % 8 == 7 else ripe_pumpkin())
+    elif layout == "nested":
+        # L2 pumpkins tiled 2x2: every 4x4 block must merge L2 -> L4
+        for y in range(0, size - size % 2, 2):
+            for x in range(0, size - size % 2, 2):
+                plant(x, y, ripe_pumpkin())
+                farm.fuse_pumpkins(x, y, 2)
+    elif layout == "rotten_holes":
+        # Ripe field with a sparse rotten pumpkin every 5th tile on a diagonal lattice
+        for y in range(size):
+            for x in range(size):
+                plant(x, y, ripe_pumpkin(rotten=(x * 2 + y) % 5 == 0))
+    elif layout == "full":
+        # One ripe field: a single fusion into the largest possible square
+        for y in range(size):
+            for x in range(size):
+                plant(x, y, ripe_pumpkin())
+    else:
+        raise ValueError(f"Unknown layout '{layout}'")
+    farm.fusion.mark_all()
+    return farm
+
+
+# --- Cases ---
+
+def bench_farm_update(sizes, storages, rounds, seconds=10.0):
+    """600 frames (10 s): every crop ripens in this window (rot rolls, fusion). Then the same again once idle."""
+    frames = int(seconds / FRAME_DT)
+    rows = []
+    for storage in storages:
+        for size in sizes:
+            for mix in MIXES:
+                state = {}
+                def setup():
+                    return crop_field(size, mix, storage)
+                def run(farm):
+                    for _ in range(frames):
+                        farm.update(FRAME_DT)
+                    state["farm"] = farm
+                    return farm.fusion_count
+                times, fusions = measure(run, setup, rounds)
+                params = {"size": size, "mix": mix, "storage": storage}
+                rows.append(result("farm_update", params, times, frames, unit="frame", fusions=fusions))
+
+                farm = state["farm"] # Everything ripe: per-frame cost should not depend on the grid
+                times, _ = measure(lambda _: [farm.update(FRAME_DT) for _ in range(frames)], None, rounds)
+                rows.append(result("farm_update_idle", params, times, frames, unit="frame"))
+    return rows
+
+
+def bench_fusion(size, storages, rounds):
+    rows = []
+    for storage in storages:
+        for layout in ("checkerboard", "near_squares", "nested", "rotten_holes", "full"):
+            def run(farm):
+                fused = 0
+                while True: # Until stable (nested merges can take several passes)
+                    n = farm.check_fusion()
+                    if not n:
+                        return fused
+                    fused += n
+            times, fused = measure(run, lambda: fusion_layout(layout, size, storage), rounds)
+            rows.append(result("check_fusion", {"layout": layout, "size": size, "storage": storage}, times,
+                               fusions=fused))
+    return rows
+
+
+def bench_roundtrip(sizes, storages, rounds):
+    rows = []
+    for storage in storages:
+        for size in sizes:
+            source = crop_field(size, "mixed", storage)
+            source.update(4.0) # Part ripe, part growing, some pumpkins rolled
+            params = {"size": size, "storage": storage}
+            times, data = measure(lambda _: source.to_dict(), None, rounds)
+            rows.append(result("to_dict", params, times, size * size, unit="tile"))
+            target = Farm(size, size, storage)
+            times, _ = measure(lambda _: target.load_from_data(data), None, rounds)
+            rows.append(result("load_from_data", params, times, size * size, unit="tile"))
+    return rows
+
+
+def bench_drone(size, storages, rounds):
+    """DroneAPI command throughput with the action delay disabled (events discarded per row, like headless)."""
+    def drone_for(storage):
+        farm = Farm(size, size, storage, 0)
+        return DroneAPI(farm, lambda text: None, sleep_func=lambda seconds: None)
+
+    def singles(drone):
+        before = drone.action_count
+        for _ in range(2): # Plant everything, ripen, harvest everything
+            for y in range(size):
+                for x in range(size):
+                    drone.plant("carrot")
+                    drone.move("East")
+                drone.move("South")
+                drone.events.clear()
+            drone.farm.update(3.0)
+            for y in range(size):
+                for x in range(size):
+                    drone.harvest()
+                    drone.move("East")
+                drone.move("South")
+                drone.events.clear()
+        return drone.action_count - before
+
+    def batches(drone):
+        before = drone.action_count
+        for _ in range(2):
+            drone.plant_rect(size, size, "carrot")
+            drone.farm.update(3.0)
+            drone.harvest_rect(size, size)
+            drone.events.clear()
+        return drone.action_count - before
+
+    rows = []
+    for storage in storages:
+        for mode, run in (("single", singles), ("batch", batches)):
+            times, actions = measure(run, lambda: drone_for(storage), rounds)
+            rows.append(result("drone_actions", {"mode": mode, "size": size, "storage": storage}, times, actions,
+                               unit="action"))
+    return rows
+
+
+# --- Reporting ---
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(rows, baseline_path):
+    """Print median ratios (new / old) for cases present in both runs."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        old = {row["id"]: row for row in json.load(f)["results"]}
+    print(f"\n{'CASE':<62} {'OLD ms':>10} {'NEW ms':>10} {'RATIO':>7}")
+    for row in rows:
+        base = old.get(row["id"])
+        if base is None:
+            continue
+        ratio = row["median"] / base["median"] if base["median"] > 0 else float("inf")
+        flag = "  slower" if ratio > 1.1 else ("  faster" if ratio < 0.9 else "")
+        print(f"{row['id']:<62} {base['median'] * 1000:>10.2f} {row['median'] * 1000:>10.2f} {ratio:>7.2f}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation core (Farm.update, fusion, saves, DroneAPI).")
+    parser.add_argument("--only", nargs="+", choices=("update", "fusion", "roundtrip", "drone"), default=None)
+    parser.add_argument("--sizes", type=int, nargs="+", default=None, help=f"Grid sizes (default: {SIZES})")
+    parser.add_argument("--quick", action="store_true", help=f"Sizes {QUICK_SIZES} only, 1 round")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--storage", nargs="+", default=["object", "columnar"], help="object | columnar")
+    parser.add_argument("--fusion-size", type=int, default=64)
+    parser.add_argument("--drone-size", type=int, default=32)
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results here")
+    parser.add_argument("--compare", metavar="JSON", default=None, help="Earlier --json output to compare against")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else SIZES)
+    rounds = 1 if args.quick else max(1, args.rounds)
+    only = set(args.only or ("update", "fusion", "roundtrip", "drone"))
+
+    rows = []
+    started = time.perf_counter()
+    if "update" in only:
+        rows += bench_farm_update(sizes, args.storage, rounds)
+    if "fusion" in only:
+        rows += bench_fusion(args.fusion_size, args.storage, rounds)
+    if "roundtrip" in only:
+        rows += bench_roundtrip([s for s in sizes if s <= 256], args.storage, rounds)
+    if "drone" in only:
+        rows += bench_drone(args.drone_size, args.storage, rounds)
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(rows)} cases in {elapsed:.1f}s")
+    print(f"{'CASE':<62} {'MEDIAN ms':>10} {'MIN ms':>10} {'OPS/S':>12}")
+    for row in rows:
+        ops = row.get("ops_per_sec")
+        print(f"{row['id']:<62} {row['median'] * 1000:>10.2f} {row['min'] * 1000:>10.2f} "
+              f"{(f'{ops:,.0f}' if ops else '-'):>12}")
+
+    if args.compare:
+        compare(rows, args.compare)
+    if args.json_path:
+        directory = os.path.dirname(args.json_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "results": rows}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
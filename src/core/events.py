@@ -0,0 +1,184 @@
+import threading
+import time
+from array import array
+
+# --- Drone -> UI event kinds ---
+EV_MOVE = 1
+EV_PLANT = 2
+EV_HARVEST = 3
+EV_BATCH = 4
+
+# Backpressure policies (what push() does when the ring is full)
+POLICY_DROP_OLDEST = "drop_oldest"       # Overwrite the oldest unread event
+POLICY_COALESCE_MOVES = "coalesce_moves" # Keep only the latest overflowing move; other events block
+POLICY_BLOCK = "block"                   # Wait for the UI to drain (up to block_timeout)
+POLICIES = (POLICY_DROP_OLDEST, POLICY_COALESCE_MOVES, POLICY_BLOCK)
+
+
+class EventRing:
+    """
+    Bounded single-producer / single-consumer event ring (无锁环形事件队列).
+
+    The drone thread is the only producer (push) and the UI thread the only
+    consumer (drain / clear). Records live in preallocated parallel arrays
+    (kind, x, y, amount, frame) plus one payload slot (crop name or batch data),
+    so a push allocates nothing. The producer only ever writes `_tail`, the consumer
+    only `_head`; under the GIL single attribute stores are atomic, so no lock.
+    drop_oldest lets the producer rewrite a slot the consumer is copying, so
+    every slot carries the index of the event in it (a seqlock): the writer
+    clears it before touching the fields and sets it after, the reader only
+    keeps a copy made while it held the expected index.
+    The one exception is the coalesced-move latch (coalesce_moves only): it is
+    shared by both sides and swapped under a small lock, taken on every move
+    push, so a parked move is published by exactly one side. Drop counts are
+    kept per side and summed by the read-only `dropped`.
+
+    Consumers receive (kind, x, y, payload, amount, frame) tuples; `frame` is
+    the Farm.frame the action was applied against (see DroneAPI).
+    """
+    def __init__(self, capacity=4096, policy=POLICY_COALESCE_MOVES, block_timeout=1.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown event policy '{policy}' (expected one of {POLICIES})")
+        size = 1
+        while size < capacity:
+            size <<= 1 # Power of two -> index with a mask
+        self.capacity = size
+        self._mask = size - 1
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self._kind = array('B', bytes(size))
+        self._x = array('i', bytes(4 * size))
+        self._y = array('i', bytes(4 * size))
+        self._amount = array('i', bytes(4 * size))
+        self._frame = array('I', bytes(4 * size))
+        self._payload = [None] * size
+        self._seq = array('q', [-1]) * size # Index of the event in each slot, -1 while it is being written
+
+        self._head = 0 # Next index to read  (consumer-owned)
+        self._tail = 0 # Next index to write (producer-owned)
+
+        # Coalesced move latch: (x, y, frame) of the last move parked while the ring was full, or None.
+        # Whoever publishes it (producer before its next event, consumer once the ring is empty) takes it.
+        self._latest_move = None
+        self._latch_lock = threading.Lock()
+
+        # Events lost, counted by the side that noticed (each written by one thread only)
+        self._dropped_push = 0  # Producer: ring full past the timeout
+        self._dropped_drain = 0 # Consumer: slots drop_oldest overwrote before they were read
+
+    @property
+    def dropped(self):
+        """Events lost to backpressure (stats)."""
+        return self._dropped_push + self._dropped_drain
+
+    def __len__(self):
+        return max(0, min(self._tail - self._head, self.capacity))
+
+    def __bool__(self):
+        return self._tail != self._head or self._latest_move is not None
+
+    def _take_move(self, head=None):
+        """
+        Atomically remove and return the parked move (x, y), or None.
+        With `head` (consumer), only while the ring is empty up to it: the
+        producer takes the latch before writing anything newer, so an empty
+        ring under the lock means every older event has been read.
+        """
+        with self._latch_lock:
+            latest = self._latest_move
+            if latest is None or (head is not None and head < self._tail):
+                return None
+            self._latest_move = None
+        return latest
+
+    # --- Producer side ---
+
+    def push(self, kind, x, y, payload=None, amount=0, frame=0):
+        if self.policy == POLICY_COALESCE_MOVES:
+            if kind == EV_MOVE:
+                if self._tail - self._head >= self.capacity:
+                    # Only the final position matters: park it in the latch
+                    with self._latch_lock:
+                        self._latest_move = (x, y, frame)
+                    return True
+                self._take_move() # This move supersedes any parked one
+            else:
+                # A parked move happened before this event: publish it first to keep order
+                parked = self._take_move()
+                if parked is not None and self._wait_for_space():
+                    self._write(EV_MOVE, parked[0], parked[1], None, 0, parked[2])
+            if not self._wait_for_space():
+                self._dropped_push += 1
+                return False
+        elif self.policy == POLICY_BLOCK:
+            if not self._wait_for_space():
+                self._dropped_push += 1
+                return False
+
+        self._write(kind, x, y, payload, amount, frame)
+        return True
+
+    def _write(self, kind, x, y, payload, amount, frame):
+        tail = self._tail
+        i = tail & self._mask
+        self._seq[i] = -1
+        self._kind[i] = kind
+        self._x[i] = x
+        self._y[i] = y
+        self._amount[i] = amount
+        self._payload[i] = payload
+        self._frame[i] = frame & 0xFFFFFFFF
+        self._seq[i] = tail
+        self._tail = tail + 1 # Publish
+
+    def _wait_for_space(self):
+        if self._tail - self._head < self.capacity:
+            return True
+        deadline = time.monotonic() + self.block_timeout
+        while self._tail - self._head >= self.capacity:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    # --- Consumer side ---
+
+    def drain(self, limit=None):
+        """Yield pending events oldest first; stops after `limit` events if given."""
+        mask = self._mask
+        cap = self.capacity
+        seq = self._seq
+        head = self._head
+        count = 0
+        while limit is None or count < limit:
+            tail = self._tail
+            if head >= tail:
+                break
+            if tail - head > cap:
+                # drop_oldest overran us: skip to the oldest slot still intact
+                self._dropped_drain += tail - cap - head
+                head = tail - cap
+            i = head & mask
+            if seq[i] == head:
+                record = (self._kind[i], self._x[i], self._y[i], self._payload[i], self._amount[i], self._frame[i])
+                if seq[i] == head: # Not rewritten while we copied it
+                    head += 1
+                    self._head = head
+                    count += 1
+                    yield record
+                    continue
+            # drop_oldest lapped this slot (or is rewriting it right now): it is lost, move past it
+            skip = max(head + 1, self._tail - cap)
+            self._dropped_drain += skip - head
+            head = self._head = skip
+
+        if limit is None or count < limit:
+            parked = self._take_move(head)
+            if parked is not None:
+                yield (EV_MOVE, parked[0], parked[1], None, 0, parked[2])
+
+    def clear(self):
+        """Discard everything pending (consumer side)."""
+        self._head = self._tail
+        self._take_move()
@@ -1,18 +1,50 @@
-from src.config import GRID_WIDTH, GRID_HEIGHT
+import random
+import threading
+from array import array
+from src.config import GRID_WIDTH, GRID_HEIGHT, GRID_STORAGE
 from src.entities.crops import CROP_FACTORY, Pumpkin, OccupiedSlot
+from src.core.fusion import FusionEngine
+from src.core.grid_store import (make_grid, ColumnarGrid, TYPE_CLASSES, TYPE_EMPTY, TYPE_OCCUPIED,
+                                  FLAG_ROTTEN, FLAG_FATE_CHECKED)
+from src.core.scheduler import MaturityScheduler
 
 class Farm:
-    def __init__(self):
-        self.width = GRID_WIDTH
-        self.height = GRID_HEIGHT
-        # Grid 存放 Crop 对象或 None
-        self.grid = [[None for _ in range(self.width)] for _ in range(self.height)]
+    def __init__(self, width=None, height=None, storage=None, seed=None):
+        self.width = width or GRID_WIDTH
+        self.height = height or GRID_HEIGHT
+        self.storage = storage or GRID_STORAGE
+        # Global farm clock (seconds of simulated time). Crop growth is derived from it.
+        self.time = 0.0
+        # Number of completed update() calls (plus one per recording start, see SessionRecorder).
+        # Drone actions hold `lock` (as update() does) and stamp their events with the frame
+        # they were applied after (session replay)
+        self.frame = 0
+        self.lock = threading.RLock()
+        # Grid 存放 Crop 对象或 None (grid[y][x]; backend see grid_store.py)
+        self.grid = make_grid(self.width, self.height, self.storage, clock=self)
+        # Seedable RNG for farm randomness (pumpkin rot rolls)
+        self.rng = random.Random(seed)
+        # Ripening times of growing crops; update() only handles entries that are due
+        self.scheduler = MaturityScheduler()
+        # Callbacks fn(ripe) with ripe = [(x, y, crop), ...], fired after rot rolls
+        self.maturity_listeners = []
+        self.fusion_count = 0 # Total fusions performed (stats)
+        # Incremental fusion: only regions marked dirty get re-checked
+        self.fusion = FusionEngine(self)
+        # Open FarmSnapshots (background saves) that need crop pre-images before maturity changes them
+        self._snapshots = ()
+        # Write-ahead journal (FarmJournal) recording every mutation, or None
+        self.journal = None
     
     def plant_crop(self, x, y, crop_obj):
         if 0 <= x < self.width and 0 <= y < self.height:
             # Prevent planting on occupied slots
             if self.grid[y][x] is None:
                 self.grid[y][x] = crop_obj
+                self.schedule_maturity(x, y)
+                self.fusion.mark_dirty(x, y)
+                if self.journal is not None:
+                    self.journal.plant(x, y, crop_obj)
                 return True
         return False
 
@@ -30,9 +62,14 @@ class Farm:
                         x, y = px, py
                     else:
                         self.grid[y][x] = None
+                        self.fusion.mark_dirty(x, y)
+                        if self.journal is not None:
+                            self.journal.clear(x, y)
                         return None
                 
                 if target_crop.is_ready:
+                    # Keep a standalone copy: columnar views go blank once their tiles are cleared
+                    target_crop = self.grid.detach(target_crop)
                     # Clear grid using helper
                     self.remove_crop(x, y, target_crop)
                     return target_crop
@@ -53,6 +90,9 @@ class Farm:
                         x, y = px, py
                     else:
                         self.grid[y][x] = None
+                        self.fusion.mark_dirty(x, y)
+                        if self.journal is not None:
+                            self.journal.clear(x, y)
                         return True
                 
                 self.remove_crop(x, y, target_crop)
@@ -67,228 +107,65 @@ class Farm:
                 for dx in range(crop_obj.size):
                     if 0 <= y+dy < self.height and 0 <= x+dx < self.width:
                         self.grid[y+dy][x+dx] = None
+            self.fusion.mark_dirty(x, y, crop_obj.size, crop_obj.size)
         else:
             self.grid[y][x] = None
+            self.fusion.mark_dirty(x, y)
+        if self.journal is not None:
+            self.journal.clear(x, y, getattr(crop_obj, "size", 1))
     
     def update(self, dt):
-        """让所有作物生长"""
-        for y in range(self.height):
-            for x in range(self.width):
-                crop = self.grid[y][x]
-                if crop and not isinstance(crop, OccupiedSlot):
-                    crop.grow(dt)
+        """让所有作物生长 (Growth follows self.time; only due maturity events are processed)"""
+        with self.lock: # A drone action lands entirely before or after a frame
+            self._update(dt)
+            self.frame += 1
+
+    def _update(self, dt):
+        now = self.time + dt
+        ripe = []
+        for idx, token in self.scheduler.pop_due(now):
+            y, x = divmod(idx, self.width)
+            if self.grid.tile_token(x, y) != token:
+                continue # Harvested / destroyed / replanted since scheduling
+            crop = self.grid[y][x]
+            for snap in self._snapshots:
+                snap.preserve(idx, crop) # Before growth snap / rot roll
+            crop.current_growth = crop.max_growth # Snap: no float drift around the due time
+            ripe.append((idx, x, y, crop))
+        if ripe:
+            ripe.sort(key=lambda r: r[0]) # Tile order, independent of heap ties
+            self.on_crops_matured([(x, y, crop) for _, x, y, crop in ripe])
+        # Publish the new time only after rot rolls, so nobody sees a ripe pumpkin before its fate
+        self.time = now
         
-        # Check for Infinite Fusion
+        # Check for Infinite Fusion (no-op unless something changed)
         self.check_fusion()
 
+    def schedule_maturity(self, x, y):
+        """Bind the crop at (x, y) to the farm clock and queue its ripening time."""
+        crop = self.grid[y][x]
+        crop.bind_clock(self)
+        if not crop.is_ready:
+            self.scheduler.schedule(self.time + crop.ripe_in, y * self.width + x, self.grid.tile_token(x, y))
+
+    def on_crops_matured(self, ripe):
+        """Roll rot for all newly ripe pumpkins in one batch, flag them for fusion, then notify listeners."""
+        pumpkins = [(x, y, c) for x, y, c in ripe if isinstance(c, Pumpkin) and not c.fate_checked]
+        rolls = [self.rng.random() for _ in pumpkins]
+        for (x, y, crop), roll in zip(pumpkins, rolls):
+            crop.roll_fate(roll)
+            if self.journal is not None:
+                self.journal.fate(x, y, crop.is_rotten)
+            # Maturity (and rot) can enable/block fusion
+            self.fusion.mark_dirty(x, y, crop.size, crop.size)
+        for listener in self.maturity_listeners:
+            listener(ripe)
+
     def check_fusion(self):
-        used_crops = set() # Track processed root instances to avoid double-processing
-        
-        # We prefer finding largest squares first to avoid suboptimal greedy consumes?
-        # Standard loop (y, x) with greedy K is usually fine if we skip 'used' tiles?
-        # Actually, if we have L2+L2+L2+L2 -> L4, the (x,y) of the L4 is the top-left using finding (0,0)?
-        
-        # We need a 'used_tiles' to skip processed areas in this frame?
-        # Actually, just modifying the grid in-place invalidates subsequent checks.
-        # But we must be careful.
-        # Let's use a restart approach or careful iteration.
-        # Since we modify the grid, breaking and waiting for next update frame is simplest/safest.
-        # But if we want to fuse multiple distinct blobs, we can continue if we track used tiles.
-        
-        used_tiles = set()
-        
-        for y in range(self.height):
-            for x in range(self.width):
-                if (x, y) in used_tiles: continue
-                
-                # Fast check: Tile must be pumpkin and ready
-                c0 = self.grid[y][x]
-                if not c0: continue
-                
-                # Resolve root
-                root0 = c0
-                if isinstance(c0, OccupiedSlot):
-                    # We usually iterate top-left. If we hit an occupied slot, 
-                    # its parent might be processed? Or maybe we are scanning inside a mega pumpkin.
-                    # We should skip OccupiedSlots and only process from Roots?
-                    # NO. User wants L2 + L2. L2 starts at (0,0). (0,1) is occupied.
-                    # If we fuse (0,0) to (3,3), we include (0,0).
-                    # If we start scan at (0,0), we find the pumpkin.
-                    pass
-                
-                # Logic: Scan for largest valid KxK starting at (x,y)
-                max_k = 0
-                limit = min(self.width - x, self.height - y)
-                
-                # Check from K=limit down to 2? Or 2 to limit?
-                # User wants "Maximum area".
-                # If we have 4x4. We check K=2 (TopLeft). It is valid.
-                # If we greedily take K=2, we miss K=4?
-                # So we must check locally MAX K.
-                
-                found_k_size = 0
-                
-                for k in range(limit, 1, -1): # decreasing k checks for biggest first
-                    # Validate Square Area
-                    valid_square = True
-                    involved_roots = set()
-                    
-                    for dy in range(k):
-                        for dx in range(k):
-                            tx, ty = x + dx, y + dy
-                            if (tx, ty) in used_tiles:
-                                valid_square = False; break
-                            
-                            tile_c = self.grid[ty][tx]
-                            
-                            # MUST be Pumpkin-related
-                            if not tile_c: 
-                                valid_square = False; break
-                            
-                            r = tile_c
-                            is_pumpkin = False
-                            if isinstance(r, Pumpkin): is_pumpkin = True
-                            elif isinstance(r, OccupiedSlot) and isinstance(r.parent, Pumpkin):
-                                r = r.parent
-                                is_pumpkin = True
-                            
-                            if not is_pumpkin:
-                                valid_square = False; break
-                            
-                            # Must be Mature & Healthy
-                            # Note: check r (root) for status
-                            if not r.is_ready or r.is_rotten:
-                                valid_square = False; break
-                                
-                            involved_roots.add(r)
-                            
-                        if not valid_square: continue
-                    
-                    if not valid_square: continue # Try smaller K
-                    
-                    # INTEGRITY CHECK:
-                    # Are all involved_roots FULLY contained in our (x, y, k, k) rect?
-                    # We cannot chop a 4x4 pumpkin in half to make a 2x2.
-                    # (Although shrinking is physically possible, game logic wise we merge UP not DOWN)
-                    integrity_ok = True
-                    
-                    # Define our rect
-                    rect_x1, rect_y1 = x, y
-                    rect_x2, rect_y2 = x + k, y + k
-                    
-                    for root in involved_roots:
-                        # Root absolute rect
-                        # root is at grid[ry][rx]? No, we need its coords.
-                        # We don't store x,y in Pumpkin logic explicitly except implicitly by grid pos?
-                        # Wait, OccupiedSlot knows parent_pos.
-                        # Pixel/Root Pumpkin doesn't know its own X,Y?
-                        # We need to find root pos.
-                        # Sol: Iterate involved_roots, find their position? 
-                        # Or, ensuring that: Size of involved_roots <= K?
-                        # No.
-                        # Simple check:
-                        # Area of fused rect = K*K.
-                        # Sum of areas of roots = ???
-                        # If a root spills out, then Sum_Area_Roots > K*K? 
-                        # (Since we verified every tile in K*K IS a root part).
-                        # If we touch a root, we touch part of it.
-                        # If that root has parts outside, then that root is "cut".
-                        # How to detect?
-                        # For each tile of the root, is it inside our rect?
-                        # Getting all tiles of a root is easy: root has .level (size).
-                        # But we need root's origin (rx, ry).
-                        
-                        # We can find root origin by scanning `involved_roots` on grid? Expensive.
-                        # Hack: OccupiedSlot stores parent_pos. What if we hit the Root directly?
-                        # Root needs to know its own pos?
-                        # We can deduce validness:
-                        # If 'root' is L2. We must have found 4 tiles pointing to this root.
-                        # We simply count 'tiles in selection pointing to root' vs 'root.size^2'.
-                        pass
-                    
-                    # Count frequency of each root in the selection
-                    root_counts = {}
-                    for dy in range(k):
-                        for dx in range(k):
-                            tc = self.grid[y+dy][x+dx]
-                            r = tc
-                            if isinstance(tc, OccupiedSlot): r = tc.parent
-                            root_counts[r] = root_counts.get(r, 0) + 1
-                    
-                    for root, count in root_counts.items():
-                        needed = root.size * root.size
-                        if count < needed:
-                            integrity_ok = False; break
-                    
-                    if not integrity_ok:
-                        continue # Integrity fail, try smaller K?
-                        
-                    # If we reached here, K is valid and integrity is OK.
-                    # PATIENCE CHECK (Perimeter)
-                    patience_needed = False
-                    min_px, max_px = max(0, x-1), min(self.width, x+k+1)
-                    min_py, max_py = max(0, y-1), min(self.height, y+k+1)
-                    
-                    for py in range(min_py, max_py):
-                        for px in range(min_px, max_px):
-                            if x <= px < x+k and y <= py < y+k: continue
-                            
-                            pc = self.grid[py][px]
-                            if pc and (isinstance(pc, Pumpkin) or (isinstance(pc, OccupiedSlot) and isinstance(pc.parent, Pumpkin))):
-                                # Get root
-                                pr = pc
-                                if isinstance(pc, OccupiedSlot): pr = pc.parent
-                                
-                                # Wait if neighbor is GROWING
-                                if not pr.is_ready and not pr.is_rotten:
-                                    patience_needed = True
-                                    break
-                        if patience_needed: break
-                    
-                    if patience_needed:
-                        # Valid square but waiting for neighbor.
-                        # Stop searching K, wait.
-                        break 
-                    else:
-                        found_k_size = k
-                        break # Found max K!
-                
-                if found_k_size > 0:
-                    # Execute Fusion
-                    # Check if we are "fusing" a single existing pumpkin? (e.g. 2x2 L2 found as 2x2 sq)
-                    # If logic finds 1 root and root.size == k, then we are just effectively detecting the existing pumpkin.
-                    # We should skip fusion if result is same level.
-                    # UNLESS we are upgrading? But we are fusing area KxK into Level K.
-                    # If existing is Level K, No-op.
-                    
-                    # Check existing composition
-                    # We already computed involved_roots and integrity.
-                    # If len(involved_roots) == 1 and list(involved_roots)[0].level == found_k_size:
-                    #     already fused.
-                    
-                    # Re-detect singular optimization
-                    unique_roots = set()
-                    for dy in range(found_k_size):
-                        for dx in range(found_k_size):
-                            tc = self.grid[y+dy][x+dx]
-                            r = tc
-                            if isinstance(tc, OccupiedSlot): r = tc.parent
-                            unique_roots.add(r)
-                            
-                    if len(unique_roots) == 1:
-                        existing = list(unique_roots)[0]
-                        if existing.level == found_k_size:
-                            # Already a Level K, skip processing
-                            # Mark as used to avoid re-scanning
-                             for dy in range(found_k_size):
-                                for dx in range(found_k_size):
-                                    used_tiles.add((x+dx, y+dy))
-                             continue
-                    
-                    self.fuse_pumpkins(x, y, found_k_size)
-                    for dy in range(found_k_size):
-                        for dx in range(found_k_size):
-                            used_tiles.add((x+dx, y+dy))
+        """Fuse mature pumpkins in regions that changed since the last call (see FusionEngine)."""
+        fused = self.fusion.run()
+        self.fusion_count += fused
+        return fused
 
     def fuse_pumpkins(self, x, y, size):
         mega = Pumpkin(level=size)
@@ -299,6 +176,10 @@ class Farm:
             for dx in range(size):
                 if dx == 0 and dy == 0: continue
                 self.grid[y+dy][x+dx] = OccupiedSlot(mega, x, y)
+        # The new mega pumpkin may merge further with its neighbours
+        self.fusion.mark_dirty(x, y, size, size)
+        if self.journal is not None:
+            self.journal.fuse(x, y, size)
 
     def to_dict(self):
         grid_data = []
@@ -320,7 +201,8 @@ class Farm:
 
     def load_from_data(self, grid_data):
         # 1. First pass: Create main crops
-        self.grid = [[None for _ in range(self.width)] for _ in range(self.height)]
+        self.grid = make_grid(self.width, self.height, self.storage, clock=self)
+        self.scheduler.clear()
         deferred_slots = []
         
         for y in range(self.height):
@@ -348,6 +230,7 @@ class Farm:
                              new_crop.update_stats()
                              
                         self.grid[y][x] = new_crop
+                        self.schedule_maturity(x, y)
 
         # 2. Second pass: Reconnect OccupiedSlots
         # Actually, OccupiedSlot logic is deterministic based on parent N*N.
@@ -368,9 +251,166 @@ class Farm:
                             if 0 <= y+dy < self.height and 0 <= x+dx < self.width:
                                 self.grid[y+dy][x+dx] = OccupiedSlot(c, x, y)
 
+        # Grid replaced wholesale: rebuild the fusion table
+        self.fusion.reset()
+
+    # --- Columnar snapshot (binary save format, see save_format.py) ---
+
+    def to_columns(self):
+        """Per-tile arrays of the whole grid, see grid_columns()."""
+        return grid_columns(self.grid, self.width, self.height, self.time)
+
+    def snapshot(self):
+        """Frozen copy of the grid at the current time, for serializing on another thread (see FarmSnapshot)."""
+        return FarmSnapshot(self)
+
+    def load_from_columns(self, width, height, types, growth, levels, flags, roots):
+        """Inverse of to_columns: types / flags bytes-like, growth / levels / roots indexable sequences (arrays)."""
+        self.width, self.height = width, height
+        self.grid = make_grid(width, height, self.storage, clock=self)
+        self.scheduler.clear()
+        grid = self.grid
+
+        if isinstance(grid, ColumnarGrid):
+            # Same layout as the file: copy the columns straight in
+            grid.type_id = array('B', bytes(types))
+            grid.growth = array('d', growth)
+            grid.level = array('H', levels)
+            grid.flags = array('B', bytes(flags))
+            grid.since[:] = array('d', [self.time]) * (width * height)
+            for root in roots:
+                level = levels[root]
+                ry, rx = divmod(root, width)
+                for dy in range(level):
+                    base = (ry + dy) * width + rx
+                    for dx in range(level):
+                        if dx or dy:
+                            grid.parent[base + dx] = root
+            # Bulk version of schedule_maturity: no views needed, ripening time comes from the columns
+            max_growth = {tid: cls().max_growth for tid, cls in TYPE_CLASSES.items()}
+            gen = grid.gen
+            for i in range(width * height):
+                tid = types[i]
+                if tid != TYPE_EMPTY and tid != TYPE_OCCUPIED and growth[i] < max_growth[tid]:
+                    self.scheduler.schedule(self.time + max_growth[tid] - growth[i], i, gen[i])
+        else:
+            rows = list(grid)
+            for i in range(width * height):
+                tid = types[i]
+                if tid == TYPE_EMPTY or tid == TYPE_OCCUPIED:
+                    continue
+                crop_class = TYPE_CLASSES.get(tid)
+                if crop_class is None:
+                    continue
+                crop = crop_class()
+                crop.clock = self # Bound directly (bind_clock would re-read the fresh growth first)
+                crop.current_growth = g = growth[i]
+                if hasattr(crop, "level"):
+                    crop.level = crop.size = levels[i]
+                    crop.is_rotten = bool(flags[i] & FLAG_ROTTEN)
+                    crop.fate_checked = bool(flags[i] & FLAG_FATE_CHECKED)
+                    crop.update_stats()
+                y, x = divmod(i, width)
+                rows[y][x] = crop
+                if g < crop.max_growth:
+                    self.scheduler.schedule(self.time + crop.max_growth - g, i, crop) # ObjectGrid token = the crop
+            for root in roots:
+                ry, rx = divmod(root, width)
+                crop = grid[ry][rx]
+                if crop is None:
+                    continue
+                for dy in range(crop.size):
+                    for dx in range(crop.size):
+                        if dx or dy:
+                            grid[ry + dy][rx + dx] = OccupiedSlot(crop, rx, ry)
+
+        # Grid replaced wholesale: rebuild the fusion table
+        self.fusion.reset()
+
     def has_any_crop(self):
-        for y in range(self.height):
-            for x in range(self.width):
-                if self.grid[y][x] is not None:
-                    return True
-        return False
+        return self.grid.has_any()
+
+
+def grid_columns(grid, width, height, now, before=None):
+    """
+    Per-tile arrays (row-major) describing a grid at clock time `now`:
+    types (bytes: TYPE_IDS / TYPE_OCCUPIED / TYPE_EMPTY), growth (array 'd'),
+    levels (array 'H'), flags (bytearray: FLAG_ROTTEN | FLAG_FATE_CHECKED),
+    roots (array 'I': tile indices of mega pumpkins, level > 1).
+    Only root tiles are visited; occupied tiles are implied by their root.
+    `before` = {tile index: (growth, is_rotten, fate_checked)} overrides crops changed since `now`.
+    """
+    w = width
+    n = w * height
+    types = grid.type_codes()
+    if isinstance(grid, ColumnarGrid):
+        # Already columns: copy them, only growth needs bringing up to `now`
+        growth = array('d', grid.growth)
+        since = grid.since
+        max_growth = {tid: cls().max_growth for tid, cls in TYPE_CLASSES.items()}
+        roots = array('I')
+        level = grid.level
+        for i in range(n):
+            tid = types[i]
+            if tid == TYPE_EMPTY or tid == TYPE_OCCUPIED:
+                continue
+            mg = max_growth[tid]
+            if growth[i] < mg:
+                growth[i] = min(mg, growth[i] + (now - since[i]))
+            if level[i] > 1:
+                roots.append(i)
+        return types, growth, array('H', level), bytearray(grid.flags.tobytes()), roots
+
+    growth = array('d', bytes(8 * n))
+    levels = array('H', [1]) * n
+    flags = bytearray(n)
+    roots = array('I')
+    before = before or {}
+    for x, y, crop in grid.iter_roots():
+        i = y * w + x
+        state = (crop.growth_at(now), getattr(crop, "is_rotten", False), getattr(crop, "fate_checked", False))
+        # Re-check after reading: a pre-image is always stored before the crop is touched
+        state = before.get(i, state)
+        growth[i] = state[0]
+        level = getattr(crop, "level", 1)
+        if level > 1:
+            levels[i] = level
+            roots.append(i)
+        if state[1]: flags[i] |= FLAG_ROTTEN
+        if state[2]: flags[i] |= FLAG_FATE_CHECKED
+    return types, growth, levels, flags, roots
+
+
+class FarmSnapshot:
+    """
+    The farm grid frozen at one moment (存档快照), cheap to take on the main thread.
+
+    Grid rows (object backend) or columns (columnar backend) are copied; crop
+    objects are shared, copy-on-write style. Tiles being replaced does not
+    affect the copy, and the only in-place change to a crop object (maturity
+    in Farm.update: growth snap + rot roll) first hands the crop's state to
+    every open snapshot via preserve(). to_columns() therefore returns the
+    farm exactly as it was at `time`, even while the simulation keeps running.
+    close() once done.
+    """
+    def __init__(self, farm):
+        self.width = farm.width
+        self.height = farm.height
+        self.time = farm.time
+        self.grid = farm.grid.snapshot()
+        self._farm = farm
+        self._before = {} # tile index -> (growth, is_rotten, fate_checked) at `time`
+        if not isinstance(self.grid, ColumnarGrid): # Columns are real copies, nothing to track
+            farm._snapshots = farm._snapshots + (self,)
+
+    def preserve(self, idx, crop):
+        if idx not in self._before:
+            self._before[idx] = (crop.growth_at(self.time), getattr(crop, "is_rotten", False),
+                                 getattr(crop, "fate_checked", False))
+
+    def close(self):
+        farm = self._farm
+        farm._snapshots = tuple(s for s in farm._snapshots if s is not self)
+
+    def to_columns(self):
+        return grid_columns(self.grid, self.width, self.height, self.time, self._before)
@@ -0,0 +1,208 @@
+import heapq
+from src.entities.crops import Pumpkin, OccupiedSlot
+
+
+def fusion_root(tile):
+    """Return the root Pumpkin behind a grid tile, or None if the tile is not pumpkin-related."""
+    if isinstance(tile, Pumpkin):
+        return tile
+    if isinstance(tile, OccupiedSlot) and isinstance(tile.parent, Pumpkin):
+        return tile.parent
+    return None
+
+
+class FusionEngine:
+    """
+    Incremental pumpkin fusion (增量融合引擎).
+
+    Instead of rescanning every origin / every K each frame, the farm reports
+    changed regions via `mark_dirty` (plant, harvest, destroy, maturity, rot).
+    `run()` then:
+    1. Refreshes a maximal-square DP table (`squares[y][x]` = side of the largest
+       all-mature, healthy pumpkin square whose top-left is (x, y)), walking only
+       the cells whose value can change.
+    2. Re-runs the greedy fusion rules only for origins whose square (plus the
+       one-tile patience ring) can touch a dirty tile.
+    When nothing changed, `run()` is a no-op.
+    """
+    def __init__(self, farm):
+        self.farm = farm
+        self.reset()
+
+    def reset(self):
+        """Drop all cached state and schedule a full rebuild (used after load)."""
+        self.width = self.farm.width
+        self.height = self.farm.height
+        self.squares = [[0] * self.width for _ in range(self.height)]
+        self.max_square = 0 # Upper bound of any value in `squares`
+        self._dirty = [] # Queue of (x0, y0, x1, y1) inclusive rects
+        self.mark_all()
+
+    def mark_dirty(self, x, y, w=1, h=1):
+        """Queue the w*h region at (x, y) for re-checking."""
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(self.width, x + w) - 1, min(self.height, y + h) - 1
+        if x0 <= x1 and y0 <= y1:
+            self._dirty.append((x0, y0, x1, y1))
+
+    def mark_all(self):
+        self.mark_dirty(0, 0, self.width, self.height)
+
+    @property
+    def has_pending(self):
+        return bool(self._dirty)
+
+    # --- DP table ---
+
+    def _tile_ok(self, x, y):
+        root = fusion_root(self.farm.grid[y][x])
+        return root is not None and root.is_ready and not root.is_rotten
+
+    def _compute_square(self, x, y):
+        if not self._tile_ok(x, y):
+            return 0
+        sq = self.squares
+        right = sq[y][x + 1] if x + 1 < self.width else 0
+        down = sq[y + 1][x] if y + 1 < self.height else 0
+        diag = sq[y + 1][x + 1] if (x + 1 < self.width and y + 1 < self.height) else 0
+        return 1 + min(right, down, diag)
+
+    def _refresh_squares(self, rects):
+        """
+        Recompute DP cells inside `rects`, then propagate up/left only while values change.
+        A cell depends on its right/down/diagonal neighbours, which all have a larger
+        linear index, so popping from a max-heap on (y * width + x) is a valid order.
+        """
+        w = self.width
+        heap = []
+        queued = set()
+        for x0, y0, x1, y1 in rects:
+            for y in range(y0, y1 + 1):
+                for x in range(x0, x1 + 1):
+                    idx = y * w + x
+                    if idx not in queued:
+                        queued.add(idx)
+                        heap.append(-idx)
+        heapq.heapify(heap)
+
+        while heap:
+            idx = -heapq.heappop(heap)
+            y, x = divmod(idx, w)
+            new = self._compute_square(x, y)
+            if new == self.squares[y][x]:
+                continue
+            self.squares[y][x] = new
+            if new > self.max_square:
+                self.max_square = new
+            # Only up/left neighbours can depend on this cell
+            for nx, ny in ((x - 1, y), (x, y - 1), (x - 1, y - 1)):
+                if nx >= 0 and ny >= 0:
+                    nidx = ny * w + nx
+                    if nidx not in queued:
+                        queued.add(nidx)
+                        heapq.heappush(heap, -nidx)
+
+    # --- Fusion pass ---
+
+    def _candidate_origins(self, rects):
+        """
+        Origins whose square or patience ring may overlap a dirty tile.
+        A square of side k at (ox, oy) plus its ring spans [ox-1, ox+k], so a dirty
+        tile at tx is reachable from ox in [tx - max_square, tx + 1].
+        Only root pumpkins can be origins: a square starting on an OccupiedSlot would
+        always cut its parent (the parent origin lies up/left, outside the square).
+        """
+        reach = self.max_square
+        grid = self.farm.grid
+        sq = self.squares
+        origins = set()
+        for x0, y0, x1, y1 in rects:
+            ox0, oy0 = max(0, x0 - reach), max(0, y0 - reach)
+            ox1, oy1 = min(self.width - 1, x1 + 1), min(self.height - 1, y1 + 1)
+            for oy in range(oy0, oy1 + 1):
+                row_sq = sq[oy]
+                row = grid[oy]
+                for ox in range(ox0, ox1 + 1):
+                    if row_sq[ox] >= 2 and isinstance(row[ox], Pumpkin):
+                        origins.add((oy, ox))
+        return sorted(origins) # Row-major, same order as the legacy full scan
+
+    def _integrity_ok(self, x, y, k):
+        """Every pumpkin touched by the KxK square must lie fully inside it (merge UP, never chop)."""
+        grid = self.farm.grid
+        x2, y2 = x + k, y + k
+        for ty in range(y, y2):
+            row = grid[ty]
+            for tx in range(x, x2):
+                tile = row[tx]
+                if isinstance(tile, OccupiedSlot):
+                    rx, ry = tile.parent_pos
+                    size = tile.parent.size
+                else:
+                    rx, ry = tx, ty
+                    size = tile.size
+                if rx < x or ry < y or rx + size > x2 or ry + size > y2:
+                    return False
+        return True
+
+    def _needs_patience(self, x, y, k):
+        """True if a growing (not ready, not rotten) pumpkin touches the square's perimeter."""
+        grid = self.farm.grid
+        min_px, max_px = max(0, x - 1), min(self.width, x + k + 1)
+        min_py, max_py = max(0, y - 1), min(self.height, y + k + 1)
+        for py in range(min_py, max_py):
+            inside_row = y <= py < y + k
+            for px in range(min_px, max_px):
+                if inside_row and x <= px < x + k:
+                    continue
+                root = fusion_root(grid[py][px])
+                if root is not None and not root.is_ready and not root.is_rotten:
+                    return True
+        return False
+
+    @staticmethod
+    def _overlaps_used(x, y, k, used_tiles):
+        for dy in range(k):
+            for dx in range(k):
+                if (x + dx, y + dy) in used_tiles:
+                    return True
+        return False
+
+    def run(self):
+        """Process queued changes. Returns the number of fusions performed."""
+        if not self._dirty:
+            return 0
+        rects = self._dirty
+        self._dirty = []
+
+        self._refresh_squares(rects)
+
+        fused = 0
+        used_tiles = set()
+        for y, x in self._candidate_origins(rects):
+            if (x, y) in used_tiles:
+                continue
+
+            found_k = 0
+            for k in range(self.squares[y][x], 1, -1): # Biggest first
+                if used_tiles and self._overlaps_used(x, y, k, used_tiles):
+                    continue
+                if not self._integrity_ok(x, y, k):
+                    continue
+                if self._needs_patience(x, y, k):
+                    break # Valid square, but wait for the growing neighbour
+                found_k = k
+                break
+
+            if found_k == 0:
+                continue
+
+            root = self.farm.grid[y][x]
+            if root.level != found_k:
+                self.farm.fuse_pumpkins(x, y, found_k)
+                fused += 1
+            # else: already a Level K pumpkin, nothing to do
+            for dy in range(found_k):
+                for dx in range(found_k):
+                    used_tiles.add((x + dx, y + dy))
+        return fused
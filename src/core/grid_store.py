@@ -0,0 +1,347 @@
+from array import array
+from src.entities.crops import CROP_FACTORY, OccupiedSlot
+
+# --- Grid Storage Backends ---
+# Farm.grid keeps the `grid[y][x]` contract for every backend:
+#   ObjectGrid   : the classic list of lists holding Crop / OccupiedSlot / None
+#   ColumnarGrid : parallel typed arrays, Crop objects are thin views built on demand
+
+# Type ids for the columnar backend (0 = empty tile)
+TYPE_EMPTY = 0
+TYPE_OCCUPIED = 255
+TYPE_IDS = {name: i + 1 for i, name in enumerate(CROP_FACTORY)}
+TYPE_CLASSES = {i + 1: cls for i, cls in enumerate(CROP_FACTORY.values())}
+CLASS_TYPE_IDS = {cls: i + 1 for i, cls in enumerate(CROP_FACTORY.values())}
+
+# Bits of ColumnarGrid.flags
+FLAG_ROTTEN = 1
+FLAG_FATE_CHECKED = 2
+
+
+class ObjectGrid(list):
+    """Default backend: one Python object per tile (rows are plain lists)."""
+    def __init__(self, width, height, clock=None):
+        super().__init__([None] * width for _ in range(height))
+        self.width = width
+        self.height = height
+        self.clock = clock # Crops bind themselves (Crop.bind_clock) when planted
+
+    def tile_token(self, x, y):
+        """Identity of whatever occupies (x, y); changes whenever the tile is rewritten."""
+        return self[y][x]
+
+    def iter_roots(self):
+        """Yield (x, y, crop) for every tile holding a main crop (skips empty tiles and OccupiedSlots)."""
+        for y, row in enumerate(self):
+            for x, crop in enumerate(row):
+                if crop is not None and not isinstance(crop, OccupiedSlot):
+                    yield x, y, crop
+
+    def iter_roots_in(self, x0, y0, x1, y1):
+        """Like iter_roots, limited to crops overlapping the half-open tile range [x0, x1) x [y0, y1)."""
+        for y in range(y0, y1):
+            row = self[y]
+            for x in range(x0, x1):
+                crop = row[x]
+                if crop is None:
+                    continue
+                if isinstance(crop, OccupiedSlot):
+                    px, py = crop.parent_pos
+                    # Roots inside the range are yielded on their own tile; report outside ones once,
+                    # from the first covered tile we meet (top-left-most in range)
+                    if (px < x0 or py < y0) and x == max(x0, px) and y == max(y0, py):
+                        yield px, py, crop.parent
+                else:
+                    yield x, y, crop
+
+    def type_codes(self):
+        """One byte per tile, row-major: TYPE_IDS of the crop, TYPE_EMPTY or TYPE_OCCUPIED."""
+        codes = bytearray(self.width * self.height)
+        i = 0
+        for row in self:
+            for crop in row:
+                if crop is not None:
+                    codes[i] = TYPE_OCCUPIED if isinstance(crop, OccupiedSlot) else CLASS_TYPE_IDS.get(type(crop), TYPE_OCCUPIED)
+                i += 1
+        return bytes(codes)
+
+    def has_any(self):
+        return any(c is not None for row in self for c in row)
+
+    def snapshot(self):
+        """Copy of the tile layout (rows copied, crop objects shared)."""
+        snap = ObjectGrid.__new__(ObjectGrid)
+        list.__init__(snap, [row[:] for row in self])
+        snap.width = self.width
+        snap.height = self.height
+        snap.clock = None
+        return snap
+
+    def detach(self, crop):
+        """Return a crop object that stays valid after its tiles are cleared."""
+        return crop
+
+
+class _CropView:
+    """
+    Mixin for columnar views. Mutable state (growth, rot, fate) reads/writes the
+    backing arrays; static data (name, max_growth, level) is copied at creation.
+    """
+    @property
+    def current_growth(self):
+        store, idx = self._store, self._idx
+        g = store.growth[idx]
+        if store.clock is not None and g < self.max_growth:
+            g = min(self.max_growth, g + (store.clock.time - store.since[idx]))
+        return g
+
+    @current_growth.setter
+    def current_growth(self, value):
+        store, idx = self._store, self._idx
+        store.growth[idx] = value
+        if store.clock is not None:
+            store.since[idx] = store.clock.time
+
+    @property
+    def clock(self):
+        return self._store.clock
+
+    @property
+    def _growth(self):
+        return self._store.growth[self._idx]
+
+    @_growth.setter
+    def _growth(self, value):
+        self._store.growth[self._idx] = value
+
+    def bind_clock(self, clock):
+        pass # Views follow the store's clock
+
+    @property
+    def is_rotten(self):
+        return bool(self._store.flags[self._idx] & FLAG_ROTTEN)
+
+    @is_rotten.setter
+    def is_rotten(self, value):
+        self._store._set_flag(self._idx, FLAG_ROTTEN, value)
+
+    @property
+    def fate_checked(self):
+        return bool(self._store.flags[self._idx] & FLAG_FATE_CHECKED)
+
+    @fate_checked.setter
+    def fate_checked(self, value):
+        self._store._set_flag(self._idx, FLAG_FATE_CHECKED, value)
+
+    def __eq__(self, other):
+        if isinstance(other, _CropView):
+            return self._store is other._store and self._idx == other._idx
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((id(self._store), self._idx))
+
+    def detach(self):
+        """Materialize a standalone Crop with the current values."""
+        crop = self._crop_cls()
+        if hasattr(crop, "level"):
+            crop.level = self.level
+            crop.size = self.level
+        crop.current_growth = self.current_growth
+        if hasattr(crop, "is_rotten"):
+            crop.is_rotten = self.is_rotten
+            crop.fate_checked = self.fate_checked
+            crop.update_stats()
+        return crop
+
+
+_VIEW_CLASSES = {}
+_PROTOTYPES = {}
+
+def _view_class(crop_cls):
+    vc = _VIEW_CLASSES.get(crop_cls)
+    if vc is None:
+        vc = type(f"{crop_cls.__name__}View", (_CropView, crop_cls), {"_crop_cls": crop_cls})
+        _VIEW_CLASSES[crop_cls] = vc
+        _PROTOTYPES[crop_cls] = crop_cls()
+    return vc
+
+
+class _ColumnarRow:
+    """Row proxy so `grid[y][x]` reads and writes keep working."""
+    __slots__ = ("store", "y")
+
+    def __init__(self, store, y):
+        self.store = store
+        self.y = y
+
+    def __getitem__(self, x):
+        return self.store.get(x, self.y)
+
+    def __setitem__(self, x, value):
+        self.store.set(x, self.y, value)
+
+    def __len__(self):
+        return self.store.width
+
+    def __iter__(self):
+        for x in range(self.store.width):
+            yield self.store.get(x, self.y)
+
+
+class ColumnarGrid:
+    """
+    Struct-of-arrays backend (列式存储). Per tile:
+    type_id (B), growth (d), level (H), flags (B: rotten / fate checked), parent (i: root index or -1),
+    plus since (d: clock time when `growth` was recorded) and gen (I: rewrite counter for tile tokens).
+    About 28 bytes per tile instead of a Python object (+ OccupiedSlot) per tile.
+    """
+    def __init__(self, width, height, clock=None):
+        self.width = width
+        self.height = height
+        self.clock = clock
+        n = width * height
+        self.type_id = array('B', bytes(n))
+        self.growth = array('d', bytes(8 * n))
+        self.level = array('H', [1]) * n
+        self.flags = array('B', bytes(n))
+        self.parent = array('i', [-1]) * n
+        self.since = array('d', bytes(8 * n))
+        self.gen = array('I', bytes(4 * n))
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        if not 0 <= y < self.height:
+            raise IndexError(y)
+        return _ColumnarRow(self, y)
+
+    def __iter__(self):
+        for y in range(self.height):
+            yield _ColumnarRow(self, y)
+
+    def _set_flag(self, idx, bit, on):
+        if on:
+            self.flags[idx] |= bit
+        else:
+            self.flags[idx] &= ~bit & 0xFF
+
+    def view(self, idx):
+        """Build a Crop view for a root tile."""
+        crop_cls = TYPE_CLASSES[self.type_id[idx]]
+        vc = _view_class(crop_cls)
+        proto = _PROTOTYPES[crop_cls]
+        v = vc.__new__(vc)
+        v._store = self
+        v._idx = idx
+        v.name = proto.name
+        v.max_growth = proto.max_growth
+        v.value = proto.value
+        v.size = self.level[idx]
+        if hasattr(proto, "level"):
+            v.level = self.level[idx]
+            v.update_stats()
+        return v
+
+    def get(self, x, y):
+        idx = y * self.width + x
+        tid = self.type_id[idx]
+        if tid == TYPE_EMPTY:
+            return None
+        if tid == TYPE_OCCUPIED:
+            pidx = self.parent[idx]
+            py, px = divmod(pidx, self.width)
+            return OccupiedSlot(self.view(pidx), px, py)
+        return self.view(idx)
+
+    def tile_token(self, x, y):
+        return self.gen[y * self.width + x]
+
+    def set(self, x, y, obj):
+        idx = y * self.width + x
+        if isinstance(obj, _CropView) and obj._store is self and obj._idx == idx:
+            return # Writing a view back onto itself
+        self.gen[idx] = (self.gen[idx] + 1) & 0xFFFFFFFF
+        if obj is None:
+            self.type_id[idx] = TYPE_EMPTY
+            self.growth[idx] = 0.0
+            self.level[idx] = 1
+            self.flags[idx] = 0
+            self.parent[idx] = -1
+        elif isinstance(obj, OccupiedSlot):
+            px, py = obj.parent_pos
+            self.type_id[idx] = TYPE_OCCUPIED
+            self.growth[idx] = 0.0
+            self.level[idx] = 1
+            self.flags[idx] = 0
+            self.parent[idx] = py * self.width + px
+        else:
+            crop_cls = obj._crop_cls if isinstance(obj, _CropView) else type(obj)
+            self.type_id[idx] = CLASS_TYPE_IDS[crop_cls]
+            self.growth[idx] = obj.current_growth
+            self.since[idx] = self.clock.time if self.clock is not None else 0.0
+            self.level[idx] = getattr(obj, "level", 1)
+            flags = 0
+            if getattr(obj, "is_rotten", False): flags |= FLAG_ROTTEN
+            if getattr(obj, "fate_checked", False): flags |= FLAG_FATE_CHECKED
+            self.flags[idx] = flags
+            self.parent[idx] = -1
+
+    def iter_roots(self):
+        w = self.width
+        type_id = self.type_id
+        for idx in range(len(type_id)):
+            tid = type_id[idx]
+            if tid != TYPE_EMPTY and tid != TYPE_OCCUPIED:
+                y, x = divmod(idx, w)
+                yield x, y, self.view(idx)
+
+    def iter_roots_in(self, x0, y0, x1, y1):
+        w = self.width
+        type_id = self.type_id
+        parent = self.parent
+        for y in range(y0, y1):
+            base = y * w
+            for x in range(x0, x1):
+                idx = base + x
+                tid = type_id[idx]
+                if tid == TYPE_EMPTY:
+                    continue
+                if tid == TYPE_OCCUPIED:
+                    py, px = divmod(parent[idx], w)
+                    if (px < x0 or py < y0) and x == max(x0, px) and y == max(y0, py):
+                        yield px, py, self.view(parent[idx])
+                else:
+                    yield x, y, self.view(idx)
+
+    def type_codes(self):
+        return self.type_id.tobytes()
+
+    def has_any(self):
+        return any(self.type_id)
+
+    def snapshot(self):
+        """Detached copy of all columns (memcpy per array)."""
+        snap = ColumnarGrid.__new__(ColumnarGrid)
+        snap.width = self.width
+        snap.height = self.height
+        snap.clock = None
+        for name in ("type_id", "growth", "level", "flags", "parent", "since", "gen"):
+            setattr(snap, name, array(getattr(self, name).typecode, getattr(self, name)))
+        return snap
+
+    def detach(self, crop):
+        return crop.detach() if isinstance(crop, _CropView) else crop
+
+
+GRID_BACKENDS = {
+    "object": ObjectGrid,
+    "columnar": ColumnarGrid,
+}
+
+def make_grid(width, height, storage="object", clock=None):
+    backend = GRID_BACKENDS.get(storage)
+    if backend is None:
+        raise ValueError(f"Unknown grid storage '{storage}' (expected one of {list(GRID_BACKENDS)})")
+    return backend(width, height, clock)
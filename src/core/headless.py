@@ -0,0 +1,192 @@
+"""
+Headless fast-forward simulation (无界面快进模拟).
+
+Runs Farm + DroneAPI + a user script without pygame and without wall-clock sleeps:
+every drone action (and every `time.sleep` in the script) advances the farm clock
+instead of sleeping, so an hour of farm time takes seconds.
+
+Usage:
+    python -m src.core.headless src/examples/auto_carrot_farm.py --minutes 60 --seed 1
+    python -m src.core.headless src/examples/auto_carrot_farm.py --record run.cfr  # replay: src.core.replay
+"""
+import argparse
+import builtins
+import json
+import time
+
+from src.core.farm import Farm
+from src.core.api import DroneAPI
+from src.core.script_cache import get_script_cache
+from src.core.profiler import ScriptProfiler
+from src.core.replay import SessionRecorder
+
+
+class SimTimeModule:
+    """Stand-in for the `time` module inside user scripts: clocks read farm time, sleep advances it."""
+    def __init__(self, sim):
+        self._sim = sim
+
+    def sleep(self, seconds):
+        self._sim.advance(seconds)
+
+    def time(self):
+        return self._sim.farm.time
+
+    monotonic = time
+    perf_counter = time
+
+    def __getattr__(self, name):
+        # Anything else (strftime, localtime...) comes from the real module
+        return getattr(time, name)
+
+
+class HeadlessSimulation:
+    def __init__(self, width=None, height=None, seed=None, storage=None, output=None):
+        self.farm = Farm(width, height, storage, seed)
+        self.drone = DroneAPI(self.farm, output or (lambda text: None), sleep_func=self.advance)
+        self.time_module = SimTimeModule(self)
+        self.end_time = None # Farm time at which the running script gets stopped
+        self.recorder = None # SessionRecorder (see record())
+
+    def record(self, path, seed=None):
+        """Record everything from now on into a replay trace; finish with self.recorder.finish()."""
+        self.recorder = SessionRecorder(path, self.farm, self.drone, seed)
+        return self.recorder
+
+    def _update(self, dt):
+        if self.recorder:
+            self.recorder.frame(dt)
+        self.farm.update(dt)
+
+    def advance(self, seconds):
+        """
+        Move farm time forward by `seconds`, stepping exactly to each due maturity event
+        on the way (same ordering the 60 FPS loop would see, minus the idle frames).
+        Raises SystemExit once the time budget of the current run is used up.
+        """
+        farm = self.farm
+        # Actions since the last call happened at the current time, before any of the updates below
+        if self.recorder:
+            self.recorder.drain(self.drone.events)
+        else:
+            # Nobody renders: drop visual events so they don't pile up
+            self.drone.events.clear()
+        target = farm.time + max(0.0, seconds)
+        out_of_time = self.end_time is not None and target >= self.end_time
+        if out_of_time:
+            target = self.end_time
+
+        while True:
+            nxt = farm.scheduler.next_due()
+            if nxt is not None and nxt <= target:
+                self._update(max(0.0, nxt - farm.time))
+                continue
+            if farm.time >= target:
+                break
+            self._update(target - farm.time)
+
+        if out_of_time:
+            self.drone._stop_flag = True
+            raise SystemExit
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # `import time` inside a script must not reach the real (sleeping) module
+        if name == "time" and level == 0:
+            return self.time_module
+        return builtins.__import__(name, globals, locals, fromlist, level)
+
+    def make_env(self):
+        env_builtins = dict(builtins.__dict__)
+        env_builtins["__import__"] = self._import
+        env_builtins["print"] = self.drone.log
+        return {
+            "__builtins__": env_builtins,
+            "__name__": "__main__",
+            "drone": self.drone,
+            "time": self.time_module,
+            "print": self.drone.log,
+        }
+
+    def run_script(self, source, filename="<script>", duration=60.0, profile=False):
+        """
+        Execute `source` for at most `duration` seconds of farm time.
+        Returns a summary dict (farm time used, inventory, action count, error),
+        plus the per-line profile under "profile" when `profile` is set.
+        """
+        self.drone._stop_flag = False
+        self.end_time = self.farm.time + duration
+        start_time = self.farm.time
+        start_actions = self.drone.action_count
+        start_fusions = self.farm.fusion_count
+        start_megas = self.drone.mega_harvests
+        start_mega_yield = self.drone.mega_yield
+        error = None
+        profiler = ScriptProfiler(self.drone, filename) if profile else None
+
+        try:
+            code = get_script_cache().get(source, filename) # Same script, next seed: no recompile
+            if profiler: profiler.install()
+            exec(code, self.make_env())
+        except SystemExit:
+            pass
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            if profiler: profiler.uninstall()
+            self.end_time = None
+            if self.recorder:
+                self.recorder.drain(self.drone.events) # Actions after the last sleep
+
+        result = {
+            "script": filename,
+            "sim_time": self.farm.time - start_time,
+            "actions": self.drone.action_count - start_actions,
+            "fusions": self.farm.fusion_count - start_fusions,
+            "mega_harvests": self.drone.mega_harvests - start_megas,
+            "mega_yield": self.drone.mega_yield - start_mega_yield,
+            "inventory": dict(self.drone.inventory),
+            "error": error,
+        }
+        if profiler:
+            result["profile"] = profiler.to_dict()
+        return result
+
+
+def run_file(path, duration=60.0, seed=None, width=None, height=None, storage=None, output=None, profile=False,
+             record=None):
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    sim = HeadlessSimulation(width, height, seed, storage, output)
+    if record:
+        sim.record(record, seed)
+    result = sim.run_script(source, filename=path, duration=duration, profile=profile)
+    if record:
+        result["trace_hash"] = sim.recorder.finish()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a drone script headless in simulated time.")
+    parser.add_argument("script")
+    parser.add_argument("--minutes", type=float, default=1.0, help="Simulated farm minutes")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--width", type=int, default=None)
+    parser.add_argument("--height", type=int, default=None)
+    parser.add_argument("--storage", default=None, help="object | columnar")
+    parser.add_argument("--verbose", action="store_true", help="Echo drone output")
+    parser.add_argument("--profile", metavar="JSON", default=None, help="Write a per-line profile to this file")
+    parser.add_argument("--record", metavar="TRACE", default=None, help="Record a replay trace (see src.core.replay)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    result = run_file(args.script, args.minutes * 60.0, args.seed, args.width, args.height,
+                      args.storage, print if args.verbose else None, profile=bool(args.profile), record=args.record)
+    result["wall_time"] = time.perf_counter() - started
+    if args.profile:
+        with open(args.profile, "w", encoding="utf-8") as f:
+            json.dump(result.pop("profile"), f, indent=2)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Write-ahead journal of farm mutations (增量日志 / WAL).
+
+Every state change goes through a handful of methods: Farm.plant_crop,
+harvest_crop / destroy_crop (-> remove_crop), fuse_pumpkins, the rot roll in
+on_crops_matured, and the inventory update in DroneAPI. With a journal
+attached (farm.journal) each of them appends one small fixed-size record;
+records are buffered and written out every JOURNAL_FLUSH_INTERVAL seconds,
+so persisting progress costs O(changes) instead of a full grid save.
+
+Files live in JOURNAL_DIR, per generation g:
+
+    base_<g>.farm   full binary save (save_format) taken when generation g began
+    log_<g>.wal     records since then: header b"CFWL" + u32 g, then records
+
+checkpoint() (compaction) starts generation g + 1: it cuts the log, takes a
+FarmSnapshot in the same critical section and writes base_<g+1> in the
+background; older generations are deleted once that base is on disk.
+recover() loads the newest base and replays every following log in order,
+stopping cleanly at a torn last record. A clean shutdown discard()s the
+files, so anything found at startup is left over from a crash. If recovery
+fails, set_aside() moves those files into failed-<timestamp>/ before a new
+generation starts, so compaction never deletes the only copy of the session.
+"""
+import os
+import re
+import struct
+import threading
+import time
+
+from src.config import JOURNAL_DIR, JOURNAL_FLUSH_INTERVAL, JOURNAL_COMPACT_RECORDS, JOURNAL_FSYNC
+from src.core.grid_store import CLASS_TYPE_IDS, TYPE_CLASSES
+from src.core.save_format import read_save
+from src.entities.crops import OccupiedSlot
+
+LOG_MAGIC = b"CFWL"
+LOG_HEADER = struct.Struct("<4sI")
+RECORD = struct.Struct("<BdIIi") # kind, farm time, x, y, arg
+
+# Record kinds
+J_PLANT = 1 # arg = type id (planted crops are always fresh, level 1)
+J_CLEAR = 2 # arg = size of the removed crop (1 = single tile)
+J_FUSE = 3  # arg = size of the new mega pumpkin
+J_FATE = 4  # arg = 1 if the pumpkin rotted
+J_INV = 5   # arg = amount, followed by u8 length + utf-8 item name
+J_POS = 6   # drone position (x, y) and time mark, written at every flush
+
+
+class FarmJournal:
+    def __init__(self, directory=JOURNAL_DIR, flush_interval=JOURNAL_FLUSH_INTERVAL,
+                 compact_records=JOURNAL_COMPACT_RECORDS, fsync=JOURNAL_FSYNC):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.compact_records = compact_records
+        self.fsync = fsync
+        self.farm = None
+        self.drone = None
+        self.generation = None
+        self.records = 0 # Records since the last checkpoint
+        self._buf = bytearray()
+        self._lock = threading.Lock() # Drone thread and main thread both append
+        self._file = None
+        self._elapsed = 0.0
+
+    # --- Files ---
+
+    def _base_path(self, g):
+        return os.path.join(self.directory, f"base_{g}.farm")
+
+    def _log_path(self, g):
+        return os.path.join(self.directory, f"log_{g}.wal")
+
+    def _generations(self, kind):
+        if not os.path.isdir(self.directory):
+            return []
+        pattern = re.compile(rf"^{kind}_(\d+)\.(farm|wal)$")
+        return sorted(int(m.group(1)) for m in map(pattern.match, os.listdir(self.directory)) if m)
+
+    # --- Recording (any thread) ---
+
+    def _append(self, kind, x, y, arg, extra=b""):
+        rec = RECORD.pack(kind, self.farm.time, x, y, arg) + extra
+        with self._lock:
+            self._buf += rec
+            self.records += 1
+
+    def plant(self, x, y, crop):
+        self._append(J_PLANT, x, y, CLASS_TYPE_IDS[type(crop)])
+
+    def clear(self, x, y, size=1):
+        self._append(J_CLEAR, x, y, size)
+
+    def fuse(self, x, y, size):
+        self._append(J_FUSE, x, y, size)
+
+    def fate(self, x, y, rotten):
+        self._append(J_FATE, x, y, 1 if rotten else 0)
+
+    def inventory(self, name, amount):
+        """Record a change the caller already made to the drone's inventory (main thread only)."""
+        self._append(J_INV, 0, 0, amount, _name_bytes(name))
+
+    def add_item(self, bag, name, amount):
+        """
+        Add to `bag` (the drone's inventory) and record it under the lock: a
+        checkpoint copies the inventory while holding it, so the change is
+        either in the new base or in the new log, never in both or neither.
+        """
+        rec = RECORD.pack(J_INV, self.farm.time, 0, 0, amount) + _name_bytes(name)
+        with self._lock:
+            bag[name] = bag.get(name, 0) + amount
+            self._buf += rec
+            self.records += 1
+
+    # --- Lifecycle (main thread) ---
+
+    def start(self, farm, drone, autosave):
+        """Attach to the farm / drone and begin a fresh generation from their current state."""
+        self.farm = farm
+        self.drone = drone
+        farm.journal = self
+        os.makedirs(self.directory, exist_ok=True)
+        self.checkpoint(autosave)
+
+    def update(self, dt, autosave):
+        """Main loop tick: periodic flush, compaction once the log is long enough."""
+        self._elapsed += dt
+        if self.records >= self.compact_records:
+            self.checkpoint(autosave)
+        elif self._elapsed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write buffered records (plus a J_POS mark) to the current log."""
+        self._elapsed = 0.0
+        if self._file is None:
+            return
+        drone = self.drone
+        with self._lock:
+            self._buf += RECORD.pack(J_POS, self.farm.time, drone.x, drone.y, 0)
+            data = bytes(self._buf)
+            self._buf.clear()
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def checkpoint(self, autosave):
+        """Compaction: cut the log, snapshot the farm at the cut and write it as the next base (background)."""
+        # farm.lock first, as drone actions take it before journalling: the cut falls between two actions
+        with self.farm.lock, self._lock:
+            old = self.generation
+            if self._file is not None:
+                self._file.write(self._buf)
+                self._file.close()
+            self._buf.clear()
+            self.records = 0
+            existing = self._generations("base") + self._generations("log")
+            g = max(existing + [old if old is not None else -1]) + 1
+            self._file = open(self._log_path(g), "wb")
+            self._file.write(LOG_HEADER.pack(LOG_MAGIC, g))
+            self._file.flush()
+            self.generation = g
+            # Same critical section: every record from here on lands in log_<g>
+            autosave.save(self._base_path(g), on_done=lambda ok: ok and self._drop_before(g))
+        self._elapsed = 0.0
+
+    def _drop_before(self, g):
+        """base_<g> is durable: everything older is no longer needed for recovery (worker thread)."""
+        for kind in ("base", "log"):
+            for old in self._generations(kind):
+                if old < g:
+                    path = self._base_path(old) if kind == "base" else self._log_path(old)
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if self.farm is not None:
+            self.farm.journal = None
+
+    def discard(self):
+        """Delete every base and log (after close() and once the autosave worker is idle)."""
+        self._drop_before(float("inf"))
+
+    # --- Recovery ---
+
+    def recover(self, farm, drone):
+        """Load the newest base and replay the logs after it. Returns the number of records replayed, or None."""
+        bases = self._generations("base")
+        if not bases:
+            return None
+        b = bases[-1]
+        read_save(self._base_path(b), farm, drone)
+        logs = self._generations("log")
+        replayed = 0
+        g = b
+        while g in logs:
+            replayed += replay(farm, drone, read_log(self._log_path(g)))
+            g += 1
+        return replayed
+
+    def set_aside(self):
+        """Move every base and log into failed-<timestamp>/ (after a failed recover()). Returns that directory or None."""
+        files = [self._base_path(g) for g in self._generations("base")]
+        files += [self._log_path(g) for g in self._generations("log")]
+        if not files:
+            return None
+        target = os.path.join(self.directory, time.strftime("failed-%Y%m%d-%H%M%S"))
+        n = 1
+        while os.path.exists(target):
+            n += 1
+            target = os.path.join(self.directory, time.strftime("failed-%Y%m%d-%H%M%S") + f"-{n}")
+        os.makedirs(target)
+        for path in files:
+            os.replace(path, os.path.join(target, os.path.basename(path)))
+        return target
+
+
+def _name_bytes(name):
+    raw = name.encode("utf-8")[:255]
+    return bytes((len(raw),)) + raw
+
+
+def read_log(path):
+    """Yield (kind, time, x, y, arg, name) from a log file; a torn record at the end is ignored."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < LOG_HEADER.size or data[:4] != LOG_MAGIC:
+        return
+    pos = LOG_HEADER.size
+    size = RECORD.size
+    while pos + size <= len(data):
+        kind, t, x, y, arg = RECORD.unpack_from(data, pos)
+        pos += size
+        name = None
+        if kind == J_INV:
+            if pos >= len(data):
+                return
+            n = data[pos]
+            if pos + 1 + n > len(data):
+                return
+            name = data[pos + 1:pos + 1 + n].decode("utf-8", "replace")
+            pos += 1 + n
+        yield kind, t, x, y, arg, name
+
+
+def replay(farm, drone, records):
+    """Apply journal records to a farm loaded from the matching base. Returns the number applied."""
+    journal, farm.journal = farm.journal, None # Replaying must not write new records
+    count = 0
+    try:
+        for kind, t, x, y, arg, name in records:
+            count += 1
+            if t > farm.time:
+                farm.time = t
+            if kind == J_PLANT:
+                crop_class = TYPE_CLASSES.get(arg)
+                if crop_class is not None:
+                    farm.plant_crop(x, y, crop_class()) # Fails harmlessly if the base already has it
+            elif kind == J_CLEAR:
+                crop = farm.grid[y][x]
+                if crop is None:
+                    continue
+                if isinstance(crop, OccupiedSlot):
+                    farm.grid[y][x] = None
+                    farm.fusion.mark_dirty(x, y)
+                else:
+                    farm.remove_crop(x, y, crop)
+            elif kind == J_FUSE:
+                farm.fuse_pumpkins(x, y, arg)
+                farm.fusion_count += 1
+            elif kind == J_FATE:
+                crop = farm.grid[y][x]
+                if crop is not None and hasattr(crop, "fate_checked"):
+                    crop.fate_checked = True
+                    if arg:
+                        crop.make_rotten()
+            elif kind == J_INV:
+                drone.inventory[name] = drone.inventory.get(name, 0) + arg
+            elif kind == J_POS:
+                drone.x, drone.y = x, y
+    finally:
+        farm.journal = journal
+    return count
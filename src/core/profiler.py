@@ -0,0 +1,175 @@
+"""
+Per-line profiler for drone scripts (脚本逐行性能分析).
+
+Opt-in: install() on the thread that runs the script (sys.settrace is per
+thread), uninstall() when it is done. For every source line of the script
+(matched by the filename its code object was compiled with) it records:
+
+    hits  - how many times the line ran
+    wall  - real seconds spent on the line (including drone calls made from it)
+    sim   - simulated drone seconds requested by those calls (move_delay x actions)
+    wait  - real seconds of that spent sleeping in the drone's delay
+
+and the same calls / wall / sim totals per DroneAPI method. wall - wait is
+the Python overhead of a line, so a strategy can be told apart as bound by
+movement, by planting, or by Python itself.
+
+A drone carries at most one profiler's hooks: installing a second one (a new
+run started while the old script thread is still winding down) detaches the
+first, and a detached profiler's uninstall() leaves the drone alone.
+"""
+import json
+import sys
+import threading
+import time
+
+# DroneAPI methods a script can call
+DRONE_METHODS = ("move", "plant", "harvest", "destroy", "run_path", "plant_rect",
+                 "plant_row", "harvest_rect", "get_pos", "log")
+
+_hooks_lock = threading.Lock() # Guards the drone's sleep / method hooks (install and uninstall run on different threads)
+
+
+class ScriptProfiler:
+    def __init__(self, drone, filename):
+        self.drone = drone
+        self.filename = filename
+        self.lines = {}   # lineno -> [hits, wall, sim, wait]
+        self.methods = {} # name -> [calls, wall, sim]
+        self.total_wall = 0.0
+        self._line = None # Script line currently being timed
+        self._mark = 0.0
+        self._method = None # DroneAPI method currently running (outermost)
+        self._orig_sleep = None
+        self._prev_trace = None # Tracer already active on the script thread (debugger, coverage)
+        self._started = 0.0
+
+    # --- Install / uninstall ---
+
+    def install(self):
+        drone = self.drone
+        with _hooks_lock:
+            active = drone._profiler
+            if active is not None:
+                active._detach()
+            self._orig_sleep = drone.sleep
+            drone.sleep = self._sleep
+            for name in DRONE_METHODS:
+                setattr(drone, name, self._wrap(name, getattr(drone, name)))
+            drone._profiler = self
+        self._started = self._mark = time.perf_counter()
+        self._prev_trace = sys.gettrace()
+        sys.settrace(self._trace)
+
+    def uninstall(self):
+        sys.settrace(self._prev_trace)
+        self._flush(time.perf_counter())
+        self._line = None
+        self.total_wall += time.perf_counter() - self._started
+        with _hooks_lock:
+            if self.drone._profiler is self: # Else a newer profiler owns the hooks
+                self._detach()
+
+    def _detach(self):
+        """Put the drone back the way install() found it (under _hooks_lock)."""
+        drone = self.drone
+        drone.sleep = self._orig_sleep
+        for name in DRONE_METHODS:
+            drone.__dict__.pop(name, None) # Back to the class methods
+        drone._profiler = None
+
+    # --- Hooks ---
+
+    def _flush(self, now):
+        if self._line is not None:
+            self.lines[self._line][1] += now - self._mark
+        self._mark = now
+
+    def _trace(self, frame, event, arg):
+        # Global tracer: only descend into frames of the script itself
+        if frame.f_code.co_filename == self.filename:
+            return self._trace_line
+        return None
+
+    def _trace_line(self, frame, event, arg):
+        if event == "line":
+            self._flush(time.perf_counter())
+            self._line = frame.f_lineno
+            entry = self.lines.get(self._line)
+            if entry is None:
+                entry = self.lines[self._line] = [0, 0.0, 0.0, 0.0]
+            entry[0] += 1
+        elif event == "return":
+            # Back in the caller: the rest of the time goes to the line that made the call
+            self._flush(time.perf_counter())
+            caller = frame.f_back
+            if caller is not None and caller.f_code.co_filename == self.filename:
+                self._line = caller.f_lineno
+        return self._trace_line
+
+    def _wrap(self, name, method):
+        stats = self.methods.setdefault(name, [0, 0.0, 0.0])
+        def profiled(*args, **kwargs):
+            outer = self._method is None
+            if outer:
+                self._method = name
+                stats[0] += 1
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                if outer:
+                    stats[1] += time.perf_counter() - start
+                    self._method = None
+        return profiled
+
+    def _sleep(self, seconds):
+        if self._line is not None:
+            self.lines[self._line][2] += seconds
+        if self._method is not None:
+            self.methods[self._method][2] += seconds
+        start = time.perf_counter()
+        try:
+            self._orig_sleep(seconds)
+        finally:
+            if self._line is not None:
+                self.lines[self._line][3] += time.perf_counter() - start
+
+    # --- Results ---
+
+    def heat(self, key="wall"):
+        """{0-based line: 0..1} relative to the hottest line, for the editor's heat gutter."""
+        col = {"hits": 0, "wall": 1, "sim": 2}[key]
+        top = max((e[col] for e in self.lines.values()), default=0)
+        if not top:
+            return {}
+        return {ln - 1: e[col] / top for ln, e in self.lines.items() if e[col] > 0}
+
+    def to_dict(self):
+        return {
+            "script": self.filename,
+            "total_wall": self.total_wall,
+            "lines": [
+                {"line": ln, "hits": e[0], "wall": e[1], "sim": e[2], "python": max(0.0, e[1] - e[3])}
+                for ln, e in sorted(self.lines.items())
+            ],
+            "methods": {
+                name: {"calls": m[0], "wall": m[1], "sim": m[2]}
+                for name, m in sorted(self.methods.items()) if m[0]
+            },
+        }
+
+    def save_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self, top=5):
+        """Short text report: hottest lines and per-method totals."""
+        out = [f"Profile {self.filename}: {self.total_wall:.3f}s wall"]
+        hottest = sorted(self.lines.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        for ln, (hits, wall, sim, wait) in hottest:
+            out.append(f"  line {ln:>4}: {wall:8.3f}s wall  {sim:8.2f}s sim  {max(0.0, wall - wait):7.3f}s python  x{hits}")
+        for name, (calls, wall, sim) in sorted(self.methods.items(), key=lambda item: item[1][2], reverse=True):
+            if calls:
+                out.append(f"  drone.{name}: {calls} calls  {sim:.2f}s sim  {wall:.3f}s wall")
+        return out
@@ -0,0 +1,281 @@
+"""
+Deterministic session recording and replay (确定性录像与回放).
+
+Everything that changes the farm during a session is either a drone action
+(reported on DroneAPI.events) or Farm.update(dt) (maturity, pumpkin rot from
+farm.rng, fusion). Drone actions and updates are serialized by farm.lock,
+and every event carries the Farm.frame its action was applied after.
+SessionRecorder seeds farm.rng, stores the starting state as an embedded
+binary save, then logs the actions with their frame stamps and the dt of
+every frame. TraceReplayer rebuilds the farm from that, applies each action
+right after the frame it is stamped with, headless, as fast as possible or
+paced at any speed, and compares the final state hash with the one the
+recorder wrote.
+
+Trace layout (little-endian):
+
+    header   "<4sHBxQI"  magic b"CFRP", version, storage (0 object / 1 columnar), seed, initial size
+    initial             save_format.encode() of the farm + drone at the start
+    records             zlib stream of records, each an op byte + fields:
+        FRAME   "<d"     dt, then Farm.update(dt)
+        PLANT   "<IHHB"  frame, x, y, type id (DroneAPI._plant_here: destroy + plant)
+        HARVEST "<IHH"   frame, x, y
+        DESTROY "<IHH"   frame, x, y
+        MOVE    "<IHH"   frame, drone position
+        END     "<I32s"  frame count, sha256 of the final state (see state_hash)
+
+`frame` counts the updates since the recording started; events stamped before
+it are already part of the initial state and are not recorded. The UI drains events
+a frame or more after the drone applied them, so an action record can follow
+FRAME records it precedes; the replayer orders them by stamp. Sessions from
+the IDE (drone on its own thread) and from HeadlessSimulation both replay
+bit for bit, unless the event ring dropped events (SessionRecorder.lossy).
+
+Usage:
+    python -m src.core.headless script.py --minutes 10 --seed 1 --record run.cfr
+    python -m src.core.replay run.cfr [--speed 4] [--storage columnar]
+"""
+import argparse
+import hashlib
+import json
+import random
+import struct
+import time
+import zlib
+
+from src.core.farm import Farm
+from src.core.api import DroneAPI
+from src.core.events import EV_MOVE, EV_PLANT, EV_HARVEST, EV_BATCH
+from src.core.grid_store import TYPE_IDS, TYPE_CLASSES
+from src.core.save_format import encode, decode, array_bytes, SaveFormatError
+
+TRACE_MAGIC = b"CFRP"
+TRACE_VERSION = 2
+TRACE_HEADER = struct.Struct("<4sHBxQI")
+STORAGES = ("object", "columnar")
+
+OP_END = 0
+OP_FRAME = 1
+OP_PLANT = 2
+OP_HARVEST = 3
+OP_DESTROY = 4
+OP_MOVE = 5
+
+_FRAME = struct.Struct("<Bd")
+_PLANT = struct.Struct("<BIHHB")
+_TILE = struct.Struct("<BIHH")
+_END = struct.Struct("<BI32s")
+_FIELDS = {OP_FRAME: struct.Struct("<d"), OP_PLANT: struct.Struct("<IHHB"), OP_HARVEST: struct.Struct("<IHH"),
+           OP_DESTROY: struct.Struct("<IHH"), OP_MOVE: struct.Struct("<IHH"), OP_END: struct.Struct("<I32s")}
+
+
+def state_hash(farm, drone):
+    """sha256 over the grid columns, the farm clock and the drone (position + inventory)."""
+    h = hashlib.sha256()
+    types, growth, levels, flags, roots = farm.to_columns()
+    h.update(struct.pack("<IId", farm.width, farm.height, farm.time))
+    h.update(bytes(types))
+    h.update(array_bytes(growth))
+    h.update(array_bytes(levels))
+    h.update(bytes(flags))
+    h.update(array_bytes(roots))
+    h.update(json.dumps([drone.x, drone.y, sorted(drone.inventory.items())]).encode("utf-8"))
+    return h.digest()
+
+
+class SessionRecorder:
+    """Records one session into `path`. Call event() for each drained drone event, frame(dt) before each Farm.update."""
+    def __init__(self, path, farm, drone, seed=None):
+        self.path = path
+        self.farm = farm
+        self.drone = drone
+        self.seed = random.getrandbits(63) if seed is None else seed
+        self.frames = 0
+        self.dropped_at_start = drone.events.dropped
+        with farm.lock: # No drone batch half applied in the initial state
+            # Open a new frame at the cut: actions already in the snapshot keep an older stamp,
+            # everything after it gets this one or later (moves read the frame after stepping)
+            farm.frame += 1
+            self.start_frame = farm.frame # Event stamps are stored relative to this
+            farm.rng.seed(self.seed) # Rot rolls from here on are reproducible
+            initial = encode(farm, drone.to_dict())
+        self._file = open(path, "wb")
+        self._file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, STORAGES.index(farm.storage),
+                                           self.seed, len(initial)))
+        self._file.write(initial)
+        self._z = zlib.compressobj(6)
+
+    def _write(self, data):
+        out = self._z.compress(data)
+        if out:
+            self._file.write(out)
+
+    def event(self, kind, x, y, payload, frame):
+        """Record one drained event; `frame` is its Farm.frame stamp."""
+        if frame < self.start_frame:
+            return # Applied before the recording started: already in the initial state
+        f = frame - self.start_frame
+        if kind == EV_MOVE:
+            self._write(_TILE.pack(OP_MOVE, f, x, y))
+        elif kind == EV_PLANT:
+            if payload == "poof": # DroneAPI.destroy reuses the plant event
+                self._write(_TILE.pack(OP_DESTROY, f, x, y))
+            else:
+                self._write(_PLANT.pack(OP_PLANT, f, x, y, TYPE_IDS[payload.lower()]))
+        elif kind == EV_HARVEST:
+            self._write(_TILE.pack(OP_HARVEST, f, x, y))
+        elif kind == EV_BATCH:
+            path, plants, harvests = payload
+            # A batch is all moves + plants, or all moves + harvests; the drone ends on the last tile
+            for px, py, name in plants:
+                self._write(_PLANT.pack(OP_PLANT, f, px, py, TYPE_IDS[name.lower()]))
+            for hx, hy, _, _ in harvests:
+                self._write(_TILE.pack(OP_HARVEST, f, hx, hy))
+            self._write(_TILE.pack(OP_MOVE, f, x, y))
+
+    def drain(self, ring):
+        """Record and consume everything pending on an EventRing (headless: nobody else reads it)."""
+        for kind, x, y, payload, amount, frame in ring.drain():
+            self.event(kind, x, y, payload, frame)
+
+    def frame(self, dt):
+        self._write(_FRAME.pack(OP_FRAME, dt))
+        self.frames += 1
+
+    @property
+    def lossy(self):
+        """True if the event ring dropped events during the recording (the replay will diverge)."""
+        return self.drone.events.dropped != self.dropped_at_start
+
+    def finish(self):
+        """Write the final state hash and close the trace. Returns the hash (hex)."""
+        digest = state_hash(self.farm, self.drone)
+        self._write(_END.pack(OP_END, self.frames, digest))
+        self._file.write(self._z.flush())
+        self._file.close()
+        return digest.hex()
+
+
+class TraceReplayer:
+    def __init__(self, path, storage=None):
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < TRACE_HEADER.size:
+            raise SaveFormatError("Trace too short")
+        magic, version, storage_id, self.seed, initial_size = TRACE_HEADER.unpack_from(data, 0)
+        if magic != TRACE_MAGIC:
+            raise SaveFormatError("Not a replay trace")
+        if version > TRACE_VERSION:
+            raise SaveFormatError(f"Trace version {version} is newer than supported ({TRACE_VERSION})")
+        self.path = path
+        self.storage = storage or STORAGES[storage_id]
+        start = TRACE_HEADER.size
+        self._initial = data[start:start + initial_size]
+        # A session that crashed leaves a truncated stream: replay what is there
+        self._records = zlib.decompressobj().decompress(data[start + initial_size:])
+
+    def records(self):
+        """Yield (op, fields) in order; stops at a truncated record."""
+        data = self._records
+        pos = 0
+        while pos < len(data):
+            op = data[pos]
+            fields = _FIELDS.get(op)
+            if fields is None:
+                raise SaveFormatError(f"Unknown trace op {op} at {pos}")
+            if pos + 1 + fields.size > len(data):
+                return
+            yield op, fields.unpack_from(data, pos + 1)
+            pos += 1 + fields.size
+
+    def run(self, speed=None, on_frame=None):
+        """
+        Replay the whole trace. speed=None runs flat out, otherwise sim seconds
+        per wall second (1.0 = as recorded). on_frame(farm, drone) runs after each frame.
+        Returns a summary dict; "match" is None when the trace has no END record.
+        """
+        farm = Farm(storage=self.storage)
+        drone = DroneAPI(farm, lambda text: None)
+        decode(self._initial, farm, drone)
+        farm.rng.seed(self.seed)
+
+        # Split the stream: frame dts in order, actions in push order (their stamps never decrease)
+        dts = []
+        actions = []
+        expected = None
+        for op, fields in self.records():
+            if op == OP_FRAME:
+                dts.append(fields[0])
+            elif op == OP_END:
+                expected = fields[1]
+                break
+            else:
+                actions.append((fields[0], op, fields[1:]))
+
+        frames = 0
+        pending = 0 # Next action to apply
+        started = time.perf_counter()
+        sim_start = farm.time
+        while True:
+            # Everything applied after `frames` updates goes in before the next one
+            while pending < len(actions) and actions[pending][0] <= frames:
+                self._apply(farm, drone, *actions[pending][1:])
+                pending += 1
+            if frames == len(dts):
+                break
+            farm.update(dts[frames])
+            frames += 1
+            if on_frame:
+                on_frame(farm, drone)
+            if speed:
+                ahead = (farm.time - sim_start) / speed - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+        for _, op, fields in actions[pending:]: # Stamped past the last recorded frame (truncated trace)
+            self._apply(farm, drone, op, fields)
+
+        digest = state_hash(farm, drone)
+        return {
+            "trace": self.path,
+            "frames": frames,
+            "sim_time": farm.time - sim_start,
+            "wall_time": time.perf_counter() - started,
+            "fusions": farm.fusion_count,
+            "inventory": dict(drone.inventory),
+            "hash": digest.hex(),
+            "expected": expected.hex() if expected else None,
+            "match": None if expected is None else digest == expected,
+        }
+
+
+    @staticmethod
+    def _apply(farm, drone, op, fields):
+        if op == OP_PLANT:
+            drone.x, drone.y = fields[0], fields[1]
+            crop_class = TYPE_CLASSES.get(fields[2])
+            if crop_class is not None:
+                drone._plant_here(crop_class)
+        elif op == OP_HARVEST:
+            drone.x, drone.y = fields
+            drone._harvest_here()
+        elif op == OP_DESTROY:
+            drone.x, drone.y = fields
+            farm.destroy_crop(*fields)
+        elif op == OP_MOVE:
+            drone.x, drone.y = fields
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded session trace and verify its final state.")
+    parser.add_argument("trace")
+    parser.add_argument("--speed", type=float, default=None, help="Sim seconds per wall second (default: flat out)")
+    parser.add_argument("--storage", default=None, help="Override the grid backend: object | columnar")
+    args = parser.parse_args(argv)
+
+    result = TraceReplayer(args.trace, args.storage).run(speed=args.speed)
+    print(json.dumps(result, indent=2))
+    raise SystemExit(0 if result["match"] is not False else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Binary save format (二进制存档格式).
+
+Layout (little-endian):
+
+    header   "<4sHHIII"  magic b"CFSV", version, reserved, width, height, section count
+    table    "<4sBII"    per section: tag, codec (0 raw / 1 zlib), stored size, raw size
+    sections             in table order
+
+Sections:
+
+    TYPE  u8 per tile   TYPE_IDS of the root crop, TYPE_OCCUPIED, TYPE_EMPTY
+    GROW  f64 per tile  growth of root tiles (0 elsewhere)
+    LEVL  u16 per tile  pumpkin level of root tiles (1 elsewhere)
+    FLAG  u8 per tile   FLAG_ROTTEN | FLAG_FATE_CHECKED
+    ROOT  u32 each      tile index of every mega pumpkin (level > 1)
+    DRON  JSON          DroneAPI.to_dict()
+    TIME  f64           farm clock (Farm.time) the growth values refer to
+
+The per-tile columns compress extremely well (long runs of the same type,
+ripe crops all sharing max_growth). Loading memory-maps the file and
+decompresses / copies each section straight out of the mapping; with
+codec 0 (SAVE_COMPRESSION = 0) the columns are copied with no decoding at all.
+Unknown tags are skipped, so sections can be added without a version bump.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from src.config import SAVE_COMPRESSION
+from src.core.grid_store import TYPE_CLASSES, TYPE_EMPTY, TYPE_OCCUPIED
+
+MAGIC = b"CFSV"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIII")
+SECTION = struct.Struct("<4sBII")
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+
+_SWAP = sys.byteorder != "little" # Arrays are stored little-endian
+
+
+class SaveFormatError(ValueError):
+    pass
+
+
+def array_bytes(arr):
+    """Raw little-endian bytes of a typed array (the on-disk column layout)."""
+    if _SWAP and arr.itemsize > 1:
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _typed(typecode, data):
+    arr = array(typecode)
+    arr.frombytes(data)
+    if _SWAP and arr.itemsize > 1:
+        arr.byteswap()
+    return arr
+
+
+def encode(farm, drone_data, level=SAVE_COMPRESSION):
+    """
+    Whole save file as bytes (level 0 = raw sections, 1-9 = zlib level).
+    `farm` is a Farm or a FarmSnapshot, `drone_data` is DroneAPI.to_dict().
+    """
+    types, growth, levels, flags, roots = farm.to_columns()
+    sections = [
+        (b"TYPE", bytes(types)),
+        (b"GROW", array_bytes(growth)),
+        (b"LEVL", array_bytes(levels)),
+        (b"FLAG", bytes(flags)),
+        (b"ROOT", array_bytes(roots)),
+        (b"DRON", json.dumps(drone_data).encode("utf-8")),
+        (b"TIME", struct.pack("<d", farm.time)),
+    ]
+    table = []
+    payload = []
+    for tag, raw in sections:
+        if level:
+            stored, codec = zlib.compress(raw, level), CODEC_ZLIB
+        else:
+            stored, codec = raw, CODEC_RAW
+        table.append(SECTION.pack(tag, codec, len(stored), len(raw)))
+        payload.append(stored)
+    header = HEADER.pack(MAGIC, VERSION, 0, farm.width, farm.height, len(sections))
+    return b"".join([header] + table + payload)
+
+
+def write_save(path, farm, drone_data, level=SAVE_COMPRESSION):
+    """Write atomically: a crash mid-write leaves the previous save intact."""
+    data = encode(farm, drone_data, level)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(data)
+
+
+def is_binary_save(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _read_sections(view):
+    if len(view) < HEADER.size:
+        raise SaveFormatError("File too short")
+    magic, version, _, width, height, count = HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise SaveFormatError("Not a binary save")
+    if version > VERSION:
+        raise SaveFormatError(f"Save version {version} is newer than supported ({VERSION})")
+
+    offset = HEADER.size + count * SECTION.size
+    sections = {}
+    for k in range(count):
+        tag, codec, stored, raw = SECTION.unpack_from(view, HEADER.size + k * SECTION.size)
+        if offset + stored > len(view):
+            raise SaveFormatError(f"Section {tag!r} truncated")
+        with view[offset:offset + stored] as part:
+            if codec == CODEC_ZLIB:
+                data = zlib.decompress(part, bufsize=max(1, raw))
+            elif codec == CODEC_RAW:
+                data = bytes(part)
+            else:
+                raise SaveFormatError(f"Unknown codec {codec} in section {tag!r}")
+        if len(data) != raw:
+            raise SaveFormatError(f"Section {tag!r} has {len(data)} bytes, expected {raw}")
+        sections[tag] = data
+        offset += stored
+    return width, height, sections
+
+
+def read_save(path, farm, drone):
+    """Load a binary save into `farm` / `drone` (memory-mapped read)."""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                width, height, sections = _read_sections(view)
+    _apply(width, height, sections, farm, drone)
+
+
+def decode(data, farm, drone):
+    """Like read_save, for a save held in memory (bytes-like, e.g. embedded in a replay trace)."""
+    with memoryview(data) as view:
+        width, height, sections = _read_sections(view)
+    _apply(width, height, sections, farm, drone)
+
+
+def _apply(width, height, sections, farm, drone):
+    n = width * height
+    try:
+        types = sections[b"TYPE"]
+        growth = _typed('d', sections[b"GROW"])
+        levels = _typed('H', sections[b"LEVL"])
+        flags = sections[b"FLAG"]
+    except KeyError as e:
+        raise SaveFormatError(f"Missing section {e.args[0]!r}") from None
+    if not (len(types) == len(growth) == len(levels) == len(flags) == n):
+        raise SaveFormatError("Tile sections do not match the farm size")
+    roots = _typed('I', sections.get(b"ROOT", b""))
+    # Validate the payload before touching the farm: a damaged save must leave it as it was
+    unknown = set(types) - set(TYPE_CLASSES) - {TYPE_EMPTY, TYPE_OCCUPIED}
+    if unknown:
+        raise SaveFormatError(f"Unknown crop type id {min(unknown)}")
+    for root in roots:
+        if root >= n or types[root] in (TYPE_EMPTY, TYPE_OCCUPIED):
+            raise SaveFormatError(f"Mega pumpkin root {root} is not a crop tile")
+        ry, rx = divmod(root, width)
+        level = levels[root]
+        if level < 1 or rx + level > width or ry + level > height:
+            raise SaveFormatError(f"Mega pumpkin at ({rx}, {ry}) of size {level} runs past the grid")
+    drone_data = None
+    if b"DRON" in sections:
+        try:
+            drone_data = json.loads(sections[b"DRON"].decode("utf-8"))
+        except ValueError as e: # Bad UTF-8 or JSON
+            raise SaveFormatError(f"Bad drone section: {e}") from None
+
+    if len(sections.get(b"TIME", b"")) == 8:
+        farm.time = struct.unpack("<d", sections[b"TIME"])[0] # Journal records after this save use the same clock
+    farm.load_from_columns(width, height, types, growth, levels, flags, roots)
+    if drone_data is not None:
+        drone.load_from_data(drone_data)
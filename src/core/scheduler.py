@@ -0,0 +1,37 @@
+import heapq
+
+
+class MaturityScheduler:
+    """
+    Min-heap of crop ripening times (成熟时间表).
+
+    Entries are (due_time, seq, tile_index, token). Nothing is ever removed on
+    harvest/destroy: when an entry fires, the farm compares `token` with the
+    tile's current token and silently drops stale entries (lazy cancellation).
+    """
+    def __init__(self):
+        self._heap = []
+        self._seq = 0 # Tie-breaker keeps same-time entries in scheduling order
+
+    def __len__(self):
+        return len(self._heap)
+
+    def clear(self):
+        self._heap = []
+
+    def schedule(self, due_time, tile_index, token):
+        heapq.heappush(self._heap, (due_time, self._seq, tile_index, token))
+        self._seq += 1
+
+    def next_due(self):
+        """Time of the earliest pending entry, or None."""
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """Remove and return [(tile_index, token), ...] for every entry with due_time <= now."""
+        heap = self._heap
+        due = []
+        while heap and heap[0][0] <= now:
+            _, _, idx, token = heapq.heappop(heap)
+            due.append((idx, token))
+        return due
@@ -0,0 +1,141 @@
+"""
+Compiled-script cache (脚本编译缓存).
+
+exec() on a source string parses and compiles it every time. ScriptCache
+keeps the code objects keyed by (source hash, filename), so pressing RUN
+again, the demo, or a tournament running the same script for every seed
+skips straight to execution. Code objects are compiled with the real
+filename and registered in `linecache`, so tracebacks show the right file,
+line numbers and source lines.
+
+With a cache directory the marshalled bytecode is also written to disk
+(`user_scripts/__pycache__/` by default) and shared between processes and
+sessions. Files are tagged with the interpreter's bytecode magic number;
+anything unreadable or from another Python version is simply recompiled.
+Only the latest version of each script is kept on disk: storing a new one
+deletes the files of its earlier versions, so editing never piles them up.
+"""
+import hashlib
+import importlib.util
+import linecache
+import marshal
+import os
+from collections import OrderedDict
+
+from src.config import SCRIPT_CACHE_DIR, SCRIPT_CACHE_SIZE
+
+MAGIC = importlib.util.MAGIC_NUMBER
+
+
+class ScriptCache:
+    def __init__(self, max_entries=SCRIPT_CACHE_SIZE, cache_dir=SCRIPT_CACHE_DIR):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir # None = memory only
+        self._codes = OrderedDict() # (digest, filename) -> code object
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(source, filename):
+        digest = hashlib.sha256(source.encode("utf-8", "surrogatepass")).hexdigest()
+        return digest, filename
+
+    @staticmethod
+    def _name_hash(filename):
+        return hashlib.sha256(filename.encode("utf-8", "surrogatepass")).hexdigest()[:16]
+
+    def _path(self, key):
+        digest, filename = key
+        # The filename is baked into the code object, so it is part of the file name too
+        return os.path.join(self.cache_dir, f"{digest[:32]}-{self._name_hash(filename)}.bin")
+
+    def get(self, source, filename="<script>"):
+        """Code object for `source`; raises SyntaxError like compile() would."""
+        key = self.key(source, filename)
+        code = self._codes.get(key)
+        if code is not None:
+            self._codes.move_to_end(key)
+            self.hits += 1
+        else:
+            code = self._load(key)
+            if code is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                code = compile(source, filename, "exec")
+                self._store(key, code)
+            self._codes[key] = code
+            if len(self._codes) > self.max_entries:
+                self._codes.popitem(last=False)
+        self._register_source(source, filename)
+        return code
+
+    def clear(self):
+        self._codes.clear()
+
+    # --- Disk ---
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if data[:len(MAGIC)] != MAGIC:
+            return None
+        try:
+            return marshal.loads(data[len(MAGIC):])
+        except (EOFError, ValueError, TypeError):
+            return None
+
+    def _store(self, key, code):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(MAGIC + marshal.dumps(code))
+            os.replace(tmp, path) # Atomic: concurrent tournament workers never see half a file
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self._prune(key[1], os.path.basename(path))
+
+    def _prune(self, filename, keep):
+        """Delete the cached files of earlier versions of `filename` (everything but `keep`)."""
+        suffix = f"-{self._name_hash(filename)}.bin"
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(suffix) and name != keep:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _register_source(source, filename):
+        # Tracebacks must show the lines that actually ran: editor buffers may be unsaved or not on disk at all
+        # (mtime None = linecache.checkcache leaves the entry alone)
+        linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+
+
+_default_cache = None
+
+
+def get_script_cache():
+    """Process-wide cache shared by the IDE and the headless runner."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ScriptCache()
+    return _default_cache
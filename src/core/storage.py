@@ -1,6 +1,7 @@
 import json
 import os
-from src.config import SAVE_FILE
+from src.config import SAVE_FILE, BINARY_SAVE_FILE, SAVE_FORMAT
+from src.core.save_format import write_save, read_save, is_binary_save
 
 class SaveManager:
     @staticmethod
@@ -17,15 +18,17 @@ class SaveManager:
         drone: DroneAPI 对象
         code_text: 字符串 (编辑器里的代码)
         """
-        data = {
-            "farm": farm.to_dict(),
-            "drone": drone.to_dict()
-        }
-
-        
         try:
-            with open(SAVE_FILE, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4) # indent=4 让文件可读性更好
+            if SAVE_FORMAT == "binary":
+                # Typed, compressed tile columns instead of one dict per tile
+                write_save(BINARY_SAVE_FILE, farm, drone.to_dict())
+            else:
+                data = {
+                    "farm": farm.to_dict(),
+                    "drone": drone.to_dict()
+                }
+                with open(SAVE_FILE, "w", encoding="utf-8") as f:
+                    json.dump(data, f, indent=4) # indent=4 让文件可读性更好
             print("Game Saved Successfully!")
             return True
         except Exception as e:
@@ -33,18 +36,32 @@ class SaveManager:
             return False
 
     @staticmethod
-    def load_game(farm, drone):
+    def latest_save():
+        """Path of the newest manual save (binary or JSON), or None. Autosaves: AutosaveService.saves()."""
+        saves = [p for p in (BINARY_SAVE_FILE, SAVE_FILE) if os.path.exists(p)]
+        if not saves:
+            return None
+        return max(saves, key=os.path.getmtime)
+
+    @staticmethod
+    def load_game(farm, drone, path=None):
         """
         读取存档，并更新传入的 farm 和 drone 对象
+        path: 指定存档 (例如某个自动存档)；默认读取最新的手动存档
         返回: True/False
         """
 
-        if not os.path.exists(SAVE_FILE):
+        path = path or SaveManager.latest_save()
+        if path is None:
             print("No save file found.")
             return None
 
         try:
-            with open(SAVE_FILE, "r", encoding="utf-8") as f:
+            if is_binary_save(path):
+                read_save(path, farm, drone)
+                return True
+
+            with open(path, "r", encoding="utf-8") as f:
                 data = json.load(f)
             
             # 恢复数据
@@ -0,0 +1,118 @@
+"""
+Script tournament (策略脚本锦标赛).
+
+Runs every (script, seed) combination in its own headless simulation across a
+process pool and ranks the scripts by yield per simulated minute.
+
+Usage:
+    python -m src.core.tournament --seeds 8 --minutes 30
+    python -m src.core.tournament src/examples/*.py --seed-list 1 2 3 --json results.json
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.core.headless import HeadlessSimulation
+
+DEFAULT_SCRIPT_GLOBS = ("user_scripts/*.py", "src/examples/*.py")
+
+
+def run_match(script_path, seed, minutes, width=None, height=None, storage=None):
+    """Worker entry point (top-level so it can be pickled): one script, one seed."""
+    with open(script_path, "r", encoding="utf-8") as f:
+        source = f.read()
+    sim = HeadlessSimulation(width, height, seed, storage)
+    started = time.perf_counter()
+    result = sim.run_script(source, filename=script_path, duration=minutes * 60.0)
+    result["wall_time"] = time.perf_counter() - started
+    result["seed"] = seed
+
+    sim_minutes = result["sim_time"] / 60.0 if result["sim_time"] > 0 else 0.0
+    # Rotten pumpkins land in the bag too, but they are worth nothing
+    good_items = sum(v for k, v in result["inventory"].items() if not k.startswith("Rotten"))
+    result["items"] = good_items
+    result["items_per_min"] = good_items / sim_minutes if sim_minutes else 0.0
+    result["actions_per_sec"] = result["actions"] / result["sim_time"] if result["sim_time"] else 0.0
+    return result
+
+
+def summarize(results):
+    """Aggregate per-script means, best first."""
+    by_script = {}
+    for r in results:
+        by_script.setdefault(r["script"], []).append(r)
+
+    rows = []
+    for script, runs in by_script.items():
+        n = len(runs)
+        rows.append({
+            "script": script,
+            "runs": n,
+            "errors": sum(1 for r in runs if r["error"]),
+            "items_per_min": sum(r["items_per_min"] for r in runs) / n,
+            "actions_per_sec": sum(r["actions_per_sec"] for r in runs) / n,
+            "fusions": sum(r["fusions"] for r in runs) / n,
+            "mega_yield": sum(r["mega_yield"] for r in runs) / n,
+        })
+    rows.sort(key=lambda row: row["items_per_min"], reverse=True)
+    return rows
+
+
+def run_tournament(scripts, seeds, minutes, width=None, height=None, storage=None, workers=None):
+    jobs = [(path, seed) for path in scripts for seed in seeds]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_match, path, seed, minutes, width, height, storage) for path, seed in jobs]
+        results = [f.result() for f in futures]
+    return results
+
+
+def find_scripts(patterns):
+    scripts = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            if path not in scripts:
+                scripts.append(path)
+    return scripts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank drone scripts over many seeds in headless simulations.")
+    parser.add_argument("scripts", nargs="*", help=f"Script paths/globs (default: {' '.join(DEFAULT_SCRIPT_GLOBS)})")
+    seed_group = parser.add_mutually_exclusive_group()
+    seed_group.add_argument("--seeds", type=int, default=4, help="Run seeds 0..N-1")
+    seed_group.add_argument("--seed-list", type=int, nargs="+", default=None,
+                            help="Run exactly these seeds (e.g. --seed-list 5 to reproduce one match)")
+    parser.add_argument("--minutes", type=float, default=10.0, help="Simulated farm minutes per run")
+    parser.add_argument("--width", type=int, default=None)
+    parser.add_argument("--height", type=int, default=None)
+    parser.add_argument("--storage", default=None, help="object | columnar")
+    parser.add_argument("--workers", type=int, default=None, help="Process count (default: all cores)")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write raw results + summary here")
+    args = parser.parse_args(argv)
+
+    scripts = find_scripts(args.scripts or DEFAULT_SCRIPT_GLOBS)
+    if not scripts:
+        parser.error("no scripts found")
+    seeds = args.seed_list if args.seed_list is not None else list(range(args.seeds))
+
+    started = time.perf_counter()
+    results = run_tournament(scripts, seeds, args.minutes, args.width, args.height, args.storage, args.workers)
+    elapsed = time.perf_counter() - started
+    summary = summarize(results)
+
+    print(f"{len(results)} runs ({len(scripts)} scripts x {len(seeds)} seeds, {args.minutes:g} sim-min each) in {elapsed:.2f}s")
+    print(f"{'SCRIPT':<45} {'ITEMS/MIN':>10} {'ACT/S':>7} {'FUSIONS':>8} {'MEGA':>7} {'ERR':>4}")
+    for row in summary:
+        print(f"{os.path.basename(row['script']):<45} {row['items_per_min']:>10.1f} {row['actions_per_sec']:>7.2f} "
+              f"{row['fusions']:>8.1f} {row['mega_yield']:>7.1f} {row['errors']:>4}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,59 @@
 import random
+
+# 南瓜成熟瞬间的腐烂概率
+PUMPKIN_ROT_CHANCE = 0.2
+
 class Crop:
     def __init__(self, name, growth_time, value):
         self.name = name
         self.max_growth = growth_time
         self.value = value
+        # Global clock (anything with a `.time`, i.e. the Farm). Once bound, growth is
+        # derived from clock time instead of being stepped every frame.
+        self.clock = None
+        self._since = 0.0
         self.current_growth = 0.0
         self.size = 1 # 1x1 defaulty
 
+    @property
+    def current_growth(self):
+        g = self._growth
+        if self.clock is not None and g < self.max_growth:
+            g = min(self.max_growth, g + (self.clock.time - self._since))
+        return g
+
+    @current_growth.setter
+    def current_growth(self, value):
+        self._growth = value
+        if self.clock is not None:
+            self._since = self.clock.time
+
+    def growth_at(self, time):
+        """Growth at clock time `time` (any moment since the growth was last written)."""
+        g = self._growth
+        if self.clock is not None and g < self.max_growth:
+            g = min(self.max_growth, g + (time - self._since))
+        return g
+
+    def bind_clock(self, clock):
+        """Let growth follow `clock.time` from now on (keeps current progress)."""
+        g = self.current_growth
+        self.clock = clock
+        self.current_growth = g
+
+    @property
+    def ripe_in(self):
+        """Seconds of growth left until maturity."""
+        return max(0.0, self.max_growth - self.current_growth)
+
     @property
     def is_ready(self):
         return self.current_growth >= self.max_growth
 
     def grow(self, dt):
-        if self.current_growth < self.max_growth:
-            self.current_growth += dt
+        # Manual stepping, only for crops not bound to a clock
+        if self.clock is None and self._growth < self.max_growth:
+            self._growth += dt
 
     @property
     def color(self):
@@ -91,15 +131,20 @@ class Pumpkin(Crop):
             self.name = "Pumpkin" # Always "Pumpkin" for inventory unification
             # Level is stored in self.level and handled by size multiplier in API
 
-    def grow(self, dt):
+    def grow(self, dt, rng=random):
         was_ready = self.is_ready
         super().grow(dt)
         
         # Fate Rot check at the moment of maturity
-        if self.is_ready and not was_ready and not self.fate_checked:
-            self.fate_checked = True
-            if random.random() < 0.2:  # 20% Chance
-                self.make_rotten()
+        if self.is_ready and not was_ready:
+            self.roll_fate(rng.random())
+
+    def roll_fate(self, roll):
+        """Apply the one-time rot check with a pre-drawn roll in [0, 1). Farm batches these."""
+        if self.fate_checked: return
+        self.fate_checked = True
+        if roll < PUMPKIN_ROT_CHANCE:  # 20% Chance
+            self.make_rotten()
 
     def make_rotten(self):
         self.is_rotten = True
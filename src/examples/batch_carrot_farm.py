@@ -0,0 +1,34 @@
+# BATCH AUTO CARROT
+# Same job as auto_carrot_farm.py, but each phase is ONE drone call:
+# plant_rect / harvest_rect walk the whole grid in a snake pattern internally.
+
+WIDTH = 22
+HEIGHT = 12
+
+print("=== BATCH AUTOMATION SYSTEM ONLINE ===")
+
+def return_to_start():
+    """Fly back to (0,0) with a single batched path"""
+    path = ["West"] * drone.x + ["North"] * drone.y
+    drone.run_path(path)
+
+cycle = 1
+return_to_start()
+
+while True:
+    print(f"\n[CYCLE {cycle}]")
+    
+    # 1. PLANTING (one call for the whole field)
+    drone.plant_rect(WIDTH, HEIGHT, "carrot")
+    return_to_start()
+    
+    # 2. GROWTH WAIT
+    import time
+    time.sleep(3.5)
+    
+    # 3. HARVESTING (one call for the whole field)
+    gained = drone.harvest_rect(WIDTH, HEIGHT)
+    print(f"   +{gained} items")
+    return_to_start()
+    
+    cycle += 1
@@ -0,0 +1,86 @@
+import pygame
+
+# Assets that get packed into the shared atlas (everything the farm view blits every frame)
+ATLAS_PREFIXES = ("crop_", "drone_idle_", "tile_", "particle_")
+ATLAS_MAX_WIDTH = 2048
+ATLAS_PADDING = 1 # Transparent gap between sprites
+
+
+class TextureAtlas:
+    """
+    One big surface holding many small sprites (纹理图集) + a region table.
+
+    `regions[name]` is the Rect of that sprite inside `surface`, so a sprite
+    can be blitted as (atlas.surface, dest, region) or through the subsurface
+    returned by `sprite(name)` (shares pixels with the atlas, no copy).
+    """
+    def __init__(self, surface, regions):
+        self.surface = surface
+        self.regions = regions
+
+    def __contains__(self, name):
+        return name in self.regions
+
+    def sprite(self, name):
+        return self.surface.subsurface(self.regions[name])
+
+
+def pack_shelves(sizes, max_width=ATLAS_MAX_WIDTH, padding=ATLAS_PADDING):
+    """
+    Shelf packing: tallest first, left to right, new row when the current one is full.
+    sizes: {name: (w, h)} -> ({name: Rect}, (atlas_w, atlas_h))
+    """
+    order = sorted(sizes, key=lambda n: (-sizes[n][1], -sizes[n][0], n))
+    regions = {}
+    x = y = shelf_h = used_w = 0
+    for name in order:
+        w, h = sizes[name]
+        if x > 0 and x + w > max_width:
+            y += shelf_h + padding
+            x = shelf_h = 0
+        regions[name] = pygame.Rect(x, y, w, h)
+        x += w + padding
+        shelf_h = max(shelf_h, h)
+        used_w = max(used_w, x - padding)
+    return regions, (max(1, used_w), max(1, y + shelf_h))
+
+
+def build_atlas(assets, prefixes=ATLAS_PREFIXES):
+    """Pack every asset whose name starts with one of `prefixes`; returns None if there is nothing to pack."""
+    names = [n for n in assets if n.startswith(prefixes)]
+    if not names:
+        return None
+
+    regions, size = pack_shelves({n: assets[n].get_size() for n in names})
+    surface = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+    surface.fill((0, 0, 0, 0))
+    surface.blits([(assets[n], regions[n].topleft) for n in names], doreturn=False)
+    return TextureAtlas(surface, regions)
+
+
+def bake_atlas(assets, variants, max_width=ATLAS_MAX_WIDTH):
+    """
+    Pack transformed copies of assets: variants {key: (asset name, (w, h), tint or None)}.
+    Each variant is scaled and multiplied by its tint (BLEND_MULT) once, here; the regions
+    are keyed by `key` (keys must be mutually comparable). Variants wider than `max_width`
+    and missing assets are left out. Returns None if nothing was packed.
+    """
+    images = {}
+    for key, (name, size, tint) in variants.items():
+        img = assets.get(name)
+        if img is None or size[0] > max_width:
+            continue
+        if img.get_size() != size:
+            img = pygame.transform.scale(img, size)
+        if tint is not None:
+            img = img.copy()
+            img.fill(tint, special_flags=pygame.BLEND_MULT)
+        images[key] = img
+    if not images:
+        return None
+
+    regions, size = pack_shelves({k: img.get_size() for k, img in images.items()}, max_width)
+    surface = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+    surface.fill((0, 0, 0, 0))
+    surface.blits([(images[k], regions[k].topleft) for k in images], doreturn=False)
+    return TextureAtlas(surface, regions)
@@ -0,0 +1,98 @@
+from src.config import *
+
+
+class Camera:
+    """
+    Pan / zoom view onto the farm grid (摄像机).
+
+    The camera looks at tile coordinate (cx, cy) (floats, tile units) at the
+    centre of the view; `tile` is the on-screen size of one tile in whole
+    pixels (GRID_SIZE = 100% zoom). Everything that converts between tiles
+    and screen pixels goes through here, so the renderer only ever touches
+    the visible tile range.
+    """
+    def __init__(self, view_w=SCREEN_WIDTH, view_h=SCREEN_HEIGHT):
+        self.view_w = view_w
+        self.view_h = view_h
+        self.cx = 0.0
+        self.cy = 0.0
+        self.tile = GRID_SIZE
+        self._farm_size = None
+
+    @property
+    def zoom(self):
+        return self.tile / GRID_SIZE
+
+    @property
+    def minimap(self):
+        """Level of detail: below CAMERA_LOD_TILE_PX a tile is drawn as a flat colour block."""
+        return self.tile < CAMERA_LOD_TILE_PX
+
+    def state(self):
+        """Changes whenever what is on screen moves (used as a cache key)."""
+        return self.origin() + (self.tile,)
+
+    # --- Layout ---
+
+    def fit(self, farm):
+        """Centre the farm, at 100% zoom if it fits on screen, zoomed out until it does otherwise."""
+        self._farm_size = (farm.width, farm.height)
+        self.cx = farm.width / 2
+        self.cy = farm.height / 2
+        fit_tile = min(self.view_w // max(1, farm.width), self.view_h // max(1, farm.height))
+        self.tile = max(CAMERA_MIN_TILE_PX, min(GRID_SIZE, fit_tile))
+
+    def sync(self, farm):
+        """Refit when the farm changed size (new game / load)."""
+        if self._farm_size != (farm.width, farm.height):
+            self.fit(farm)
+
+    def origin(self):
+        """Screen position of the top-left corner of tile (0, 0)."""
+        return (int(round(self.view_w / 2 - self.cx * self.tile)),
+                int(round(self.view_h / 2 - self.cy * self.tile)))
+
+    def tile_rect(self, x, y, size=1):
+        ox, oy = self.origin()
+        t = self.tile
+        return (ox + x * t, oy + y * t, t * size, t * size)
+
+    def tile_center(self, x, y):
+        ox, oy = self.origin()
+        t = self.tile
+        return ox + x * t + t // 2, oy + y * t + t // 2
+
+    def screen_to_tile(self, sx, sy):
+        ox, oy = self.origin()
+        return (sx - ox) / self.tile, (sy - oy) / self.tile
+
+    def visible_range(self, farm):
+        """Half-open tile range (x0, y0, x1, y1) intersecting the view, clipped to the farm."""
+        ox, oy = self.origin()
+        t = self.tile
+        x0 = max(0, -ox // t)
+        y0 = max(0, -oy // t)
+        x1 = min(farm.width, (self.view_w - ox + t - 1) // t)
+        y1 = min(farm.height, (self.view_h - oy + t - 1) // t)
+        return x0, y0, max(x0, x1), max(y0, y1)
+
+    # --- Controls ---
+
+    def pan(self, dx, dy):
+        """Move the view by (dx, dy) screen pixels."""
+        self.cx -= dx / self.tile
+        self.cy -= dy / self.tile
+
+    def zoom_at(self, steps, sx, sy):
+        """Zoom in (steps > 0) or out, keeping the tile under screen point (sx, sy) in place."""
+        wx, wy = self.screen_to_tile(sx, sy)
+        tile = self.tile
+        for _ in range(abs(steps)):
+            tile = tile * CAMERA_ZOOM_STEP if steps > 0 else tile / CAMERA_ZOOM_STEP
+        tile = int(round(tile))
+        if tile == self.tile:
+            tile += 1 if steps > 0 else -1 # Always move at least one pixel
+        self.tile = max(CAMERA_MIN_TILE_PX, min(CAMERA_MAX_TILE_PX, tile))
+        # Put (wx, wy) back under the cursor
+        self.cx = wx - (sx - self.view_w / 2) / self.tile
+        self.cy = wy - (sy - self.view_h / 2) / self.tile
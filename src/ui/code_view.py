@@ -0,0 +1,139 @@
+from collections import OrderedDict
+import pygame
+
+CODE_FG = (248, 248, 242)     # Default text colour (monokai foreground)
+CODE_BG = (39, 40, 34)        # Editor background
+GUTTER_FG = (117, 113, 94)    # Line numbers
+GUTTER_BG = (32, 33, 28)
+CURSOR_COLOR = (248, 248, 240)
+GUTTER_PAD = 6                # Pixels between the line numbers and the code
+HEAT_WIDTH = 4                # Profiler heat bar at the left edge of the gutter
+
+
+class CodeView:
+    """
+    Virtualized code view (虚拟化代码视图).
+
+    Draws only the lines inside the visible window onto one fixed-size
+    surface. Every line is rasterised once into its own surface and kept in
+    an LRU keyed by its coloured pieces, so an edit re-renders only the line
+    that actually changed (inserting a line above just shifts the others, it
+    does not invalidate them). Scrolling changes `top` / `left` and re-blits
+    at most `rows` cached surfaces: the cost per keystroke and per frame
+    depends on the view size, not on the file length.
+
+    Line numbers are composed from the HUD's GlyphAtlas (digits only). An
+    optional heat map (profiler results) is drawn as a bar left of them.
+    """
+    def __init__(self, size, text_cache, font=None, max_cached_lines=1024):
+        self.width, self.height = size
+        self.text_cache = text_cache
+        self.font = font or pygame.font.SysFont("Consolas", 16)
+        self.line_height = self.font.get_linesize()
+        self.rows = max(1, self.height // self.line_height)
+        self.top = 0  # First visible line
+        self.left = 0 # Horizontal scroll in pixels
+        self.max_cached_lines = max_cached_lines
+        self._lines = OrderedDict() # tuple(pieces) -> Surface
+        self._colors = {}
+        self.surface = pygame.Surface(size).convert()
+
+    # --- Geometry ---
+
+    def gutter_width(self, line_count):
+        return self.font.size("0" * len(str(line_count)))[0] + 2 * GUTTER_PAD + HEAT_WIDTH
+
+    def column_x(self, line_text, col):
+        """Pixel offset of column `col` inside a line (without gutter / scroll)."""
+        return self.font.size(line_text[:col].expandtabs(4))[0]
+
+    def scroll(self, lines, line_count):
+        self.top = max(0, min(self.top + lines, line_count - 1))
+
+    def ensure_visible(self, highlighter, line, col):
+        """Scroll just enough that (line, col) is inside the view."""
+        if line < self.top:
+            self.top = line
+        elif line >= self.top + self.rows:
+            self.top = line - self.rows + 1
+        if 0 <= line < len(highlighter.lines):
+            x = self.column_x(highlighter.lines[line], col)
+            code_w = self.width - self.gutter_width(len(highlighter.lines))
+            if x < self.left:
+                self.left = max(0, x - code_w // 4)
+            elif x >= self.left + code_w - 2:
+                self.left = x - code_w * 3 // 4
+
+    def hit(self, highlighter, x, y):
+        """(line, col) under a point in view coordinates, clamped to the text."""
+        n = len(highlighter.lines)
+        line = max(0, min(n - 1, self.top + y // self.line_height))
+        text = highlighter.lines[line].rstrip("\n")
+        x -= self.gutter_width(n) - self.left
+        col = 0
+        while col < len(text) and self.column_x(text, col + 1) <= x + self.font.size(" ")[0] // 2:
+            col += 1
+        return line, col
+
+    # --- Rendering ---
+
+    def _color(self, hex_color):
+        color = self._colors.get(hex_color)
+        if color is None:
+            color = self._colors[hex_color] = pygame.Color("#" + hex_color) if hex_color else CODE_FG
+        return color
+
+    def _line_surface(self, pieces):
+        key = tuple(pieces)
+        surf = self._lines.get(key)
+        if surf is not None:
+            self._lines.move_to_end(key)
+            return surf
+        rendered = [self.font.render(text.expandtabs(4), True, self._color(color)) for color, text in pieces]
+        surf = pygame.Surface((max(1, sum(r.get_width() for r in rendered)), self.line_height), pygame.SRCALPHA)
+        x = 0
+        for r in rendered:
+            surf.blit(r, (x, 0))
+            x += r.get_width()
+        self._lines[key] = surf
+        if len(self._lines) > self.max_cached_lines:
+            self._lines.popitem(last=False)
+        return surf
+
+    @staticmethod
+    def heat_color(h):
+        """Cold (dim yellow) -> hot (red) for h in 0..1."""
+        return (int(120 + 135 * h), int(110 * (1 - h) + 30), 30)
+
+    def render(self, highlighter, cursor=None, heat=None):
+        """Redraw the visible window; cursor = (line, col) or None, heat = {line: 0..1} or None. Returns the view surface."""
+        surf = self.surface
+        n = len(highlighter.lines)
+        self.top = max(0, min(self.top, n - 1))
+        gutter = self.gutter_width(n)
+        lh = self.line_height
+
+        surf.fill(CODE_BG)
+        surf.fill(GUTTER_BG, (0, 0, gutter - GUTTER_PAD // 2, self.height))
+        numbers = self.text_cache.glyphs(self.font, GUTTER_FG)
+
+        end = min(n, self.top + self.rows + 1) # +1: partially visible last row
+        batch = []
+        for row, i in enumerate(range(self.top, end)):
+            y = row * lh
+            label = str(i + 1)
+            numbers.draw(surf, label, (gutter - GUTTER_PAD - numbers.size(label)[0], y))
+            if heat and i in heat:
+                surf.fill(self.heat_color(heat[i]), (0, y, HEAT_WIDTH, lh))
+            pieces = highlighter.line_pieces(i)
+            if pieces:
+                batch.append((self._line_surface(pieces), (gutter - self.left, y)))
+
+        surf.set_clip((gutter, 0, self.width - gutter, self.height))
+        surf.blits(batch, doreturn=False)
+        if cursor is not None and self.top <= cursor[0] < end:
+            line, col = cursor
+            x = gutter - self.left + self.column_x(highlighter.lines[line], col)
+            surf.fill(CURSOR_COLOR, (x, (line - self.top) * lh, 2, lh))
+        surf.set_clip(None)
+        return surf
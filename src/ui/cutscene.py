@@ -100,6 +100,7 @@ class CutsceneManager:
         self.step = 0
         self.wait_condition = None
         self.triggers_enabled = False # Only listen to triggers after basic tutorial
+        self.seen_rot_warning = False
 
     def trigger(self, event_name):
         if not self.triggers_enabled: return
@@ -109,6 +110,12 @@ class CutsceneManager:
              self.dialog.show("AI ASSISTANT", "Genetic template integrated. New seeds available in CROP_FACTORY.")
              self.state = "PLAYING"
              
+        elif event_name == "pumpkin_rotted":
+             if not self.seen_rot_warning and self.state == "IDLE":
+                 self.seen_rot_warning = True
+                 self.dialog.show("AI ASSISTANT", "Biohazard: a pumpkin rotted on maturity. Use drone.destroy() to clear it before replanting.")
+                 self.state = "PLAYING"
+
         elif event_name == "first_harvest":
              if self.step == 9: # Only if waiting for harvest
                  self.next_step()
@@ -6,18 +6,26 @@ import threading
 import time
 import sys
 import traceback
+from collections import deque
 from src.config import *
 from src.core.farm import Farm
-from src.entities.crops import Pumpkin, OccupiedSlot
 from src.core.api import DroneAPI
+from src.core.events import EV_MOVE, EV_PLANT, EV_HARVEST, EV_BATCH
 from src.core.storage import SaveManager
+from src.core.script_cache import get_script_cache
+from src.core.profiler import ScriptProfiler
+from src.core.autosave import AutosaveService
+from src.core.journal import FarmJournal
+from src.core.replay import SessionRecorder
 from src.core.skills import SkillManager
 from src.core.skills import SkillManager
 from src.ui.windows import CropGuideWindow, SkillTreeWindow, CropDetailWindow, CodeEditorWindow, NewFileModal, FileBrowserWindow
 from src.ui.cutscene import CutsceneManager
 
 from src.ui.cutscene import CutsceneManager
-from src.ui.visuals import get_visual_manager, Tween, ease_out_back
+from src.ui.visuals import get_visual_manager, ease_out_back, ease_out_quad, ease_linear
+from src.ui.renderer import FarmRenderer
+from src.ui.camera import Camera
 
 from src.utils.highlighter import SyntaxHighlighter
 
@@ -40,7 +48,25 @@ class GameIDE:
         self.global_timer = 0.0
 
         self.farm = Farm()
+        self.camera = Camera()
+        self.camera.fit(self.farm)
+        self.renderer = FarmRenderer(self.visual_manager, self.camera)
         self.drone = DroneAPI(self.farm, self.print_to_console)
+        self.autosave = AutosaveService(self.farm, self.drone) # Snapshot on this thread, write on a worker
+        self.journal = None
+        if JOURNAL_ENABLED:
+            # A journal left behind means the last session did not shut down cleanly: replay it
+            self.journal = FarmJournal()
+            try:
+                replayed = self.journal.recover(self.farm, self.drone)
+                if replayed is not None:
+                    print(f"Recovered farm from journal ({replayed} changes replayed)")
+                    self.camera.fit(self.farm)
+            except Exception as e:
+                # Keep the crashed session's files: the new generation would compact them away
+                print(f"Journal recovery failed: {e}; journal moved to {self.journal.set_aside()}")
+            self.journal.start(self.farm, self.drone, self.autosave)
+        self.recorder = None # SessionRecorder while F9 recording is on
         self.skill_manager = SkillManager()
         
         # Attract Mode State
@@ -60,6 +86,7 @@ class GameIDE:
         self.running = True
         
         self.thread = None 
+        self.finished_profiles = deque() # (editor window, ScriptProfiler) handed from the script thread to the main loop
 
         # --- UI Components ---
         self.editor_visible = False # Start hidden
@@ -68,6 +95,7 @@ class GameIDE:
         # --- Cutscene ---
         self.cutscene_mgr = CutsceneManager(self)
         self.cutscene_mgr.start_intro() 
+        self.farm.maturity_listeners.append(self.on_crops_matured)
         
         # Initialize Main Windows (Stacked)
         spawn_files = {
@@ -89,7 +117,8 @@ class GameIDE:
             'skills': SkillTreeWindow(self.ui_manager, self.skill_manager, self.drone)
         }
 
-    def run_user_code(self, code_string=None, on_finish=None):
+    def run_user_code(self, code_string=None, on_finish=None, filename="<editor>", profile_window=None):
+        """Run a script on the drone thread; with profile_window, profile it and show the heat map there."""
         code = code_string if code_string else ""
         
         if self.thread and self.thread.is_alive():
@@ -103,20 +132,45 @@ class GameIDE:
 
 
         def target():
-            env = { 'drone': self.drone, 'time': time, 'print': self.drone.log }
+            profiler = ScriptProfiler(self.drone, filename) if profile_window else None
             try:
-                exec(code, env)
+                code_obj = get_script_cache().get(code, filename)
+                if profiler: profiler.install()
+                env = { 'drone': self.drone, 'time': time, 'print': self.drone.log }
+                exec(code_obj, env)
             except SystemExit:
                 pass 
             except Exception as e:
                 self.print_to_console(f"<font color='#FF0000'>Error: {e}</font>")
                 traceback.print_exc()
             finally:
+                if profiler:
+                    profiler.uninstall()
+                    self.finished_profiles.append((profile_window, profiler))
                 if on_finish: on_finish()
 
         self.thread = threading.Thread(target=target, daemon=True)
         self.thread.start()
 
+    def show_profile(self, win, profiler):
+        """Main thread: heat gutter in the editor, summary in the console, JSON next to the script."""
+        if win in self.editor_windows:
+            win.set_heat(profiler.heat())
+        for line in profiler.summary():
+            self.print_to_console(f"<font color='#FFA500'>{line}</font>")
+        SaveManager.ensure_user_scripts_dir()
+        path = os.path.join("user_scripts", os.path.splitext(os.path.basename(win.filename))[0] + ".profile.json")
+        try:
+            profiler.save_json(path)
+            self.print_to_console(f"Profile written to {path}")
+        except OSError as e:
+            self.print_to_console(f"<font color='#FF0000'>Profile export failed: {e}</font>")
+
+    def on_crops_matured(self, ripe):
+        """Farm maturity callback (main thread, inside farm.update)."""
+        if any(getattr(crop, "is_rotten", False) for _, _, crop in ripe):
+            self.cutscene_mgr.trigger("pumpkin_rotted")
+
     def start_demo(self):
         """Standard Demo Script using Native Runner"""
         DEMO_SCRIPT = """
@@ -178,7 +232,7 @@ print("--- MISSION COMPLETE ---")
             self.demo_active = False
             self.print_to_console("Demo Complete.")
         
-        self.run_user_code(code_string=DEMO_SCRIPT, on_finish=on_demo_done)
+        self.run_user_code(code_string=DEMO_SCRIPT, on_finish=on_demo_done, filename=win.filename)
 
     def _init_ui_elements(self):
         # 1. System Buttons
@@ -226,6 +280,9 @@ print("--- MISSION COMPLETE ---")
         self.btn_skills = pygame_gui.elements.UIButton(relative_rect=pygame.Rect((current_x, 10), (btn_w, 30)),
                                                     text='SKILLS', manager=self.ui_manager)
 
+        # Repainted every frame by the dirty-rect renderer (hover states)
+        self.toolbar_rect = pygame.Rect(start_x, 10, current_x + btn_w - start_x, 30)
+
 
 
 
@@ -265,122 +322,171 @@ print("--- MISSION COMPLETE ---")
         self.visual_manager.play_sound("blip")
 
     def process_drone_events(self):
-        while self.drone.events:
-            event = self.drone.events.pop(0)
-            
-            view_width = SCREEN_WIDTH # Full screen, ignoring editor state
+        # Moves (single or batched) are merged into the drone's waypoint list; advance_drone_path
+        # flies one tween per axis through it, corner by corner, however fast the script
 
-            start_x = (view_width - self.farm.width * GRID_SIZE) // 2
-            start_y = (SCREEN_HEIGHT - self.farm.height * GRID_SIZE) // 2
-            
-            grid_x, grid_y = event.get("x"), event.get("y")
-            screen_x = start_x + grid_x * GRID_SIZE + GRID_SIZE // 2
-            screen_y = start_y + grid_y * GRID_SIZE + GRID_SIZE // 2
+        for kind, grid_x, grid_y, payload, amount, frame in self.drone.events.drain():
+            if self.recorder:
+                self.recorder.event(kind, grid_x, grid_y, payload, frame)
+            screen_x, screen_y = self.camera.tile_center(grid_x, grid_y)
 
-            if event["type"] == "move":
-                self.visual_manager.add_tween(Tween(self.drone, "visual_x", float(grid_x), 0.2))
-                self.visual_manager.add_tween(Tween(self.drone, "visual_y", float(grid_y), 0.2))
+            if kind == EV_MOVE:
+                self.queue_waypoint(grid_x, grid_y)
             
-            elif event["type"] == "plant":
+            elif kind == EV_PLANT:
                 self.visual_manager.spawn_poof(screen_x, screen_y)
-                self.visual_manager.spawn_floating_text(screen_x, screen_y - 30, f"Planted {event['name']}", (100, 255, 100))
+                self.visual_manager.spawn_floating_text(screen_x, screen_y - 30, f"Planted {payload}", (100, 255, 100))
                 self.visual_manager.play_sound("pop")
             
-            elif event["type"] == "harvest":
+            elif kind == EV_HARVEST:
                 self.visual_manager.spawn_spark(screen_x, screen_y)
-                self.visual_manager.spawn_floating_text(screen_x, screen_y - 30, f"+1 {event['name']}", (255, 215, 0))
+                self.visual_manager.spawn_floating_text(screen_x, screen_y - 30, f"+1 {payload}", (255, 215, 0))
                 self.visual_manager.play_sound("ding")
 
-    def draw_game_area(self):
-        view_width = SCREEN_WIDTH 
-        view_rect = pygame.Rect(0, 0, view_width, SCREEN_HEIGHT)
-        
-        # Clear ENTIRE window to prevent trails/hall of mirrors
-        self.window.fill(COLOR_GAME_BG) # Fill everything
-
-        # Removed legacy sidebar fill
-
-
-        # Grid
-        start_x = (view_width - (self.farm.width * GRID_SIZE)) // 2
-        start_y = (SCREEN_HEIGHT - (self.farm.height * GRID_SIZE)) // 2
-        
-        tile_img = self.visual_manager.get_asset("tile_grass")
-        
-        # Pass 1: Background Tiles
-        for y in range(self.farm.height):
-            for x in range(self.farm.width):
-                r_x, r_y = start_x + x * GRID_SIZE, start_y + y * GRID_SIZE
-                self.window.blit(tile_img, (r_x, r_y))
-                pygame.draw.rect(self.window, (80, 100, 120), (r_x, r_y, GRID_SIZE, GRID_SIZE), 1)
-
-        # Pass 2: Crops
-        for y in range(self.farm.height):
-            for x in range(self.farm.width):
-                r_x, r_y = start_x + x * GRID_SIZE, start_y + y * GRID_SIZE
+            elif kind == EV_BATCH:
+                # One event for a whole run_path / plant_rect / harvest_rect call
+                path, plants, harvests = payload
+                for px, py in path:
+                    self.queue_waypoint(px, py)
+                self.queue_waypoint(grid_x, grid_y)
                 
-                crop = self.farm.grid[y][x]
-                if crop and not isinstance(crop, OccupiedSlot):
-                    base_name = crop.name.lower()
-                    scale = 1
-                    is_rotten = False
-                    
-                    if isinstance(crop, Pumpkin):
-                        base_name = "pumpkin"
-                        scale = crop.level
-                        is_rotten = crop.is_rotten
-                    
-                    stage = min(4, int((crop.current_growth / crop.max_growth) * 3) + 1)
-                    img = self.visual_manager.get_asset(f"crop_{base_name}_stage{stage}")
-                    
-                    if img:
-                        target_size = int(GRID_SIZE * scale)
-                        # ensure pixel perfect fit
-                        if img.get_width() != target_size:
-                             img = pygame.transform.scale(img, (target_size, target_size))
-                        
-                        if is_rotten:
-                            img = img.copy()
-                            img.fill((80, 50, 30), special_flags=pygame.BLEND_MULT) 
-                        
-                        # Blit Top-Left aligned to grid
-                        r_x = start_x + x * GRID_SIZE
-                        r_y = start_y + y * GRID_SIZE
-                        self.window.blit(img, (r_x, r_y))
-                        
-                        # Debug Border for Mega Crops
-                        if scale > 1:
-                            pygame.draw.rect(self.window, (255, 215, 0), (r_x, r_y, target_size, target_size), 2)
-
-        # Drone
-        d_x = start_x + self.drone.visual_x * GRID_SIZE
-        d_y = start_y + self.drone.visual_y * GRID_SIZE
-        drone_img = self.visual_manager.get_animated_asset("drone_idle", self.global_timer, speed=15)
-        self.window.blit(drone_img, drone_img.get_rect(center=(d_x + GRID_SIZE//2, d_y + GRID_SIZE//2)))
-        
-        self.visual_manager.draw(self.window)
+                for px, py, name in plants:
+                    self.visual_manager.spawn_poof(*self.camera.tile_center(px, py))
+                if plants:
+                    self.visual_manager.play_sound("pop")
+                
+                total = 0
+                for hx, hy, name, amount in harvests:
+                    self.visual_manager.spawn_spark(*self.camera.tile_center(hx, hy))
+                    total += amount
+                if harvests:
+                    self.visual_manager.spawn_floating_text(screen_x, screen_y - 30, f"+{total}", (255, 215, 0))
+                    self.visual_manager.play_sound("ding")
+
+        self.advance_drone_path()
+
+    def queue_waypoint(self, x, y):
+        """Append a tile to the drone's path; one further along the same straight line just extends the last leg."""
+        wp = self.drone.waypoints
+        if wp and wp[-1] == (x, y):
+            return
+        if len(wp) >= 2:
+            (ax, ay), (bx, by) = wp[-2], wp[-1]
+            if (bx - ax) * (y - by) == (by - ay) * (x - bx) and (bx - ax) * (x - bx) + (by - ay) * (y - by) > 0:
+                wp[-1] = (x, y)
+                return
+        wp.append((x, y)) # Beyond DRONE_WAYPOINT_MAX the oldest corner is dropped
+
+    def advance_drone_path(self):
+        """Once the drone has reached its current waypoint, retarget its tweens to the next one."""
+        wp = self.drone.waypoints
+        tweens = self.visual_manager.tweens
+        if not wp or (id(self.drone), "visual_x") in tweens or (id(self.drone), "visual_y") in tweens:
+            return
+        x, y = wp.popleft()
+        # Shorter legs while the script is ahead; ease out only into the last corner
+        duration = 0.2 / (1 + len(wp))
+        easing = ease_linear if wp else ease_out_quad
+        self.visual_manager.tween_to(self.drone, "visual_x", float(x), duration, easing)
+        self.visual_manager.tween_to(self.drone, "visual_y", float(y), duration, easing)
+
+    def needs_full_redraw(self):
+        """Windows / dialogs / overlays can cover anything: present the whole frame then."""
+        if self.demo_active or self.cutscene_mgr.state != "IDLE":
+            return True
+        return any(win.visible for win in self.ui_manager.get_window_stack().get_stack())
+
+    def draw_game_area(self):
+        """Returns the rects that changed this frame, or None if the whole window was redrawn."""
+        full = self.needs_full_redraw()
+
+        # Background (cached) + crops: only changed tiles and last frame's overlays are repainted
+        dirty = self.renderer.begin_frame(self.window, self.farm, full, extra_rects=[self.toolbar_rect])
+        start_x, start_y = self.renderer.origin(self.farm)
+        t = self.camera.tile
+        dynamic = []
+
+        # Drone (scaled with the zoom, but never smaller than a visible marker)
+        d_x = start_x + self.drone.visual_x * t
+        d_y = start_y + self.drone.visual_y * t
+        frame_idx = int(self.global_timer * 15) % 4
+        drone_img = self.visual_manager.get_asset(f"drone_idle_{frame_idx}")
+        if t != GRID_SIZE:
+            w, h = drone_img.get_size()
+            drone_img = self.visual_manager.get_sprite(f"drone_idle_{frame_idx}", (max(8, w * t // GRID_SIZE), max(8, h * t // GRID_SIZE)))
+        dynamic.append(self.window.blit(drone_img, drone_img.get_rect(center=(d_x + t//2, d_y + t//2))))
+        
+        dynamic.extend(self.visual_manager.draw(self.window))
         self.cutscene_mgr.draw(self.window)
         
         # HUD
         if not hasattr(self, 'font_hud'): self.font_hud = pygame.font.SysFont("Consolas", 18, bold=True)
-        lines = [("FARM OS V3.2", (100, 200, 255)), ("STATUS: ONLINE", (50, 255, 50))]
-        for k, v in self.drone.inventory.items(): lines.append((f"  • {k.upper()}: {v}", (255, 255, 255)))
+        # Labels come from the text cache; counts are composed from a pre-rendered digit atlas
+        text = self.visual_manager.text
+        lines = [("FARM OS V3.2", None, (100, 200, 255)), ("STATUS: ONLINE", None, (50, 255, 50))]
+        for k, v in self.drone.inventory.items(): lines.append((f"  • {k.upper()}: ", str(v), (255, 255, 255)))
         
         hy = 20
-        for txt, col in lines:
-            self.window.blit(self.font_hud.render(txt, True, (0,0,0)), (22, hy+2))
-            self.window.blit(self.font_hud.render(txt, True, col), (20, hy))
+        for label, value, col in lines:
+            for dx, dy, c in ((2, 2, (0, 0, 0)), (0, 0, col)): # Shadow, then colour
+                rect = self.window.blit(text.render(self.font_hud, label, c), (20 + dx, hy + dy))
+                dynamic.append(rect)
+                if value is not None:
+                    dynamic.append(text.glyphs(self.font_hud, c).draw(self.window, value, rect.topright))
             hy += 20
 
+        self.renderer.end_frame(dynamic)
+        if dirty is None:
+            return None
+        return dirty + dynamic
+
     def get_screen_coords(self, grid_x, grid_y):
-        view_width = SCREEN_WIDTH - UI_PANEL_WIDTH if self.editor_visible else SCREEN_WIDTH
-        start_x = (view_width - self.farm.width * GRID_SIZE) // 2
-        start_y = (SCREEN_HEIGHT - self.farm.height * GRID_SIZE) // 2
-        
-        screen_x = start_x + grid_x * GRID_SIZE + GRID_SIZE // 2
-        screen_y = start_y + grid_y * GRID_SIZE + GRID_SIZE // 2
-        
-        return screen_x, screen_y
+        return self.camera.tile_center(grid_x, grid_y)
+
+    def handle_camera_event(self, event):
+        """Mouse wheel = zoom at cursor, right/middle drag = pan, F2 = fit farm. Ignored over UI."""
+        if event.type == pygame.MOUSEWHEEL:
+            if not self.ui_manager.get_hovering_any_element():
+                self.camera.zoom_at(event.y, *pygame.mouse.get_pos())
+        elif event.type == pygame.MOUSEMOTION:
+            if (event.buttons[1] or event.buttons[2]) and not self.ui_manager.get_hovering_any_element():
+                self.camera.pan(*event.rel)
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F2:
+            self.camera.fit(self.farm)
+
+    def load_game(self, autosave=False):
+        """LOAD button: the newest manual save. F8 (autosave=True): the newest file of the autosave ring."""
+        self.autosave.flush() # A save still being written may be the one we want
+        path = None
+        if autosave:
+            saves = self.autosave.saves()
+            if not saves:
+                self.print_to_console("No autosave found.")
+                return
+            path = saves[0]
+        self.stop_recording() # The trace cannot follow a state swap
+        if SaveManager.load_game(self.farm, self.drone, path):
+            self.print_to_console(f"Loaded Farm State{f' from {path}' if path else ''}.")
+            if self.journal:
+                self.journal.checkpoint(self.autosave) # New base: the old log does not apply to this state
+
+    def toggle_recording(self):
+        """F9: start / stop recording the session into a replay trace (python -m src.core.replay <trace>)."""
+        if self.recorder is None:
+            os.makedirs(REPLAY_DIR, exist_ok=True)
+            path = os.path.join(REPLAY_DIR, time.strftime("session_%Y%m%d_%H%M%S.cfr"))
+            self.recorder = SessionRecorder(path, self.farm, self.drone)
+            self.print_to_console(f"<font color='#FF4444'>REC</font> Recording to {path}")
+        else:
+            self.stop_recording()
+
+    def stop_recording(self):
+        if self.recorder is None:
+            return
+        recorder, self.recorder = self.recorder, None
+        digest = recorder.finish()
+        note = " (events were dropped: replay will not match)" if recorder.lossy else ""
+        self.print_to_console(f"Recorded {recorder.frames} frames to {recorder.path}, state {digest[:12]}{note}")
 
     def handle_input_activity(self):
         """Reset idle timer on any input. Do NOT auto-stop showcase."""
@@ -412,6 +518,7 @@ print("--- MISSION COMPLETE ---")
                     if "container_to_scroll" not in str(e): print(f"UI Error: {e}")
                 
                 self.cutscene_mgr.handle_event(event)
+                self.handle_camera_event(event)
 
                 if event.type == pygame.KEYDOWN:
                     # Showcase Abort
@@ -422,6 +529,8 @@ print("--- MISSION COMPLETE ---")
                         self.print_to_console("Showcase Cancelled.")
 
                     elif event.key == pygame.K_F5: self.cutscene_mgr.start_intro()
+                    elif event.key == pygame.K_F8: self.load_game(autosave=True)
+                    elif event.key == pygame.K_F9: self.toggle_recording()
                     elif event.key == pygame.K_F12: 
                          self.start_demo()
                          
@@ -486,7 +595,11 @@ print("--- MISSION COMPLETE ---")
                     handled_editor = False
                     for win in self.editor_windows:
                         if event.ui_element == win.btn_run:
-                            self.run_user_code(code_string=win.raw_code)
+                            self.run_user_code(code_string=win.raw_code, filename=win.filename)
+                            handled_editor = True
+                            break
+                        elif event.ui_element == win.btn_profile:
+                            self.run_user_code(code_string=win.raw_code, filename=win.filename, profile_window=win)
                             handled_editor = True
                             break
                         elif event.ui_element == win.btn_save:
@@ -507,13 +620,14 @@ print("--- MISSION COMPLETE ---")
                     if not handled_editor:
                         if event.ui_element == self.btn_save: 
                             # Global save
-                            SaveManager.save_game(self.farm, self.drone, "") # Empty code?
-                            self.print_to_console("Farm State Saved.")
+                            if SAVE_FORMAT == "binary":
+                                self.autosave.save(BINARY_SAVE_FILE, manual=True) # Reported when written
+                            else:
+                                SaveManager.save_game(self.farm, self.drone, "") # Empty code?
+                                self.print_to_console("Farm State Saved.")
                             
                         elif event.ui_element == self.btn_load:
-                            l = SaveManager.load_game(self.farm, self.drone)
-                            if l: 
-                                self.print_to_console("Loaded Farm State.")
+                            self.load_game()
                                 
                         elif event.ui_element == self.btn_guide: 
                             if not self.windows['guide'].window.alive(): self.windows['guide'] = CropGuideWindow(self.ui_manager)
@@ -556,6 +670,9 @@ print("--- MISSION COMPLETE ---")
                                 # 2. Try Unlock
                                 if not node.unlocked:
                                     if self.skill_manager.unlock(btn.skill_id, self.drone.inventory):
+                                        if self.journal:
+                                            for item, amount in node.cost.items():
+                                                self.journal.inventory(item, -amount)
                                         self.visual_manager.play_sound("ding")
                                         self.windows['skills'].refresh()
                                         self.cutscene_mgr.trigger("skill_unlocked")
@@ -600,12 +717,24 @@ print("--- MISSION COMPLETE ---")
                 self.editor_visible = True
                 self.editor_panel.show()
                 self.print_to_console("System Control Restored.")
+
+            while self.finished_profiles:
+                self.show_profile(*self.finished_profiles.popleft())
             
             self.process_drone_events() # Universal Handler
+            if self.recorder:
+                self.recorder.frame(dt)
             self.farm.update(dt)
+            self.autosave.update(dt)
+            if self.journal:
+                self.journal.update(dt, self.autosave)
+            while self.autosave.results:
+                path, ok, message, manual = self.autosave.results.popleft()
+                if manual or not ok: # Periodic autosaves stay quiet unless they fail
+                    self.print_to_console(message if ok else f"<font color='#FF0000'>{message}</font>")
             self.visual_manager.update(dt)
             
-            self.draw_game_area()
+            dirty_rects = self.draw_game_area()
             
             # Draw Demo Overlay
             if self.demo_active:
@@ -618,7 +747,16 @@ print("--- MISSION COMPLETE ---")
             except Exception as e:
                 print(f"GUI Draw Error: {e}")
                 
-            pygame.display.flip()
+            if dirty_rects is None:
+                pygame.display.flip()
+            else:
+                pygame.display.update(dirty_rects)
             
+        self.stop_recording()
+        if self.journal:
+            self.journal.close()
+        self.autosave.close() # Finish writes still in flight
+        if self.journal:
+            self.journal.discard() # Clean shutdown: nothing to recover next time
         pygame.quit()
         sys.exit()
@@ -0,0 +1,131 @@
+import random
+from array import array
+import pygame
+
+PARTICLE_FRAMES = 16 # Prebaked fade / shrink steps per particle image
+
+
+class FrameSet:
+    """
+    Prebaked life-cycle frames of one particle image (预烘焙帧).
+
+    frames[k] is the image at remaining-life ratio 1 - k / PARTICLE_FRAMES
+    (alpha and/or scale already applied), stored as (surface, half_w, half_h).
+    Frames are built lazily the first time they are needed and then shared by
+    every particle using the same image, so drawing never copies a surface.
+    """
+    def __init__(self, image, fade=True, scale_fade=False):
+        self.image = image
+        self.fade = fade
+        self.scale_fade = scale_fade
+        self.frames = [False] * PARTICLE_FRAMES # False = not built yet, None = invisible
+
+    def frame(self, k):
+        f = self.frames[k]
+        if f is False:
+            f = self.frames[k] = self._bake(1.0 - k / PARTICLE_FRAMES)
+        return f
+
+    def _bake(self, ratio):
+        img = self.image
+        if self.scale_fade:
+            w = int(img.get_width() * ratio)
+            h = int(img.get_height() * ratio)
+            if w <= 0 or h <= 0: return None
+            img = pygame.transform.scale(img, (w, h))
+        elif self.fade:
+            img = img.copy() # set_alpha must not touch the shared asset
+        if self.fade:
+            img.set_alpha(int(255 * ratio))
+        return (img, img.get_width() // 2, img.get_height() // 2)
+
+
+class ParticlePool:
+    """
+    Fixed-capacity particle storage as parallel arrays (struct of arrays).
+
+    Live particles are packed into slots [0, count); a dying particle is
+    replaced by the last live one (swap-remove), so update() is one tight loop
+    over flat arrays and never rebuilds a list. Spawns beyond `capacity` are
+    dropped (hard cap).
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.count = 0
+        self.dropped = 0
+        zeros = bytes(8 * capacity)
+        self.x = array('d', zeros)
+        self.y = array('d', zeros)
+        self.vx = array('d', zeros)
+        self.vy = array('d', zeros)
+        self.life = array('d', zeros)
+        self.max_life = array('d', zeros)
+        self.style = [None] * capacity # FrameSet per slot
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+        self.style = [None] * self.capacity
+
+    def spawn(self, x, y, frame_set, life=1.0, vel=(0, 0)):
+        i = self.count
+        if i >= self.capacity:
+            self.dropped += 1
+            return False
+        self.x[i] = x
+        self.y[i] = y
+        self.vx[i], self.vy[i] = vel
+        self.life[i] = life
+        self.max_life[i] = life
+        self.style[i] = frame_set
+        self.count = i + 1
+        return True
+
+    def spawn_burst(self, x, y, frame_set, n, life, vx_range, vy_range, life_jitter=0.0):
+        """n particles from (x, y) with random velocities (and optionally random extra life)."""
+        room = self.capacity - self.count
+        if n > room:
+            self.dropped += n - room
+            n = room
+        uniform = random.uniform
+        rand = random.random
+        for _ in range(n):
+            self.spawn(x, y, frame_set, life + rand() * life_jitter, (uniform(*vx_range), uniform(*vy_range)))
+
+    def update(self, dt):
+        x, y, vx, vy = self.x, self.y, self.vx, self.vy
+        life, max_life, style = self.life, self.max_life, self.style
+        n = self.count
+        i = 0
+        while i < n:
+            remaining = life[i] - dt
+            if remaining <= 0:
+                # Swap-remove: move the last live particle into this slot and re-check it
+                n -= 1
+                x[i] = x[n]; y[i] = y[n]; vx[i] = vx[n]; vy[i] = vy[n]
+                life[i] = life[n]; max_life[i] = max_life[n]; style[i] = style[n]
+                style[n] = None
+                continue
+            life[i] = remaining
+            x[i] += vx[i] * dt
+            y[i] += vy[i] * dt
+            i += 1
+        self.count = n
+
+    def draw(self, surface):
+        """One Surface.blits() call for all live particles; returns the touched rects."""
+        x, y, life, max_life, style = self.x, self.y, self.life, self.max_life, self.style
+        last = PARTICLE_FRAMES - 1
+        batch = []
+        for i in range(self.count):
+            k = int((1.0 - life[i] / max_life[i]) * PARTICLE_FRAMES)
+            f = style[i].frame(k if k < last else last)
+            if f is None:
+                continue
+            img, hw, hh = f
+            batch.append((img, (int(x[i]) - hw, int(y[i]) - hh)))
+        if not batch:
+            return []
+        return surface.blits(batch)
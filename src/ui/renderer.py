@@ -0,0 +1,300 @@
+import re
+import time
+import pygame
+from src.config import *
+from src.ui.atlas import bake_atlas
+from src.entities.crops import Pumpkin
+from src.core.grid_store import TYPE_IDS, TYPE_OCCUPIED
+
+ROT_TINT = (80, 50, 30) # BLEND_MULT colour for rotten crops
+
+# Minimap (LOD) colour per tile type
+MINIMAP_COLORS = {
+    "carrot": (235, 130, 40),
+    "pumpkin": (200, 90, 10),
+    "blueberry": (70, 90, 220),
+    "sunflower": (245, 220, 50),
+}
+MINIMAP_GRASS = (70, 120, 60)
+
+CROP_ASSET = re.compile(r"^crop_(\w+)_stage(\d+)$")
+GRASS_KEY = ("tile_grass", 0, 1, False) # Shaped like a crop_key so atlas regions stay comparable
+
+
+class FarmRenderer:
+    """
+    Incremental farm renderer (脏矩形增量渲染).
+
+    The grass tiles + grid lines never change, so they are baked once into a
+    screen-sized background surface. Every frame only these regions are
+    repainted (background + the crops that overlap them):
+      - tiles whose crop sprite changed (planted / harvested / new growth stage / fused / rotted)
+      - whatever was drawn on top last frame (drone, particles, HUD...)
+      - extra overlay regions the caller asks for (e.g. the toolbar buttons)
+    The caller then presents them with pygame.display.update(rects).
+
+    Grass and crops are blitted as sub-rects of one TextureAtlas baked at the
+    current tile size (every crop stage, rotten pumpkins pre-tinted, mega
+    crops added as they show up), re-baked when the zoom or the assets change.
+
+    Only the tiles inside the camera's visible range are ever scanned or drawn.
+    When the camera is zoomed out below CAMERA_LOD_TILE_PX the farm is drawn as
+    a minimap instead: one colour block per tile, rebuilt from grid.type_codes()
+    at most every MINIMAP_REFRESH seconds.
+
+    begin_frame(..., full=True) falls back to a plain full redraw (caller flips),
+    used while UI windows or cutscenes cover arbitrary parts of the screen.
+    """
+    MAX_DIRTY_RECTS = 256 # More than this and a full redraw is cheaper than the bookkeeping
+
+    def __init__(self, visual_manager, camera):
+        self.visual_manager = visual_manager
+        self.camera = camera
+        self.background = None
+        self._bg_key = None
+        self._atlas = None     # TextureAtlas of grass + crop variants at `_atlas_key` tile size
+        self._atlas_key = None # (asset_version, tile px)
+        self._mega_keys = set() # crop_keys with scale > 1 seen so far (baked on demand)
+        self._tiles = {}     # (x, y) -> sprite key drawn last frame (visible root tiles only)
+        self._cover = {}     # (x, y) -> root (x, y) for tiles covered by a mega crop
+        self._last_dynamic = [] # Rects of the drone / particles / HUD drawn last frame
+        self.force_full = True
+
+        self._minimap = None # (surface, camera state) of the scaled minimap layer
+        self._minimap_time = 0.0
+        self._minimap_palette = [MINIMAP_GRASS] * 256
+        for name, tid in TYPE_IDS.items():
+            self._minimap_palette[tid] = MINIMAP_COLORS.get(name, (200, 200, 200))
+        self._minimap_palette[TYPE_OCCUPIED] = MINIMAP_COLORS["pumpkin"] # Only pumpkins fuse
+
+    def invalidate(self):
+        """Assets or layout changed: rebuild the background and redraw everything next frame."""
+        self.background = None
+        self._minimap = None
+        self._atlas = None
+        self._atlas_key = None
+        self.force_full = True
+
+    # --- Atlas ---
+
+    def _variant(self, key):
+        """(asset name, size, tint) of the sprite drawn for crop_key `key` at the current tile size."""
+        base_name, stage, scale, is_rotten = key
+        size = self.camera.tile * scale # ensure pixel perfect fit
+        name = "tile_grass" if key == GRASS_KEY else f"crop_{base_name}_stage{stage}"
+        return name, (size, size), ROT_TINT if is_rotten else None
+
+    def _ensure_atlas(self, extra=()):
+        """Bake grass + every crop variant at the current tile size (again on zoom / asset reload / new mega crop)."""
+        vm = self.visual_manager
+        key = (vm.asset_version, self.camera.tile)
+        new_megas = [k for k in extra if k not in self._mega_keys]
+        if self._atlas_key == key and not new_megas:
+            return
+        self._mega_keys.update(new_megas)
+        keys = {GRASS_KEY} | self._mega_keys
+        for name in vm.assets:
+            m = CROP_ASSET.match(name)
+            if m:
+                base_name, stage = m.group(1), int(m.group(2))
+                keys.add((base_name, stage, 1, False))
+                if base_name == "pumpkin": # Only pumpkins rot
+                    keys.add((base_name, stage, 1, True))
+        self._atlas = bake_atlas(vm.assets, {k: self._variant(k) for k in keys})
+        self._atlas_key = key
+
+    def _region(self, key):
+        """(atlas surface, area) for crop_key `key`, or (standalone sprite, None) if it is not in the atlas."""
+        atlas = self._atlas
+        if atlas is not None and key in atlas.regions:
+            return atlas.surface, atlas.regions[key]
+        return self.crop_sprite(key), None # Missing asset (placeholder) or wider than the atlas
+
+    def origin(self, farm):
+        return self.camera.origin()
+
+    # --- Background ---
+
+    def _ensure_background(self, farm):
+        cam = self.camera
+        key = (farm.width, farm.height, self.visual_manager.asset_version, cam.state())
+        if self.background is not None and self._bg_key == key:
+            return
+
+        bg = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        bg.fill(COLOR_GAME_BG)
+        t = cam.tile
+        x0, y0, x1, y1 = cam.visible_range(farm)
+        ox, oy = cam.origin()
+        if not cam.minimap: # In LOD mode the minimap layer draws the tiles itself
+            self._ensure_atlas()
+            source, area = self._region(GRASS_KEY)
+            cells = [(ox + x * t, oy + y * t) for y in range(y0, y1) for x in range(x0, x1)]
+            bg.blits([(source, cell, area) for cell in cells], doreturn=False)
+            for r_x, r_y in cells:
+                pygame.draw.rect(bg, (80, 100, 120), (r_x, r_y, t, t), 1)
+
+        self.background = bg
+        self._bg_key = key
+        self.force_full = True
+
+    # --- Crops ---
+
+    @staticmethod
+    def crop_key(crop):
+        """Everything that decides what a crop looks like: (base_name, stage, scale, rotten)."""
+        if isinstance(crop, Pumpkin):
+            base_name, scale, is_rotten = "pumpkin", crop.level, crop.is_rotten
+        else:
+            base_name, scale, is_rotten = crop.name.lower(), 1, False
+        stage = min(4, int((crop.current_growth / crop.max_growth) * 3) + 1)
+        return (base_name, stage, scale, is_rotten)
+
+    def crop_sprite(self, key):
+        """Standalone sprite for `key` (scaled / tinted once, cached by the VisualManager); the atlas is preferred."""
+        return self.visual_manager.get_sprite(*self._variant(key))
+
+    def _footprint(self, origin, pos, key):
+        t = self.camera.tile
+        size = t * key[2]
+        return pygame.Rect(origin[0] + pos[0] * t, origin[1] + pos[1] * t, size, size)
+
+    def _draw_crops(self, surface, origin, positions, tiles):
+        """Draw the crops at `positions` with a single Surface.blits() batch of atlas sub-rects."""
+        t = self.camera.tile
+        self._ensure_atlas([tiles[pos] for pos in positions if tiles[pos][2] > 1])
+        batch = []
+        borders = []
+        for pos in positions:
+            key = tiles[pos]
+            source, area = self._region(key)
+            if not source:
+                continue
+            # Top-Left aligned to grid
+            r_x = origin[0] + pos[0] * t
+            r_y = origin[1] + pos[1] * t
+            batch.append((source, (r_x, r_y), area))
+            if key[2] > 1:
+                size = t * key[2]
+                borders.append((r_x, r_y, size, size))
+        surface.blits(batch, doreturn=False)
+
+        # Debug Border for Mega Crops (nothing else is drawn on top of a mega crop's tiles)
+        for border in borders:
+            pygame.draw.rect(surface, (255, 215, 0), border, 2)
+
+    def _scan(self, farm):
+        """Sprite key of every root overlapping the visible range + which tiles mega crops cover."""
+        tiles = {}
+        cover = {}
+        for x, y, crop in farm.grid.iter_roots_in(*self.camera.visible_range(farm)):
+            key = self.crop_key(crop)
+            tiles[(x, y)] = key
+            scale = key[2]
+            if scale > 1:
+                for dy in range(scale):
+                    for dx in range(scale):
+                        cover[(x + dx, y + dy)] = (x, y)
+        return tiles, cover
+
+    def _roots_in(self, rect, origin, farm):
+        """Root tiles whose sprite overlaps `rect` (row-major, like a full redraw)."""
+        t = self.camera.tile
+        x0 = max(0, (rect.left - origin[0]) // t)
+        y0 = max(0, (rect.top - origin[1]) // t)
+        x1 = min(farm.width - 1, (rect.right - 1 - origin[0]) // t)
+        y1 = min(farm.height - 1, (rect.bottom - 1 - origin[1]) // t)
+        roots = set()
+        for y in range(y0, y1 + 1):
+            for x in range(x0, x1 + 1):
+                root = self._cover.get((x, y), (x, y))
+                if root in self._tiles:
+                    roots.add(root)
+        return sorted(roots, key=lambda p: (p[1], p[0]))
+
+    # --- Minimap (LOD) ---
+
+    def _draw_minimap(self, surface, farm):
+        cam = self.camera
+        now = time.monotonic()
+        if self._minimap is None or self._minimap[1] != cam.state() or now - self._minimap_time >= MINIMAP_REFRESH:
+            x0, y0, x1, y1 = cam.visible_range(farm)
+            layer = None
+            if x1 > x0 and y1 > y0:
+                # One byte per tile -> 8-bit palette surface -> scale the visible part up to the tile size
+                codes = farm.grid.type_codes()
+                pixels = pygame.image.frombuffer(codes, (farm.width, farm.height), "P")
+                pixels.set_palette(self._minimap_palette)
+                part = pixels.subsurface((x0, y0, x1 - x0, y1 - y0)).convert()
+                t = cam.tile
+                layer = (pygame.transform.scale(part, ((x1 - x0) * t, (y1 - y0) * t)), cam.tile_rect(x0, y0)[:2])
+            self._minimap = (layer, cam.state())
+            self._minimap_time = now
+
+        layer = self._minimap[0]
+        if layer:
+            surface.blit(*layer)
+
+    # --- Frame ---
+
+    def begin_frame(self, surface, farm, full=False, extra_rects=()):
+        """
+        Bring the static layer (background + crops) of `surface` up to date.
+        Returns the list of repainted rects, or None if the whole surface was redrawn.
+        """
+        self.camera.sync(farm)
+        self._ensure_background(farm)
+        origin = self.origin(farm)
+
+        if self.camera.minimap:
+            surface.blit(self.background, (0, 0))
+            self._draw_minimap(surface, farm)
+            self._tiles = {}
+            self._cover = {}
+            self.force_full = True # Leaving LOD mode needs a full frame
+            return None
+
+        tiles, cover = self._scan(farm)
+
+        dirty = None
+        if not (full or self.force_full):
+            dirty = list(self._last_dynamic)
+            dirty.extend(extra_rects)
+            prev = self._tiles
+            for pos, key in tiles.items():
+                old = prev.get(pos)
+                if old != key:
+                    dirty.append(self._footprint(origin, pos, key))
+                    if old is not None and old[2] > key[2]:
+                        dirty.append(self._footprint(origin, pos, old)) # Shrunk: old area too
+            for pos, old in prev.items():
+                if pos not in tiles:
+                    dirty.append(self._footprint(origin, pos, old))
+            if len(dirty) > self.MAX_DIRTY_RECTS:
+                dirty = None
+
+        self._tiles = tiles
+        self._cover = cover
+
+        if dirty is None:
+            surface.blit(self.background, (0, 0))
+            self._draw_crops(surface, origin, sorted(tiles, key=lambda p: (p[1], p[0])), tiles)
+            self.force_full = False
+            return None
+
+        screen_rect = surface.get_rect()
+        repainted = []
+        for rect in dirty:
+            rect = screen_rect.clip(rect)
+            if not rect.w or not rect.h:
+                continue
+            surface.set_clip(rect)
+            surface.blit(self.background, rect, rect)
+            self._draw_crops(surface, origin, self._roots_in(rect, origin, farm), tiles)
+            repainted.append(rect)
+        surface.set_clip(None)
+        return repainted
+
+    def end_frame(self, dynamic_rects):
+        """Remember what was drawn over the static layer so next frame can erase it."""
+        self._last_dynamic = [r for r in dynamic_rects if r]
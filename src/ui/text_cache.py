@@ -0,0 +1,83 @@
+from collections import OrderedDict
+import pygame
+
+GLYPH_CHARS = "0123456789+-.,:x "
+
+
+class TextCache:
+    """
+    LRU cache of rendered text surfaces (文字渲染缓存), keyed by (font, text, colour).
+
+    HUD lines and floating texts repeat the same strings frame after frame;
+    font rasterisation only happens the first time a string is seen.
+    """
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._surfaces = OrderedDict()
+        self._glyphs = {} # (font, colour) -> GlyphAtlas
+
+    def clear(self):
+        self._surfaces.clear()
+        self._glyphs.clear()
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, color, antialias)
+        surf = self._surfaces.get(key)
+        if surf is not None:
+            self._surfaces.move_to_end(key)
+            return surf
+        surf = font.render(text, antialias, color)
+        self._surfaces[key] = surf
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surf
+
+    def glyphs(self, font, color):
+        """GlyphAtlas for quickly changing numbers (counters) in this font/colour."""
+        key = (font, color)
+        atlas = self._glyphs.get(key)
+        if atlas is None:
+            atlas = self._glyphs[key] = GlyphAtlas(font, color)
+        return atlas
+
+
+class GlyphAtlas:
+    """
+    Digits and a few symbols pre-rendered once into a single strip (数字字形图集).
+
+    draw() composes a number glyph by glyph with one Surface.blits() call, so a
+    counter that changes every frame never hits the font rasteriser. Text
+    containing other characters falls back to a normal render.
+    """
+    def __init__(self, font, color, chars=GLYPH_CHARS):
+        self.font = font
+        self.color = color
+        glyphs = [font.render(c, True, color) for c in chars]
+        self.height = max(g.get_height() for g in glyphs)
+        width = sum(g.get_width() for g in glyphs)
+        self.surface = pygame.Surface((max(1, width), self.height), pygame.SRCALPHA)
+        self.regions = {}
+        x = 0
+        for c, g in zip(chars, glyphs):
+            self.surface.blit(g, (x, 0))
+            self.regions[c] = pygame.Rect(x, 0, g.get_width(), g.get_height())
+            x += g.get_width()
+
+    def can_draw(self, text):
+        return all(c in self.regions for c in text)
+
+    def size(self, text):
+        return sum(self.regions[c].w for c in text), self.height
+
+    def draw(self, surface, text, pos):
+        """Blit `text` at `pos`; returns the covered Rect."""
+        x, y = pos
+        if not self.can_draw(text):
+            return surface.blit(self.font.render(text, True, self.color), pos)
+        batch = []
+        for c in text:
+            area = self.regions[c]
+            batch.append((self.surface, (x, y), area))
+            x += area.w
+        surface.blits(batch, doreturn=False)
+        return pygame.Rect(pos[0], y, x - pos[0], self.height)
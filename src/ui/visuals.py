@@ -1,7 +1,11 @@
 import pygame
-import random
 import math
 import os
+from collections import OrderedDict
+from src.config import SPRITE_CACHE_MAX_BYTES, PARTICLE_MAX, TEXT_CACHE_SIZE
+from src.ui.atlas import build_atlas
+from src.ui.particles import ParticlePool, FrameSet
+from src.ui.text_cache import TextCache
 
 # --- Tweening Logic ---
 
@@ -51,61 +55,14 @@ class Tween:
             self.finished = True
             setattr(self.target, self.attr, self.end_value) 
 
-# --- Particle System ---
-
-class Particle:
-    def __init__(self, x, y, image, life=1.0, vel=(0,0), fade=True, scale_fade=False):
-        self.x = x
-        self.y = y
-        self.image = image
-        self.life = life
-        self.max_life = life
-        self.vel_x, self.vel_y = vel
-        self.fade = fade
-        self.scale_fade = scale_fade
-        self.alive = True
-        self.rot = random.uniform(0, 360)
-        self.rot_vel = random.uniform(-90, 90)
-
-    def update(self, dt):
-        self.life -= dt
-        if self.life <= 0:
-            self.alive = False
-            return
-
-        self.x += self.vel_x * dt
-        self.y += self.vel_y * dt
-        self.rot += self.rot_vel * dt
-        
-    def draw(self, surface):
-        if not self.alive or not self.image: return
-        
-        # Calculate Alpha
-        alpha = 255
-        ratio = self.life / self.max_life
-        if self.fade:
-            alpha = int(255 * ratio)
-        
-        # Copy for transform
-        img = self.image.copy()
-        
-        # Scale Fade (Shrink as it dies)
-        if self.scale_fade:
-            scale = ratio
-            w = int(img.get_width() * scale)
-            h = int(img.get_height() * scale)
-            if w <= 0 or h <= 0: return
-            img = pygame.transform.scale(img, (w, h))
-
-        # Alpha
-        img.set_alpha(alpha)
-        
-        # Rotation (Optional, maybe expensive for thousands of particles)
-        # img = pygame.transform.rotate(img, self.rot)
-
-        # Draw centered
-        rect = img.get_rect(center=(int(self.x), int(self.y)))
-        surface.blit(img, rect)
+    def retarget(self, end_value, duration=None):
+        """Restart from the current value towards a new end value (no jump, no second tween)."""
+        self.start_value = getattr(self.target, self.attr, self.start_value)
+        self.end_value = end_value
+        if duration is not None:
+            self.duration = duration
+        self.timer = 0.0
+        self.finished = False
 
 # --- Visual Manager (Singleton) ---
 
@@ -119,11 +76,19 @@ class VisualManager:
         return cls._instance
 
     def init(self):
-        self.particles = []
-        self.tweens = []
+        self.particles = ParticlePool(PARTICLE_MAX)
+        self._frame_sets = {} # (asset name, fade, scale_fade) -> FrameSet
+        self.tweens = {} # (id(target), attr) -> Tween: at most one tween per attribute
         self.assets = {}
+        self.atlas = None # TextureAtlas of the per-frame sprites (see load_assets)
+        self.asset_version = 0 # Bumped on every load_assets(); lets caches of derived surfaces notice reloads
+        self._sprite_cache = OrderedDict() # (name, size, tint) -> Surface, LRU order
+        self._sprite_cache_bytes = 0
+        self._placeholder = None
         self.sounds = {}
         self.font = None
+        self.text = TextCache(TEXT_CACHE_SIZE) # Shared by the HUD and floating texts
+        self._text_frames = OrderedDict() # (text, colour) -> FrameSet of a floating text, LRU
         self.load_assets()
         self.load_sounds()
 
@@ -145,8 +110,17 @@ class VisualManager:
                     path = os.path.join(asset_dir, filename)
                     self.assets[name] = pygame.image.load(path).convert_alpha()
             print(f"[Visuals] Loaded {len(self.assets)} assets.")
+
+            # Pack crops / drone / tiles / particles into one surface; the individual
+            # assets become subsurfaces of it (same pixels, no copies)
+            self.atlas = build_atlas(self.assets)
+            if self.atlas:
+                for name in self.atlas.regions:
+                    self.assets[name] = self.atlas.sprite(name)
+                print(f"[Visuals] Atlas: {len(self.atlas.regions)} sprites, {self.atlas.surface.get_size()}")
         except Exception as e:
             print(f"[Visuals] Error loading assets: {e}")
+        self.clear_sprite_cache()
 
     def load_sounds(self):
         # Locate sounds in root/assets/sfx
@@ -190,31 +164,69 @@ class VisualManager:
         if name in self.assets:
             return self.assets[name]
         # Return a magenta placeholder if not found
-        s = pygame.Surface((32, 32))
-        s.fill((255, 0, 255))
-        return s
+        if self._placeholder is None:
+            self._placeholder = pygame.Surface((32, 32))
+            self._placeholder.fill((255, 0, 255))
+        return self._placeholder
+
+    # --- Transformed Sprite Cache ---
+
+    def get_sprite(self, name, size=None, tint=None):
+        """
+        Asset `name` scaled to `size` (w, h) and multiplied by `tint` (r, g, b).
+        Every variant is built once and kept in an LRU cache capped at SPRITE_CACHE_MAX_BYTES.
+        """
+        key = (name, size, tint)
+        cache = self._sprite_cache
+        img = cache.get(key)
+        if img is not None:
+            cache.move_to_end(key)
+            return img
+
+        img = self.get_asset(name)
+        if size is not None and img.get_size() != size:
+            img = pygame.transform.scale(img, size)
+        if tint is not None:
+            img = img.copy()
+            img.fill(tint, special_flags=pygame.BLEND_MULT)
+        if img is self.assets.get(name):
+            return img # Untransformed: the asset itself, nothing to cache
+
+        cache[key] = img
+        self._sprite_cache_bytes += img.get_width() * img.get_height() * img.get_bytesize()
+        while self._sprite_cache_bytes > SPRITE_CACHE_MAX_BYTES and len(cache) > 1:
+            _, old = cache.popitem(last=False)
+            self._sprite_cache_bytes -= old.get_width() * old.get_height() * old.get_bytesize()
+        return img
+
+    def clear_sprite_cache(self):
+        self._sprite_cache.clear()
+        self._sprite_cache_bytes = 0
+        self._frame_sets = {}
+        self.particles.clear() # Live particles still reference the old images
+        self.asset_version += 1
+
+    def particle_frames(self, name, fade=True, scale_fade=False):
+        """Shared prebaked frames of particle asset `name` (None if the asset is missing)."""
+        key = (name, fade, scale_fade)
+        fs = self._frame_sets.get(key)
+        if fs is None:
+            img = self.assets.get(name)
+            if not img: return None
+            fs = self._frame_sets[key] = FrameSet(img, fade, scale_fade)
+        return fs
 
     # --- Spawning Methods ---
 
     def spawn_dust(self, x, y):
-        img = self.assets.get("particle_dust")
-        if not img: return
-        
-        for _ in range(4):
-             vx = random.uniform(-30, 30)
-             vy = random.uniform(-30, 30)
-             p = Particle(x, y, img, life=0.4 + random.random()*0.3, vel=(vx, vy), scale_fade=True)
-             self.particles.append(p)
+        fs = self.particle_frames("particle_dust", fade=True, scale_fade=True)
+        if not fs: return
+        self.particles.spawn_burst(x, y, fs, 4, 0.4, (-30, 30), (-30, 30), life_jitter=0.3)
 
     def spawn_spark(self, x, y):
-        img = self.assets.get("particle_spark")
-        if not img: return
-        
-        for _ in range(8):
-             vx = random.uniform(-80, 80)
-             vy = random.uniform(-100, 50) # Mostly pop up
-             p = Particle(x, y, img, life=0.6, vel=(vx, vy), fade=True)
-             self.particles.append(p)
+        fs = self.particle_frames("particle_spark", fade=True)
+        if not fs: return
+        self.particles.spawn_burst(x, y, fs, 8, 0.6, (-80, 80), (-100, 50)) # Mostly pop up
              
     def spawn_poof(self, x, y, color=(200, 200, 200)):
         # Circle poof effect using basic shapes if asset missing
@@ -227,32 +239,47 @@ class VisualManager:
                  self.font = pygame.font.SysFont("Consolas", 16, bold=True)
              else: return
 
-        # Render text to surface
-        txt_surf = self.font.render(str(text), True, color)
+        # Same text + colour -> same surface and fade frames (e.g. "+1 Carrot" on every harvest)
+        key = (str(text), color)
+        fs = self._text_frames.get(key)
+        if fs is None:
+            fs = self._text_frames[key] = FrameSet(self.text.render(self.font, key[0], color), fade=True)
+            if len(self._text_frames) > TEXT_CACHE_SIZE:
+                self._text_frames.popitem(last=False)
+        else:
+            self._text_frames.move_to_end(key)
         # Create a particle that floats up
-        p = Particle(x, y, txt_surf, life=1.5, vel=(0, -40), fade=True)
-        self.particles.append(p)
+        self.particles.spawn(x, y, fs, life=1.5, vel=(0, -40))
 
 
     # --- Core Loop ---
 
     def add_tween(self, tween):
-        self.tweens.append(tween)
+        # A newer tween on the same attribute replaces the running one instead of fighting it
+        self.tweens[(id(tween.target), tween.attr)] = tween
+
+    def tween_to(self, target_obj, attr_name, end_value, duration, easing=ease_out_quad):
+        """Retarget the running tween of target.attr if there is one, else start a new one."""
+        tween = self.tweens.get((id(target_obj), attr_name))
+        if tween is None:
+            self.add_tween(Tween(target_obj, attr_name, end_value, duration, easing))
+        elif tween.end_value != end_value:
+            tween.easing = easing
+            tween.retarget(end_value, duration)
 
     def update(self, dt):
         # Particles
-        for p in self.particles:
-            p.update(dt)
-        self.particles = [p for p in self.particles if p.alive]
+        self.particles.update(dt)
         
         # Tweens
-        for t in self.tweens:
+        for t in self.tweens.values():
             t.update(dt)
-        self.tweens = [t for t in self.tweens if not t.finished]
+        if any(t.finished for t in self.tweens.values()):
+            self.tweens = {k: t for k, t in self.tweens.items() if not t.finished}
 
     def draw(self, surface):
-        for p in self.particles:
-            p.draw(surface)
+        """Draw all particles; returns the list of touched rects (for dirty-rect updates)."""
+        return self.particles.draw(surface)
 
 # Global accessor
 def get_visual_manager():
@@ -4,7 +4,9 @@ from src.config import *
 from src.entities.crops import CROP_FACTORY
 from src.core.skills import SkillManager
 from src.ui.visuals import get_visual_manager
-from src.utils.highlighter import SyntaxHighlighter
+from src.utils.highlighter import IncrementalHighlighter
+from src.utils.text_buffer import TextBuffer
+from src.ui.code_view import CodeView
 import glob
 import os
 import shutil
@@ -62,47 +64,45 @@ class CodeEditorWindow(BaseModal):
         
         self.ide = ide_ref
         self.filename = filename
-        self.raw_code = initial_code
+        self.buffer = TextBuffer(initial_code) # Rope: O(log n) edits, snapshots for undo
         self.cursor_pos = len(initial_code)
+        self._last_edit = None # (kind, cursor) of the previous keystroke, to group typing into one undo step
+        self.heat = None # {line: 0..1} from the last profiled run (heat gutter), cleared by edits
         
-        # Highlighter
-        self.highlighter = SyntaxHighlighter('monokai')
+        # Highlighter (caches tokens + lexer state per line, re-lexes only around edits)
+        self.highlighter = IncrementalHighlighter('monokai')
         
         self.is_focused = False
         self.is_collapsed = False
         self.original_height = 600
         self._build_ui()
-        self._build_ui()
         self._update_display()
         
     def show(self):
         super().show()
-        if hasattr(self, 'text_box'):
-            self.text_box.show()
-            # Force update to ensure scrollbar is redrawn/calculated correctly? 
-            # Usually not needed but we are paranoid about ghosts now.
+        if hasattr(self, 'code_image'):
+            self.code_image.show()
 
     def hide(self):
         super().hide()
-        if hasattr(self, 'text_box'):
-            self.text_box.hide()
-            # Essential: Explicitly hide the scrollbar if it exists
-            # pygame_gui *should* do this, but evidence suggests otherwise.
-            if self.text_box.scroll_bar:
-                self.text_box.scroll_bar.hide()
+        if hasattr(self, 'code_image'):
+            self.code_image.hide()
 
     def destroy(self):
         """Explicit cleanup."""
-        if hasattr(self, 'text_box'):
-            if self.text_box.scroll_bar:
-                self.text_box.scroll_bar.kill()
-            self.text_box.kill()
+        if hasattr(self, 'code_image'):
+            self.code_image.kill()
         
         # Kill buttons
         if hasattr(self, 'btn_run'): self.btn_run.kill()
         if hasattr(self, 'btn_save'): self.btn_save.kill()
         if hasattr(self, 'btn_minimize'): self.btn_minimize.kill()
         if hasattr(self, 'btn_stop'): self.btn_stop.kill()
+        if hasattr(self, 'btn_profile'): self.btn_profile.kill()
+
+        # Drop this window's undo history
+        self.ide.undo_stack[:] = [e for e in self.ide.undo_stack if e[0] is not self]
+        self.ide.redo_stack[:] = [e for e in self.ide.redo_stack if e[0] is not self]
         
         super().destroy()
 
@@ -114,10 +114,11 @@ class CodeEditorWindow(BaseModal):
 
         
     def _build_ui(self):
-        # 1. Editor Text Box
-        self.text_box = pygame_gui.elements.UITextBox(
+        # 1. Editor View (only the visible lines are drawn, see CodeView)
+        self.view = CodeView((480, 500), get_visual_manager().text)
+        self.code_image = pygame_gui.elements.UIImage(
             relative_rect=pygame.Rect((10, 10), (480, 500)),
-            html_text="",
+            image_surface=self.view.surface,
             manager=self.manager,
             container=self.window
         )
@@ -143,7 +144,50 @@ class CodeEditorWindow(BaseModal):
             manager=self.manager,
             container=self.window
         )
+
+        self.btn_profile = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((340, 520), (100, 35)),
+            text='PROFILE',
+            manager=self.manager,
+            container=self.window
+        )
         
+    @property
+    def raw_code(self):
+        return self.buffer.text()
+
+    @raw_code.setter
+    def raw_code(self, code):
+        self.buffer.set_text(code)
+        self.cursor_pos = min(self.cursor_pos, len(code))
+
+    # --- Undo / Redo (entries live on GameIDE.undo_stack / redo_stack, tagged with their window) ---
+
+    def _push_undo(self, kind):
+        """Record the state before an edit; consecutive typing of the same kind is one undo step."""
+        if self._last_edit != (kind, self.cursor_pos) or kind == "newline":
+            self.ide.undo_stack.append((self, self.buffer.snapshot(), self.cursor_pos))
+            if len(self.ide.undo_stack) > UNDO_LIMIT:
+                del self.ide.undo_stack[0]
+        self.ide.redo_stack[:] = [e for e in self.ide.redo_stack if e[0] is not self]
+
+    def _swap_state(self, from_stack, to_stack):
+        for i in range(len(from_stack) - 1, -1, -1):
+            if from_stack[i][0] is self:
+                _, root, cursor = from_stack.pop(i)
+                to_stack.append((self, self.buffer.snapshot(), self.cursor_pos))
+                self.buffer.restore(root)
+                self.cursor_pos = min(cursor, len(self.buffer))
+                self._last_edit = None
+                return True
+        return False
+
+    def undo(self):
+        return self._swap_state(self.ide.undo_stack, self.ide.redo_stack)
+
+    def redo(self):
+        return self._swap_state(self.ide.redo_stack, self.ide.undo_stack)
+
     def save_to_disk(self):
         """Save content to disk if it's a user script."""
         # Safety check: Don't overwrite examples or system files unless intended
@@ -169,32 +213,45 @@ class CodeEditorWindow(BaseModal):
  
 
         
-    def _update_display(self):
-        # Highlight logic from IDE
-        highlighted = self.highlighter.highlight(self.raw_code)
-        
-        # Insert Cursor
-        display_code = self.raw_code
-        
-        pre = self.raw_code[:self.cursor_pos]
-        post = self.raw_code[self.cursor_pos:]
+    def _update_display(self, follow_cursor=True):
+        # Re-highlight only the lines the buffer reports as edited; the whole text is flattened
+        # (raw_code) just to save or run, or after set_text / undo replaced it wholesale
+        change = self.buffer.take_change()
+        if change is not None:
+            first, old_end, new_end = change
+            if old_end is None:
+                self.highlighter.update(self.raw_code)
+            else:
+                self.highlighter.splice(first, old_end, self.buffer.lines(first, new_end))
         
-        # Blink logic?
-        # Simple for now: Just |
-        cursor_char = "|"
+        # Cursor: a caret bar drawn over the cursor line (the cached line surfaces stay untouched)
+        cursor = None
         if self.is_focused:
-             highlighted = self.highlighter.highlight(pre + cursor_char + post)
-        else:
-             highlighted = self.highlighter.highlight(self.raw_code)
+            cursor = self.buffer.line_col(self.cursor_pos)
+            if follow_cursor:
+                self.view.ensure_visible(self.highlighter, *cursor)
              
-        self.text_box.set_text(highlighted)
+        self.code_image.set_image(self.view.render(self.highlighter, cursor, self.heat))
+
+    def set_heat(self, heat):
+        """Show per-line profile intensities (0..1) in the gutter; None hides them."""
+        self.heat = heat or None
+        self._update_display(follow_cursor=False)
 
     def handle_event(self, event):
         # Focus Check (Click)
         # Focus Check (Click)
         if event.type == pygame.MOUSEBUTTONDOWN:
             if self.window.rect.collidepoint(event.pos):
-                if not self.is_focused:
+                if event.button == 1 and self.code_image.rect.collidepoint(event.pos):
+                    # Click in the code: move the cursor there
+                    line, col = self.view.hit(self.highlighter, event.pos[0] - self.code_image.rect.x,
+                                              event.pos[1] - self.code_image.rect.y)
+                    self.cursor_pos = self.buffer.line_start(line) + col
+                    self._last_edit = None
+                    self.is_focused = True
+                    self._update_display()
+                elif not self.is_focused:
                     self.is_focused = True
                     self._update_display()
 
@@ -202,8 +259,11 @@ class CodeEditorWindow(BaseModal):
                 if self.is_focused: 
                     self.is_focused = False
                     self._update_display()
-        
 
+        if event.type == pygame.MOUSEWHEEL and self.window.visible and \
+                self.code_image.rect.collidepoint(pygame.mouse.get_pos()):
+            self.view.scroll(-event.y * 3, len(self.highlighter.lines))
+            self._update_display(follow_cursor=False)
                     
         # Button Events (Handled by IDE usually, or check here if using generic loop)
         # pygame_gui handles button clicks via USEREVENT. 
@@ -212,25 +272,48 @@ class CodeEditorWindow(BaseModal):
         if not self.is_focused: return
         
         if event.type == pygame.KEYDOWN:
-             # Ported Logic
-            if event.key == pygame.K_LEFT:
+            buf = self.buffer
+            edit = None # Kind of text change, for undo grouping
+            ctrl = event.mod & pygame.KMOD_CTRL
+            if ctrl and event.key == pygame.K_z:
+                if event.mod & pygame.KMOD_SHIFT: self.redo()
+                else: self.undo()
+            elif ctrl and event.key == pygame.K_y:
+                self.redo()
+            elif event.key == pygame.K_LEFT:
                 self.cursor_pos = max(0, self.cursor_pos - 1)
             elif event.key == pygame.K_RIGHT:
-                self.cursor_pos = min(len(self.raw_code), self.cursor_pos + 1)
+                self.cursor_pos = min(len(buf), self.cursor_pos + 1)
+            elif event.key in (pygame.K_UP, pygame.K_DOWN):
+                line, col = buf.line_col(self.cursor_pos)
+                line += -1 if event.key == pygame.K_UP else 1
+                if 0 <= line < buf.line_count:
+                    self.cursor_pos = min(buf.line_start(line) + col, buf.line_end(line))
             elif event.key == pygame.K_BACKSPACE:
                 if self.cursor_pos > 0:
-                    self.raw_code = self.raw_code[:self.cursor_pos-1] + self.raw_code[self.cursor_pos:]
+                    edit = "delete"
+                    self._push_undo(edit)
+                    buf.delete(self.cursor_pos - 1, 1)
                     self.cursor_pos -= 1
             elif event.key == pygame.K_RETURN:
-                self.raw_code = self.raw_code[:self.cursor_pos] + "\n" + self.raw_code[self.cursor_pos:]
+                edit = "newline"
+                self._push_undo(edit)
+                buf.insert(self.cursor_pos, "\n")
                 self.cursor_pos += 1
             elif event.key == pygame.K_TAB:
-                self.raw_code = self.raw_code[:self.cursor_pos] + "    " + self.raw_code[self.cursor_pos:]
+                edit = "type"
+                self._push_undo(edit)
+                buf.insert(self.cursor_pos, "    ")
                 self.cursor_pos += 4
             else:
-                if event.unicode and event.unicode.isprintable():
-                    self.raw_code = self.raw_code[:self.cursor_pos] + event.unicode + self.raw_code[self.cursor_pos:]
-                    self.cursor_pos += 1
+                if event.unicode and event.unicode.isprintable() and not ctrl:
+                    edit = "type"
+                    self._push_undo(edit)
+                    buf.insert(self.cursor_pos, event.unicode)
+                    self.cursor_pos += len(event.unicode)
+            self._last_edit = (edit, self.cursor_pos) if edit else None
+            if edit:
+                self.heat = None # Line numbers no longer match the profiled run
             
             self._update_display()
 
@@ -1,6 +1,13 @@
 import pygments
 from pygments import lexers, formatters
+from pygments.formatters.html import escape_html
+from pygments.lexer import RegexLexer
 from pygments.styles import get_style_by_name
+from pygments.token import Error, Whitespace
+
+# Token types are instances of pygments.token._TokenType (private name, public behaviour)
+TokenType = type(Error)
+
 
 class SyntaxHighlighter:
     def __init__(self, style_name='monokai'):
@@ -81,3 +88,319 @@ class SyntaxHighlighter:
             print(f"Highlight Error: {e}")
             # Fallback to white text so it's visible on dark background
             return f"<font face='Consolas' size='4' color='#FFFFFF'>{code}</font>"
+
+
+
+class IncrementalHighlighter:
+    """
+    Line-based incremental highlighter (增量语法高亮).
+
+    Keeps, for every line, its tokens, its pygame_gui HTML and the Pygments
+    lexer state stack at the start of the line. splice(first, old_end, lines)
+    replaces a range of lines (the editor gets it from TextBuffer.take_change,
+    update(code) diffs a whole new text against the cache), restarts the lexer
+    at the last unchanged line that starts in the root state and stops as soon
+    as a line after the edit starts in the same state as before: everything
+    below is reused untouched, and only the re-lexed lines are ever joined.
+
+    Drives the lexer's compiled state table (RegexLexer._tokens) itself, the
+    same loop as RegexLexer.get_tokens_unprocessed, so the state stack is
+    observable at every line boundary. Those are Pygments internals (tested
+    with 2.19): if the table does not have the expected layout, or driving it
+    gives different tokens than the lexer on a sample, every edit re-lexes
+    the whole text through the public API instead (self.incremental = False).
+    """
+    def __init__(self, style_name='monokai'):
+        self.lexer = lexers.get_lexer_by_name("python")
+        self.incremental = self._supports_incremental(self.lexer)
+        self.style = get_style_by_name(style_name)
+        self._colors = {}
+        self.lines = []   # Line texts, each ending with "\n"
+        self.states = []  # Lexer stack (tuple) at the start of each line; None = inside a multi-line token
+        self.tokens = []  # [(tokentype, text), ...] per line
+        self.html_lines = []
+        self.relexed = 0  # Lines re-lexed by the last edit (stats)
+
+    # --- Lexing ---
+
+    SAMPLE = 'def f(x=1.5):\n    """doc\n    string"""\n    return [x, \'a\\\\n\', f"{x!r}"]  # c\n'
+
+    def _supports_incremental(self, lexer):
+        """True if _lex can drive this lexer: RegexLexer state table as expected, same tokens as the lexer itself."""
+        if not isinstance(lexer, RegexLexer):
+            return False
+        if type(lexer).get_tokens_unprocessed is not RegexLexer.get_tokens_unprocessed:
+            return False
+        tokendefs = getattr(lexer, "_tokens", None)
+        if not isinstance(tokendefs, dict) or 'root' not in tokendefs:
+            return False
+        for rules in tokendefs.values():
+            for rule in rules:
+                if not (isinstance(rule, tuple) and len(rule) == 3 and callable(rule[0])):
+                    return False
+                action, new_state = rule[1], rule[2]
+                if not (action is None or type(action) is TokenType or callable(action)):
+                    return False
+                if not (new_state is None or isinstance(new_state, (tuple, int)) or new_state == '#push'):
+                    return False
+        try:
+            ours = [tok for _, toks, _ in self._lex(self.SAMPLE, 0, ('root',)) for tok in toks]
+        except Exception:
+            return False
+        return ours == list(lexer.get_tokens_unprocessed(self.SAMPLE))
+
+    def _lex(self, text, pos, stack):
+        """Yield (match_end, [(start, ttype, value), ...], stack_after) for every lexer step from `pos`."""
+        lexer = self.lexer
+        tokendefs = lexer._tokens
+        statestack = list(stack)
+        statetokens = tokendefs[statestack[-1]]
+        while True:
+            for rexmatch, action, new_state in statetokens:
+                m = rexmatch(text, pos)
+                if m:
+                    if action is None:
+                        toks = []
+                    elif type(action) is TokenType:
+                        toks = [(pos, action, m.group())]
+                    else:
+                        toks = list(action(lexer, m))
+                    pos = m.end()
+                    if new_state is not None:
+                        if isinstance(new_state, tuple):
+                            for state in new_state:
+                                if state == '#pop':
+                                    if len(statestack) > 1:
+                                        statestack.pop()
+                                elif state == '#push':
+                                    statestack.append(statestack[-1])
+                                else:
+                                    statestack.append(state)
+                        elif isinstance(new_state, int):
+                            if abs(new_state) >= len(statestack):
+                                del statestack[1:]
+                            else:
+                                del statestack[new_state:]
+                        elif new_state == '#push':
+                            statestack.append(statestack[-1])
+                        statetokens = tokendefs[statestack[-1]]
+                    yield pos, toks, tuple(statestack)
+                    break
+            else:
+                if pos >= len(text):
+                    return
+                if text[pos] == '\n':
+                    # at EOL, reset state to "root"
+                    statestack = ['root']
+                    statetokens = tokendefs['root']
+                    yield pos + 1, [(pos, Whitespace, '\n')], ('root',)
+                else:
+                    yield pos + 1, [(pos, Error, text[pos])], tuple(statestack)
+                pos += 1
+
+    @staticmethod
+    def _split_lines(code):
+        # Always one extra "\n" so the last (possibly empty) line exists and every line ends with "\n"
+        return [line + "\n" for line in code.split("\n")]
+
+    def update(self, code):
+        """Re-highlight the whole text `code`. Returns (first_changed_line, end_of_changed_lines) in the new text."""
+        new_lines = self._split_lines(code)
+        old_lines = self.lines
+        n_old, n_new = len(old_lines), len(new_lines)
+
+        # Unchanged prefix / suffix
+        p = 0
+        limit = min(n_old, n_new)
+        while p < limit and old_lines[p] == new_lines[p]:
+            p += 1
+        if p == n_old == n_new:
+            self.relexed = 0
+            return p, p
+        s = 0
+        while s < limit - p and old_lines[n_old - 1 - s] == new_lines[n_new - 1 - s]:
+            s += 1
+        return self.splice(p, n_old - s, new_lines[p:n_new - s])
+
+    def splice(self, first, old_end, new_lines):
+        """
+        Replace lines [first, old_end) with `new_lines` (each ending with "\n") and re-highlight.
+        Only the lines from the restart point to where the lexer state matches the cache again
+        are joined and lexed; the rest of the document is not touched. Returns like update().
+        """
+        self.lines[first:old_end] = new_lines
+        if not self.incremental:
+            return self._update_full(self.lines)
+        lines = self.lines
+        n_new = len(lines)
+        edit_end = first + len(new_lines) # First line after the edited block
+        delta = len(new_lines) - (old_end - first)
+
+        # Restart at the last line (<= first) that starts in the root state and does not follow a
+        # blank line. Not just any known state: a rule can look ahead across lines (a docstring runs
+        # from the blank lines before it to the next closing quotes), so how a string or blank run
+        # above the edit was lexed may depend on the edited text
+        k = first
+        while k > 0 and (k >= len(self.states) or self.states[k] != ('root',) or not lines[k - 1].strip()):
+            k -= 1
+
+        # Lex a window of lines after the edit, twice as many each time it ends before the state resyncs
+        window = edit_end - k + 64
+        while True:
+            relexed = self._relex(k, min(n_new, k + window), edit_end, delta)
+            if relexed is not None:
+                break
+            window *= 2
+        states, tokens, tail = relexed
+
+        new_html = [self._line_html(t) for t in tokens]
+        old_tail = tail - delta
+        self.states[k:old_tail] = states
+        self.tokens[k:old_tail] = tokens
+        self.html_lines[k:old_tail] = new_html
+        self.relexed = tail - k
+        return k, tail
+
+    def _relex(self, k, w_end, edit_end, delta):
+        """
+        Lex lines [k, w_end) from the root state until a line at or after `edit_end` starts in the
+        state the cache has for it. Returns (states, tokens, tail) for lines [k, tail), or None if
+        the window ran out first (and more lines follow it).
+        """
+        lines = self.lines
+        n_old = len(self.states)
+        offsets = [0] * (w_end - k + 1) # Relative to line k
+        for j in range(w_end - k):
+            offsets[j + 1] = offsets[j] + len(lines[k + j])
+        text = "".join(lines[k:w_end])
+
+        states = [('root',)]
+        tokens = [[]]
+        j = 0         # Line currently being filled (relative to k)
+        resync = None # First line from which the old cache is valid again
+        for end, toks, stack in self._lex(text, 0, ('root',)):
+            for start, ttype, value in toks:
+                # Split tokens that span line breaks
+                while value:
+                    while start >= offsets[j + 1]:
+                        j += 1
+                        states.append(None)
+                        tokens.append([])
+                    room = offsets[j + 1] - start
+                    piece, value = value[:room], value[room:]
+                    tokens[-1].append((ttype, piece))
+                    start += len(piece)
+            if end >= offsets[-1]:
+                break
+            if end == offsets[j + 1]:
+                j += 1
+                states.append(stack)
+                tokens.append([])
+                line = k + j
+                old = line - delta
+                if line >= edit_end and 0 <= old < n_old and self.states[old] == stack:
+                    resync = line
+                    break
+            while end > offsets[j + 1]:
+                j += 1
+                states.append(None) # Line starts inside a multi-line match
+                tokens.append([])
+
+        if resync is not None:
+            return states[:-1], tokens[:-1], resync
+        if w_end < len(lines):
+            return None
+        # Lexed to the end of the text
+        count = w_end - k
+        states = states[:count]
+        tokens = tokens[:count]
+        while len(tokens) < count:
+            states.append(None)
+            tokens.append([])
+        return states, tokens, w_end
+
+    def _update_full(self, new_lines):
+        """Fallback: lex the whole text with lexer.get_tokens_unprocessed (no line states, nothing reused)."""
+        offsets = [0]
+        for line in new_lines:
+            offsets.append(offsets[-1] + len(line))
+        tokens = [[] for _ in new_lines]
+        line = 0
+        for start, ttype, value in self.lexer.get_tokens_unprocessed("".join(new_lines)):
+            while value:
+                while start >= offsets[line + 1]:
+                    line += 1
+                room = offsets[line + 1] - start
+                piece, value = value[:room], value[room:]
+                tokens[line].append((ttype, piece))
+                start += len(piece)
+        self.lines = new_lines
+        self.states = [None] * len(new_lines)
+        self.tokens = tokens
+        self.html_lines = [self._line_html(t) for t in tokens]
+        self.relexed = len(new_lines)
+        return 0, len(new_lines)
+
+    # --- HTML ---
+
+    def _color(self, ttype):
+        color = self._colors.get(ttype)
+        if color is None:
+            color = self._colors[ttype] = self.style.style_for_token(ttype)['color'] or ""
+        return color
+
+    def _pieces(self, line_tokens):
+        """Merge neighbouring tokens of the same colour: [(color, text), ...] without the trailing newline."""
+        pieces = []
+        for ttype, value in line_tokens:
+            value = value.rstrip("\n")
+            if not value:
+                continue
+            color = self._color(ttype)
+            if pieces and pieces[-1][0] == color:
+                pieces[-1] = (color, pieces[-1][1] + value)
+            else:
+                pieces.append((color, value))
+        return pieces
+
+    def line_pieces(self, i):
+        """Line i as [(hex_color, text), ...] (colour "" = default), for renderers drawing it themselves."""
+        return self._pieces(self.tokens[i])
+
+    @staticmethod
+    def _pieces_html(pieces):
+        out = []
+        for color, value in pieces:
+            value = escape_html(value)
+            out.append(f"<font color='#{color}'>{value}</font>" if color else value)
+        return "".join(out)
+
+    def _line_html(self, line_tokens):
+        return self._pieces_html(self._pieces(line_tokens))
+
+    def line_html(self, i, cursor_col=None):
+        """HTML of line i; with cursor_col, a "|" caret is inserted at that column."""
+        if cursor_col is None:
+            return self.html_lines[i]
+        pieces = []
+        col = 0
+        placed = False
+        for color, value in self._pieces(self.tokens[i]):
+            if not placed and col + len(value) >= cursor_col:
+                cut = cursor_col - col
+                pieces += [(color, value[:cut]), ("", "|"), (color, value[cut:])]
+                placed = True
+            else:
+                pieces.append((color, value))
+            col += len(value)
+        if not placed:
+            pieces.append(("", "|"))
+        return self._pieces_html([p for p in pieces if p[1]])
+
+    def html(self, cursor=None):
+        """Whole document for a UITextBox; cursor = (line, col) or None."""
+        lines = self.html_lines
+        if cursor is not None and 0 <= cursor[0] < len(lines):
+            lines = list(lines)
+            lines[cursor[0]] = self.line_html(*cursor)
+        return f"<font face='Consolas' size='4' color='#F8F8F2'>{'<br>'.join(lines)}</font>"
@@ -0,0 +1,288 @@
+"""
+Rope text buffer for the code editor (绳索文本缓冲区).
+
+The text is stored in a height-balanced (AVL) binary tree whose leaves hold
+short string chunks. Every node caches its length and its newline count, so
+insert / delete / offset <-> line lookups all walk one root-to-leaf path:
+O(log n) instead of rebuilding the whole string per keystroke.
+
+Nodes are immutable: an edit builds O(log n) new nodes and shares the rest
+with the previous version. A snapshot (for undo/redo) is therefore just the
+old root, kept for free.
+
+Edits also record which lines they touched (take_change), so the editor can
+re-highlight just those lines (lines(first, end)) without ever flattening
+the whole text; text() is only needed to save or run the script.
+"""
+
+LEAF_MAX = 512 # Longest chunk stored in one leaf; small neighbours get merged up to this
+
+
+class _Node:
+    __slots__ = ("left", "right", "text", "length", "newlines", "height")
+
+    def __init__(self, left=None, right=None, text=None):
+        self.left = left
+        self.right = right
+        self.text = text
+        if text is not None: # Leaf
+            self.length = len(text)
+            self.newlines = text.count("\n")
+            self.height = 1
+        else:
+            self.length = left.length + right.length
+            self.newlines = left.newlines + right.newlines
+            self.height = max(left.height, right.height) + 1
+
+
+def _height(node):
+    return node.height if node is not None else 0
+
+
+def _rotate_left(n):
+    r = n.right
+    return _Node(_Node(n.left, r.left), r.right)
+
+
+def _rotate_right(n):
+    l = n.left
+    return _Node(l.left, _Node(l.right, n.right))
+
+
+def _balance(left, right):
+    """Internal node over left/right (heights differ by at most 2), rotated back into AVL shape."""
+    n = _Node(left, right)
+    if left.height > right.height + 1:
+        if _height(left.left) < _height(left.right):
+            n = _Node(_rotate_left(left), right)
+        return _rotate_right(n)
+    if right.height > left.height + 1:
+        if _height(right.right) < _height(right.left):
+            n = _Node(left, _rotate_right(right))
+        return _rotate_left(n)
+    return n
+
+
+def _join(a, b):
+    """Concatenate two ropes (either may be None), keeping the tree balanced."""
+    if a is None: return b
+    if b is None: return a
+    if a.text is not None and b.text is not None and a.length + b.length <= LEAF_MAX:
+        return _Node(text=a.text + b.text) # Keep single-character edits from fragmenting the leaves
+    if a.height > b.height + 1:
+        return _balance(a.left, _join(a.right, b))
+    if b.height > a.height + 1:
+        return _balance(_join(a, b.left), b.right)
+    return _Node(a, b)
+
+
+def _split(node, pos):
+    """(rope of the first `pos` chars, rope of the rest)."""
+    if node is None:
+        return None, None
+    if pos <= 0:
+        return None, node
+    if pos >= node.length:
+        return node, None
+    if node.text is not None:
+        return _Node(text=node.text[:pos]), _Node(text=node.text[pos:])
+    left_len = node.left.length
+    if pos < left_len:
+        a, b = _split(node.left, pos)
+        return a, _join(b, node.right)
+    if pos > left_len:
+        a, b = _split(node.right, pos - left_len)
+        return _join(node.left, a), b
+    return node.left, node.right
+
+
+def _build(text):
+    """Balanced rope from a string (chunks of LEAF_MAX)."""
+    if not text:
+        return None
+    leaves = [_Node(text=text[i:i + LEAF_MAX]) for i in range(0, len(text), LEAF_MAX)]
+    while len(leaves) > 1:
+        paired = [_Node(leaves[i], leaves[i + 1]) for i in range(0, len(leaves) - 1, 2)]
+        if len(leaves) % 2:
+            paired[-1] = _join(paired[-1], leaves[-1])
+        leaves = paired
+    return leaves[0]
+
+
+def _collect_range(node, start, stop, out):
+    """Append the chunks of text in [start, stop) to out, visiting only the leaves that overlap it."""
+    stack = [(node, 0)]
+    while stack:
+        n, offset = stack.pop()
+        if n is None or offset >= stop or offset + n.length <= start:
+            continue
+        if n.text is not None:
+            out.append(n.text[max(0, start - offset):stop - offset])
+        else:
+            stack.append((n.right, offset + n.left.length))
+            stack.append((n.left, offset))
+
+
+def _collect(node, out):
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        if n is None:
+            continue
+        if n.text is not None:
+            out.append(n.text)
+        else:
+            stack.append(n.right)
+            stack.append(n.left)
+
+
+class TextBuffer:
+    """
+    Editable text with O(log n) insert / delete and line lookups.
+
+    `root` is an immutable snapshot of the current text: store it to undo,
+    assign it back (restore) to return to that version.
+    """
+    def __init__(self, text=""):
+        self.root = _build(text)
+        self._text = text # Cached full string of `root` (None = rebuild on demand)
+        self._change = (0, None, self.line_count) # See take_change
+
+    def __len__(self):
+        return self.root.length if self.root is not None else 0
+
+    @property
+    def line_count(self):
+        return (self.root.newlines if self.root is not None else 0) + 1
+
+    def text(self):
+        if self._text is None:
+            parts = []
+            _collect(self.root, parts)
+            self._text = "".join(parts)
+        return self._text
+
+    def set_text(self, text):
+        self.root = _build(text)
+        self._text = text
+        self._change = (0, None, self.line_count)
+
+    def take_change(self):
+        """
+        Lines changed since the last call, then forget them: (first, old_end, new_end) means
+        lines [first, old_end) of the text at the last call are now lines [first, new_end).
+        old_end is None when the whole text was replaced (set_text / restore); None = no change.
+        """
+        change, self._change = self._change, None
+        return change
+
+    def _record_change(self, first, removed, added):
+        """Merge an edit replacing `removed` lines from `first` with `added` lines into the pending change."""
+        if self._change is None:
+            self._change = (first, first + removed, first + added)
+            return
+        c_first, c_old_end, c_new_end = self._change
+        end = max(c_new_end, first + removed) # Changed region in current lines, before this edit
+        if c_old_end is not None:
+            c_old_end += end - c_new_end
+        self._change = (min(c_first, first), c_old_end, end + added - removed)
+
+    # --- Editing ---
+
+    def insert(self, pos, text):
+        if not text:
+            return
+        self._record_change(self.line_of(pos), 1, 1 + text.count("\n"))
+        a, b = _split(self.root, pos)
+        self.root = _join(_join(a, _build(text)), b)
+        self._text = None
+
+    def delete(self, pos, count):
+        if count <= 0:
+            return
+        first = self.line_of(pos)
+        self._record_change(first, self.line_of(pos + count) - first + 1, 1)
+        a, rest = _split(self.root, pos)
+        _, b = _split(rest, count)
+        self.root = _join(a, b)
+        self._text = None
+
+    def snapshot(self):
+        return self.root
+
+    def restore(self, root):
+        self.root = root
+        self._text = None
+        self._change = (0, None, self.line_count)
+
+    # --- Lookups ---
+
+    def char_at(self, pos):
+        node = self.root
+        while node.text is None:
+            if pos < node.left.length:
+                node = node.left
+            else:
+                pos -= node.left.length
+                node = node.right
+        return node.text[pos]
+
+    def line_of(self, pos):
+        """Line index (0-based) containing offset `pos` = number of newlines before it."""
+        node = self.root
+        line = 0
+        while node is not None and pos > 0:
+            if node.text is not None:
+                return line + node.text.count("\n", 0, pos)
+            if pos <= node.left.length:
+                node = node.left
+            else:
+                line += node.left.newlines
+                pos -= node.left.length
+                node = node.right
+        return line
+
+    def line_start(self, line):
+        """Offset of the first character of `line` (clamped to the last line)."""
+        if line <= 0 or self.root is None:
+            return 0
+        line = min(line, self.root.newlines)
+        node = self.root
+        offset = 0
+        while node.text is None:
+            if line <= node.left.newlines:
+                node = node.left
+            else:
+                line -= node.left.newlines
+                offset += node.left.length
+                node = node.right
+        # The line-th newline inside this leaf
+        idx = -1
+        for _ in range(line):
+            idx = node.text.index("\n", idx + 1)
+        return offset + idx + 1
+
+    def line_col(self, pos):
+        line = self.line_of(pos)
+        return line, pos - self.line_start(line)
+
+    def slice(self, start, stop):
+        """Text in [start, stop), O(log n + stop - start)."""
+        if self._text is not None:
+            return self._text[start:stop]
+        parts = []
+        _collect_range(self.root, start, stop, parts)
+        return "".join(parts)
+
+    def lines(self, first, end):
+        """Lines [first, end), each with a trailing "\n" (the last line of the text too)."""
+        if end <= first:
+            return []
+        text = self.slice(self.line_start(first), self.line_end(end - 1))
+        return [line + "\n" for line in text.split("\n")]
+
+    def line_end(self, line):
+        """Offset of the newline ending `line` (or the end of the text for the last line)."""
+        if line + 1 >= self.line_count:
+            return len(self)
+        return self.line_start(line + 1) - 1
@@ -0,0 +1,51 @@
+import sys
+import threading
+
+from src.core.api import DroneAPI
+from src.core.autosave import AutosaveService
+from src.core.farm import Farm
+from src.core.grid_store import TYPE_IDS
+from src.core.save_format import read_save
+
+
+def test_saves_taken_while_batches_run_are_consistent(tmp_path):
+    """Every save lands between two batches: the grid is all carrots or none, the bag holds whole batches."""
+    farm = Farm(4, 4)
+    drone = DroneAPI(farm, lambda text: None, sleep_func=farm.update) # Each batch outlasts carrot growth
+    autosave = AutosaveService(farm, drone, interval=0, directory=str(tmp_path))
+    done = threading.Event()
+
+    def script():
+        try:
+            for _ in range(300):
+                drone.plant_rect(4, 4, "carrot")
+                drone.harvest_rect(4, 4)
+        finally:
+            done.set()
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    thread = threading.Thread(target=script)
+    thread.start()
+    paths = []
+    try:
+        while not done.is_set():
+            paths.append(str(tmp_path / f"save_{len(paths)}.farm"))
+            autosave.save(paths[-1])
+            autosave.flush()
+    finally:
+        thread.join()
+        sys.setswitchinterval(interval)
+        autosave.close()
+
+    assert len(paths) > 10
+    assert drone.inventory["Carrot"] == 300 * 16
+    carrot = TYPE_IDS["carrot"]
+    for path in paths:
+        loaded = Farm(2, 2)
+        loaded_drone = DroneAPI(loaded, lambda text: None)
+        read_save(path, loaded, loaded_drone)
+        planted = bytes(loaded.to_columns()[0]).count(carrot)
+        bag = loaded_drone.inventory.get("Carrot", 0)
+        assert planted in (0, 16), path
+        assert bag % 16 == 0, path
@@ -0,0 +1,94 @@
+import sys
+import threading
+import time
+
+from src.core.events import EventRing, EV_MOVE, EV_PLANT, POLICY_COALESCE_MOVES, POLICY_DROP_OLDEST
+
+
+def test_coalesced_moves_with_full_ring_threaded():
+    """Producer floods a tiny ring with moves and plants while the consumer drains concurrently."""
+    ring = EventRing(2, POLICY_COALESCE_MOVES, block_timeout=5.0)
+    n = 20000
+    received = []
+    errors = []
+    done = threading.Event()
+
+    def produce():
+        try:
+            for i in range(1, n + 1):
+                if i % 3 == 0:
+                    ring.push(EV_PLANT, 0, 0, "Carrot", i)
+                else:
+                    ring.push(EV_MOVE, i, 0)
+        except Exception as e: # pragma: no cover - reported below
+            errors.append(e)
+        finally:
+            done.set()
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6) # Switch threads as often as possible to hit the latch handover
+    producer = threading.Thread(target=produce)
+    producer.start()
+    try:
+        while not done.is_set() or ring:
+            for kind, x, y, payload, amount, frame in ring.drain():
+                received.append(x if kind == EV_MOVE else amount)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        producer.join()
+        sys.setswitchinterval(interval)
+
+    assert not errors
+    # Every event is the stamp of its push: strictly increasing = nothing duplicated or reordered
+    assert all(a < b for a, b in zip(received, received[1:]))
+    assert [v for v in received if v % 3 == 0] == list(range(3, n + 1, 3)) # No plant lost
+    assert received[-1] == n # The final position always arrives
+    assert ring.dropped == 0
+
+
+class YieldingList(list):
+    def __setitem__(self, i, value):
+        super().__setitem__(i, value)
+        time.sleep(0)
+
+
+def test_drop_oldest_never_yields_torn_records():
+    """With drop_oldest the producer laps the consumer constantly; every drained record must be one whole event."""
+    ring = EventRing(4, POLICY_DROP_OLDEST)
+    ring._x = YieldingList(ring._x) # Hand the GIL to the consumer halfway through every write
+    n = 20000
+    received = []
+    errors = []
+    done = threading.Event()
+
+    def produce():
+        try:
+            for i in range(1, n + 1):
+                ring.push(EV_PLANT, i, -i, i, 2 * i, 3 * i)
+        except Exception as e: # pragma: no cover - reported below
+            errors.append(e)
+        finally:
+            done.set()
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    producer = threading.Thread(target=produce)
+    producer.start()
+    try:
+        while not done.is_set() or ring:
+            received.extend(ring.drain())
+            time.sleep(0.0002) # Fall behind so the producer laps us
+    except Exception as e:
+        errors.append(e)
+    finally:
+        producer.join()
+        sys.setswitchinterval(interval)
+
+    assert not errors
+    torn = [r for r in received if r != (EV_PLANT, r[1], -r[1], r[1], 2 * r[1], 3 * r[1])]
+    assert not torn
+    stamps = [r[1] for r in received]
+    assert all(a < b for a, b in zip(stamps, stamps[1:]))
+    assert stamps[-1] == n
+    assert len(received) + ring.dropped == n
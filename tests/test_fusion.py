@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from src.core.farm import Farm
+from src.core.fusion import fusion_root
+from src.entities.crops import Carrot, Pumpkin, OccupiedSlot
+
+
+def full_scan_fusion(farm):
+    """Reference: the original per-frame rescan of every origin and every square size."""
+    grid, width, height = farm.grid, farm.width, farm.height
+    used = set()
+    for y in range(height):
+        for x in range(width):
+            if (x, y) in used or not grid[y][x]:
+                continue
+            found = 0
+            for k in range(min(width - x, height - y), 1, -1):
+                counts = {}
+                ok = True
+                for dy in range(k):
+                    for dx in range(k):
+                        root = fusion_root(grid[y + dy][x + dx])
+                        if (x + dx, y + dy) in used or root is None or not root.is_ready or root.is_rotten:
+                            ok = False
+                            break
+                        counts[root] = counts.get(root, 0) + 1
+                    if not ok:
+                        break
+                if not ok or any(n < root.size * root.size for root, n in counts.items()):
+                    continue # Not mature pumpkins only, or cuts through a mega pumpkin
+                # Wait while a neighbouring pumpkin is still growing
+                waiting = False
+                for py in range(max(0, y - 1), min(height, y + k + 1)):
+                    for px in range(max(0, x - 1), min(width, x + k + 1)):
+                        if x <= px < x + k and y <= py < y + k:
+                            continue
+                        root = fusion_root(grid[py][px])
+                        if root is not None and not root.is_ready and not root.is_rotten:
+                            waiting = True
+                if not waiting:
+                    found = k
+                break
+            if found:
+                roots = {fusion_root(grid[y + dy][x + dx]) for dy in range(found) for dx in range(found)}
+                if not (len(roots) == 1 and roots.pop().level == found):
+                    farm.fuse_pumpkins(x, y, found)
+                    farm.fusion_count += 1
+                used.update((x + dx, y + dy) for dy in range(found) for dx in range(found))
+
+
+def layout(farm):
+    """(x, y, level) of every pumpkin root plus which tiles belong to which root."""
+    roots = []
+    owner = []
+    for y in range(farm.height):
+        for x in range(farm.width):
+            tile = farm.grid[y][x]
+            if isinstance(tile, Pumpkin):
+                roots.append((x, y, tile.level, tile.is_rotten))
+            owner.append((tile.parent_pos if isinstance(tile, OccupiedSlot) else None, type(tile).__name__))
+    return roots, owner
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_incremental_fusion_matches_full_scan(seed):
+    rng = random.Random(seed)
+    size = rng.choice([6, 9, 12])
+    farm = Farm(size, size, seed=seed)
+    reference = Farm(size, size, seed=seed)
+    reference.check_fusion = lambda: full_scan_fusion(reference)
+    for step in range(300):
+        for _ in range(rng.randint(0, 6)):
+            x, y = rng.randrange(size), rng.randrange(size)
+            roll = rng.random()
+            for f in (farm, reference):
+                if roll < 0.75:
+                    f.plant_crop(x, y, Pumpkin() if roll < 0.7 else Carrot())
+                elif roll < 0.9:
+                    f.harvest_crop(x, y)
+                else:
+                    f.destroy_crop(x, y)
+        dt = rng.choice([0.1, 1.0, 3.0])
+        farm.update(dt)
+        reference.update(dt)
+        assert layout(farm) == layout(reference), f"diverged at step {step}"
+    assert farm.fusion_count == reference.fusion_count > 0
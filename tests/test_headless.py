@@ -0,0 +1,12 @@
+from src.core.headless import HeadlessSimulation
+
+
+def test_action_count_excludes_actions_cut_off_by_the_budget():
+    """A batch whose delay runs past the end of the run never happens and must not be counted."""
+    sim = HeadlessSimulation(10, 10, seed=0)
+    delay = sim.drone.move_delay
+    source = "while True:\n    drone.plant_rect(10, 10, 'carrot')\n"
+    result = sim.run_script(source, duration=delay * 250) # One 199-action batch fits, the second doesn't
+    assert result["error"] is None
+    assert result["actions"] == 199
+    assert result["actions"] / result["sim_time"] <= 1.0 / delay + 1e-9
@@ -0,0 +1,75 @@
+import random
+
+from src.utils.highlighter import IncrementalHighlighter
+from src.utils.text_buffer import TextBuffer
+
+SOURCE = '''def main():
+    """Plant, wait, harvest."""
+
+    for i in range(3):
+        drone.plant('carrot')  # one tile
+        drone.move("East")
+    s = f"{i!r} done\\n"
+    return s
+'''
+
+
+def test_incremental_matches_full_relex_under_random_edits():
+    """Every update() must give the same tokens as lexing the whole text from scratch."""
+    inc = IncrementalHighlighter()
+    full = IncrementalHighlighter()
+    full.incremental = False
+    assert inc.incremental # The installed Pygments has the state table layout _lex expects
+    rng = random.Random(7)
+    code = SOURCE
+    for _ in range(1500):
+        pos = rng.randrange(len(code) + 1)
+        if rng.random() < 0.6:
+            code = code[:pos] + rng.choice(['"""', "'''", "\n", "\n\n", "x", "#", "(", "'", '"', "  ", "\\"]) + code[pos:]
+        else:
+            code = code[:pos] + code[pos + rng.randint(1, 4):]
+        inc.update(code)
+        full.update(code)
+        assert inc.tokens == full.tokens
+        assert inc.html_lines == full.html_lines
+
+
+def test_docstring_closed_below_relexes_the_blank_lines_above():
+    h = IncrementalHighlighter()
+    h.update("x = 1\n\n    \n    if a:\n        pass\n")
+    h.update("x = 1\n\n    \n'''    if a:\n        pass'''\n")
+    fresh = IncrementalHighlighter()
+    fresh.update("x = 1\n\n    \n'''    if a:\n        pass'''\n")
+    assert h.tokens == fresh.tokens
+
+
+def test_splicing_buffer_changes_matches_full_highlight():
+    """The editor path: TextBuffer reports the edited lines, only those are spliced into the highlighter."""
+    buf = TextBuffer(SOURCE * 20)
+    inc = IncrementalHighlighter()
+    rng = random.Random(3)
+    snapshots = []
+    for _ in range(400):
+        for _ in range(rng.choice([1, 1, 3])): # Several edits between two redraws
+            pos = rng.randrange(len(buf) + 1)
+            roll = rng.random()
+            if roll < 0.55:
+                buf.insert(pos, rng.choice(['"""', "'''", "\n", "a\nb\n", "x", "#", "'", '"', "\\"]))
+            elif roll < 0.95:
+                buf.delete(pos, rng.randint(1, 30))
+            elif snapshots:
+                buf.restore(snapshots.pop())
+            if rng.random() < 0.1:
+                snapshots.append(buf.snapshot())
+        change = buf.take_change()
+        if change is None:
+            continue
+        first, old_end, new_end = change
+        if old_end is None:
+            inc.update(buf.text())
+        else:
+            inc.splice(first, old_end, buf.lines(first, new_end))
+        full = IncrementalHighlighter()
+        full.update(buf.text())
+        assert inc.lines == full.lines
+        assert inc.tokens == full.tokens
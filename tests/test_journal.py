@@ -0,0 +1,141 @@
+import os
+import random
+
+import pytest
+
+from src.core.api import DroneAPI
+from src.core.autosave import AutosaveService
+from src.core.farm import Farm
+from src.core.journal import FarmJournal, RECORD, J_CLEAR
+
+
+def new_session(journal_dir):
+    farm = Farm(8, 8, seed=1)
+    drone = DroneAPI(farm, lambda text: None, sleep_func=lambda s: None)
+    autosave = AutosaveService(farm, drone, interval=0, directory=str(journal_dir))
+    return farm, drone, autosave
+
+
+def test_failed_recovery_keeps_the_crashed_session(tmp_path):
+    farm, drone, autosave = new_session(tmp_path)
+    journal = FarmJournal(str(tmp_path / "journal"))
+    journal.start(farm, drone, autosave)
+    autosave.flush()
+    drone.plant("carrot")
+    journal.close() # Crash: no discard()
+    with open(journal._log_path(journal.generation), "ab") as f:
+        f.write(RECORD.pack(J_CLEAR, farm.time, 0, 10000, 1)) # Off the grid
+    autosave.close()
+    crashed = sorted(os.listdir(journal.directory))
+
+    farm, drone, autosave = new_session(tmp_path)
+    journal = FarmJournal(str(tmp_path / "journal"))
+    with pytest.raises(IndexError):
+        journal.recover(farm, drone)
+    failed = journal.set_aside()
+    journal.start(farm, drone, autosave) # What the IDE does next
+    autosave.flush()
+    for _ in range(2):
+        journal.checkpoint(autosave) # Compaction drops every older generation in the journal directory
+        autosave.flush()
+    journal.close()
+    autosave.close()
+
+    assert os.path.dirname(failed) == journal.directory
+    assert sorted(os.listdir(failed)) == crashed
+
+
+def farm_state(farm, drone):
+    types, growth, levels, flags, roots = farm.to_columns()
+    return (farm.time, list(types), list(growth), list(levels), list(flags), list(roots),
+            (drone.x, drone.y), dict(drone.inventory))
+
+
+def play(farm, drone, rng, steps):
+    """Random drone commands between frames; pumpkins ripen, rot and fuse along the way."""
+    for _ in range(steps):
+        roll = rng.random()
+        if roll < 0.3:
+            drone.move(rng.choice(["North", "South", "East", "West"]))
+        elif roll < 0.6:
+            drone.plant(rng.choice(["pumpkin", "pumpkin", "carrot"]))
+        elif roll < 0.75:
+            drone.harvest()
+        elif roll < 0.8:
+            drone.destroy()
+        else:
+            drone.plant_rect(rng.randint(1, 3), rng.randint(1, 3), "pumpkin")
+        farm.update(rng.choice([0.1, 0.5, 2.0]))
+
+
+def recovered(tmp_path):
+    farm, drone, autosave = new_session(tmp_path)
+    autosave.close()
+    assert FarmJournal(str(tmp_path / "journal")).recover(farm, drone) is not None
+    return farm_state(farm, drone)
+
+
+def test_recovery_replays_to_the_live_state(tmp_path):
+    farm, drone, autosave = new_session(tmp_path)
+    journal = FarmJournal(str(tmp_path / "journal"))
+    journal.start(farm, drone, autosave)
+    play(farm, drone, random.Random(5), 400)
+    journal.close() # Crash right after a flush
+    autosave.close()
+    assert farm.fusion_count > 0
+    assert recovered(tmp_path) == farm_state(farm, drone)
+
+
+def test_torn_last_record_is_ignored(tmp_path):
+    farm, drone, autosave = new_session(tmp_path)
+    journal = FarmJournal(str(tmp_path / "journal"))
+    journal.start(farm, drone, autosave)
+    play(farm, drone, random.Random(6), 200)
+    journal.close()
+    autosave.close()
+    expected = farm_state(farm, drone)
+    log = journal._log_path(journal.generation)
+    with open(log, "ab") as f:
+        f.write(RECORD.pack(J_CLEAR, farm.time, drone.x, drone.y, 1)[:RECORD.size - 3]) # Crash mid-write
+    assert recovered(tmp_path) == expected
+
+
+def test_crash_after_compaction_recovers_from_the_new_base(tmp_path):
+    farm, drone, autosave = new_session(tmp_path)
+    journal = FarmJournal(str(tmp_path / "journal"), compact_records=100)
+    journal.start(farm, drone, autosave)
+    rng = random.Random(7)
+    for _ in range(20):
+        play(farm, drone, rng, 20)
+        journal.update(0.0, autosave) # Checkpoints whenever the log is long enough
+    journal.flush()
+    assert journal.generation > 1
+    autosave.flush() # The latest base is on disk and the older generations are gone
+    bases = journal._generations("base")
+    assert bases == [journal.generation]
+    play(farm, drone, rng, 50) # More changes, only in the log of the new generation
+    journal.close()
+    autosave.close()
+    assert recovered(tmp_path) == farm_state(farm, drone)
+
+
+class NeverWrites:
+    """Autosave whose background write never finishes (the game died first)."""
+    def save(self, path, on_done=None):
+        pass
+
+
+def test_crash_before_the_new_base_is_written_replays_both_logs(tmp_path):
+    farm, drone, autosave = new_session(tmp_path)
+    journal = FarmJournal(str(tmp_path / "journal"))
+    journal.start(farm, drone, autosave)
+    autosave.flush()
+    rng = random.Random(8)
+    play(farm, drone, rng, 100)
+    journal.checkpoint(NeverWrites()) # Log cut, base_1 never reaches the disk
+    play(farm, drone, rng, 100)
+    journal.close()
+    autosave.close()
+    assert journal._generations("base") == [0]
+    assert journal._generations("log") == [0, 1]
+    assert recovered(tmp_path) == farm_state(farm, drone)
@@ -0,0 +1,68 @@
+import sys
+
+import pytest
+
+from src.core.headless import HeadlessSimulation
+from src.core.profiler import ScriptProfiler
+
+SCRIPT = """for i in range(3):
+    drone.plant_rect(2, 2, 'carrot')
+    drone.move('East')
+drone.harvest()
+"""
+
+
+def test_profile_of_a_headless_run():
+    sim = HeadlessSimulation(6, 6, seed=0)
+    delay = sim.drone.move_delay
+    result = sim.run_script(SCRIPT, filename="<profiled>", profile=True)
+    assert result["error"] is None
+    profile = result["profile"]
+    lines = {entry["line"]: entry for entry in profile["lines"]}
+    assert {ln: entry["hits"] for ln, entry in lines.items()} == {1: 4, 2: 3, 3: 3, 4: 1}
+    assert lines[2]["sim"] == pytest.approx(3 * 7 * delay) # 4 plants + 3 moves per rect
+    assert lines[3]["sim"] == pytest.approx(3 * delay)
+    assert lines[4]["sim"] == pytest.approx(delay)
+    assert lines[1]["sim"] == 0
+    methods = profile["methods"]
+    assert {name: m["calls"] for name, m in methods.items()} == {"plant_rect": 3, "move": 3, "harvest": 1}
+    assert methods["plant_rect"]["sim"] == pytest.approx(3 * 7 * delay)
+    assert sum(entry["sim"] for entry in profile["lines"]) == pytest.approx(result["sim_time"])
+    # The drone is back to its class methods and original sleep
+    assert "plant_rect" not in vars(sim.drone)
+    assert sim.drone.sleep == sim.advance
+
+
+def test_uninstall_restores_the_previous_tracer():
+    sim = HeadlessSimulation(4, 4)
+    calls = []
+    def tracer(frame, event, arg):
+        calls.append(event)
+        return None
+    previous = sys.gettrace()
+    sys.settrace(tracer)
+    try:
+        profiler = ScriptProfiler(sim.drone, "<x>")
+        profiler.install()
+        profiler.uninstall()
+        assert sys.gettrace() is tracer
+    finally:
+        sys.settrace(previous)
+
+
+def test_late_uninstall_of_a_replaced_profiler_keeps_the_new_hooks():
+    """A new run installs while the old script thread is still finishing: the old uninstall must not undo it."""
+    sim = HeadlessSimulation(4, 4)
+    previous = sys.gettrace()
+    old = ScriptProfiler(sim.drone, "<old>")
+    new = ScriptProfiler(sim.drone, "<new>")
+    old.install()
+    new.install()
+    old.uninstall()
+    assert sim.drone.sleep == new._sleep
+    sim.drone.move("East")
+    assert new.methods["move"][0] == 1 and old.methods["move"][0] == 0
+    new.uninstall()
+    sys.settrace(previous)
+    assert sim.drone.sleep == sim.advance
+    assert "move" not in vars(sim.drone)
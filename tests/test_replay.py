@@ -0,0 +1,29 @@
+from src.core.farm import Farm
+from src.core.api import DroneAPI
+from src.core.replay import SessionRecorder, TraceReplayer
+
+
+def test_recording_started_with_pending_events_replays_exactly(tmp_path):
+    """Events applied before the recorder started are in the initial state and must not be applied again."""
+    farm = Farm(8, 8, seed=1)
+    drone = DroneAPI(farm, lambda text: None, sleep_func=lambda s: None)
+    drone.plant("carrot")
+    farm.update(1 / 60)
+    drone.move("East")
+    drone.plant("pumpkin") # Same frame as the recording start, still in the ring
+    path = str(tmp_path / "run.cfr")
+    recorder = SessionRecorder(path, farm, drone, seed=3)
+    recorder.drain(drone.events)
+    for i in range(10):
+        if i == 4:
+            drone.move("South")
+            drone.plant("carrot")
+        recorder.drain(drone.events)
+        recorder.frame(1 / 60)
+        farm.update(1 / 60)
+    expected = recorder.finish()
+
+    result = TraceReplayer(path).run()
+    assert result["frames"] == 10
+    assert result["hash"] == expected
+    assert result["match"]
@@ -0,0 +1,106 @@
+import pytest
+
+from src.core.api import DroneAPI
+from src.core.farm import Farm
+from src.core.save_format import encode, decode, read_save, write_save, SaveFormatError
+
+
+def build(storage):
+    farm = Farm(8, 8, storage=storage, seed=2)
+    drone = DroneAPI(farm, lambda text: None, sleep_func=lambda s: None)
+    drone.plant_rect(3, 3, "pumpkin")
+    drone.x, drone.y = 5, 6
+    drone.plant("pumpkin")
+    drone.x, drone.y = 7, 7
+    drone.plant("carrot")
+    for _ in range(40):
+        farm.update(0.5)
+    drone.x, drone.y = 5, 6
+    drone.plant("pumpkin") # Still growing
+    farm.update(0.25)
+    drone.inventory = {"Carrot": 3, "Pumpkin": 9}
+    return farm, drone
+
+
+def state(farm, drone):
+    types, growth, levels, flags, roots = farm.to_columns()
+    return (farm.width, farm.height, farm.time, list(types), list(growth), list(levels), list(flags),
+            list(roots), drone.to_dict())
+
+
+@pytest.mark.parametrize("storage", ["object", "columnar"])
+@pytest.mark.parametrize("level", [0, 6])
+def test_round_trip(tmp_path, storage, level):
+    farm, drone = build(storage)
+    farm.grid[6][5].make_rotten()
+    _, _, levels, flags, roots = farm.to_columns()
+    assert len(roots) > 0 and max(levels) > 1 # A mega pumpkin
+    assert any(flags)
+    expected = state(farm, drone)
+
+    path = str(tmp_path / "save.farm")
+    write_save(path, farm, drone.to_dict(), level)
+    for storage_to in ("object", "columnar"): # The file does not depend on the backend that wrote it
+        loaded = Farm(2, 2, storage=storage_to)
+        loaded_drone = DroneAPI(loaded, lambda text: None)
+        read_save(path, loaded, loaded_drone)
+        assert state(loaded, loaded_drone) == expected
+        assert loaded.grid[6][5].is_rotten
+
+    loaded = Farm(2, 2, storage=storage)
+    loaded_drone = DroneAPI(loaded, lambda text: None)
+    decode(encode(farm, drone.to_dict(), level), loaded, loaded_drone)
+    assert state(loaded, loaded_drone) == expected
+
+
+@pytest.mark.parametrize("damage", ["truncate", "magic", "short"])
+def test_damaged_save_is_rejected(tmp_path, damage):
+    farm, drone = build("object")
+    data = encode(farm, drone.to_dict(), 1)
+    if damage == "truncate":
+        data = data[:len(data) - 10]
+    elif damage == "magic":
+        data = b"XXXX" + data[4:]
+    else:
+        data = data[:6]
+    path = tmp_path / "save.farm"
+    path.write_bytes(data)
+    loaded = Farm(2, 2)
+    with pytest.raises(SaveFormatError):
+        read_save(str(path), loaded, DroneAPI(loaded, lambda text: None))
+
+
+class Damaged:
+    """A farm whose columns were altered after to_columns(), encoded into a well-formed file."""
+    def __init__(self, farm, damage):
+        self.width, self.height, self.time = farm.width, farm.height, farm.time
+        types, growth, levels, flags, roots = farm.to_columns()
+        self.columns = (bytearray(types), growth, levels, flags, roots)
+        damage(*self.columns)
+
+    def to_columns(self):
+        return self.columns
+
+
+def _bad_type(types, growth, levels, flags, roots):
+    types[3] = 200
+
+
+def _root_past_edge(types, growth, levels, flags, roots):
+    levels[roots[0]] = 60
+
+
+def _root_off_grid(types, growth, levels, flags, roots):
+    roots[0] = 10000
+
+
+@pytest.mark.parametrize("storage", ["object", "columnar"])
+@pytest.mark.parametrize("damage", [_bad_type, _root_past_edge, _root_off_grid])
+def test_damaged_content_leaves_the_farm_untouched(storage, damage):
+    farm, drone = build(storage)
+    data = encode(Damaged(farm, damage), drone.to_dict(), 1)
+    target, target_drone = build(storage)
+    before = state(target, target_drone)
+    with pytest.raises(SaveFormatError):
+        decode(data, target, target_drone)
+    assert state(target, target_drone) == before
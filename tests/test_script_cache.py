@@ -0,0 +1,21 @@
+import os
+
+from src.core.script_cache import ScriptCache
+
+
+def test_editing_a_script_keeps_only_its_latest_version_on_disk(tmp_path):
+    cache = ScriptCache(cache_dir=str(tmp_path))
+    cache.get("y = 0\n", "other.py")
+    for i in range(5):
+        cache.get(f"x = {i}\n", "farm.py")
+
+    files = sorted(os.listdir(tmp_path))
+    assert len(files) == 2 # farm.py (latest edit) + other.py
+    latest = os.path.basename(cache._path(cache.key("x = 4\n", "farm.py")))
+    assert latest in files
+
+    fresh = ScriptCache(cache_dir=str(tmp_path)) # New session: the latest version comes from disk
+    namespace = {}
+    exec(fresh.get("x = 4\n", "farm.py"), namespace)
+    assert namespace["x"] == 4
+    assert fresh.disk_hits == 1